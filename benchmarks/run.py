@@ -0,0 +1,180 @@
+"""
+Benchmarks for the parse, serialize and write hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --db postgresql:///baseball --compare results.json
+
+Every benchmark runs against a deterministic synthetic league, so results from two runs of the
+same sizes are comparable. With ``--compare`` the run exits non-zero when any benchmark is slower
+than the baseline by more than ``--threshold``.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.synthetic import generate_league, generate_players
+from classes.espn.league import League
+from classes.espn.matchup import Matchup
+from classes.interface import FantasyBaseballInterface
+from classes.replay import ReplayAPI
+
+
+class StaticReplaySource(object):
+    def __init__(self, league: dict = None, players: list = None):
+        self.league = league
+        self.players = players
+
+    def fetch(self, endpoint: str = "", params: dict = None, headers: dict = None):
+        return self.players if endpoint == "players" else self.league
+
+
+def parse_league(league_data: dict = None):
+    league = League(data=league_data)
+    league.parse_league_data()
+    return league
+
+
+def serialize_league(league: League = None):
+    return [obj.serialize_for_db() for obj in league.iter_objects()]
+
+
+def parse_matchups(league_data: dict = None):
+    return [
+        Matchup(data=matchup_data, scoring_period_id=league_data.get("scoringPeriodId")) for matchup_data in league_data.get("schedule", list())
+    ]
+
+
+def parse_players(api: ReplayAPI = None):
+    # Tools are created lazily, so this never connects to a database
+    interface = FantasyBaseballInterface(api=api, snapshot_directory=None)
+    return interface.setup_players()
+
+
+def time_benchmark(function, setup=None, repeat: int = 5):
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - started)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "max": max(timings),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace = None):
+    sizes = {
+        "teams": args.teams,
+        "members": args.members or args.teams,
+        "scoring_items": args.scoring_items,
+        "matchup_periods": args.matchup_periods,
+        "players": args.players,
+    }
+    league_data = generate_league(teams=args.teams, members=args.members, scoring_items=args.scoring_items,
+                                  matchup_periods=args.matchup_periods, seed=args.seed)
+    players_data = generate_players(count=args.players, seed=args.seed)
+    api = ReplayAPI(StaticReplaySource(league_data, players_data))
+
+    results = {
+        "parse_league": time_benchmark(lambda _: parse_league(league_data), repeat=args.repeat),
+        "serialize_league": time_benchmark(serialize_league, lambda: parse_league(league_data), repeat=args.repeat),
+        "parse_matchups": time_benchmark(lambda _: parse_matchups(league_data), repeat=args.repeat),
+        "parse_players": time_benchmark(lambda _: parse_players(api), repeat=args.repeat),
+    }
+
+    if args.db:
+        from classes.database import DatabaseEngine
+        from classes.espn.base import Position, Stat
+        database = DatabaseEngine(connection_string=args.db)
+        database.start_session()
+        Stat.write_all_to_database(database)
+        Position.write_all_to_database(database)
+        results["write_league"] = time_benchmark(
+            lambda league: league.write_to_database(database), lambda: parse_league(league_data), repeat=args.repeat)
+        database.end_session()
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: dict = None, baseline: dict = None, threshold: float = 0.1):
+    """
+    Compare the median of every benchmark with a baseline run.
+
+    Returns:
+        list: The names of the benchmarks that regressed by more than the threshold.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        baseline_result = baseline.get("results", dict()).get(name)
+        if baseline_result is None:
+            continue
+        ratio = result["median"] / baseline_result["median"]
+        print(f"{name}: {baseline_result['median'] * 1000:.2f}ms -> {result['median'] * 1000:.2f}ms ({ratio:.2f}x)",
+              file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def parse_arguments(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parse, serialize and write hot paths.")
+    parser.add_argument("--teams", type=int, default=12)
+    parser.add_argument("--members", type=int, default=None)
+    parser.add_argument("--scoring-items", type=int, default=20)
+    parser.add_argument("--matchup-periods", type=int, default=22)
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=None,
+                        help="Connection string of a local database seeded with seed.sql, enables the write benchmark")
+    parser.add_argument("--output", default=None,
+                        help="Write the results here instead of stdout")
+    parser.add_argument("--compare", default=None,
+                        help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Allowed slowdown of the median before a benchmark counts as a regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(output)
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as infile:
+            regressions = compare_results(results, json.load(infile), args.threshold)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,78 @@
+"""
+Startup-time benchmark for short jobs and CLI invocations.
+
+Run from the repository root:
+
+    python -m benchmarks.startup --output startup.json
+
+Each scenario runs in a fresh interpreter so import caches are cold for the modules under test.
+The reported time is the wall time of the whole interpreter minus a bare ``python -c pass`` run,
+along with the heavy modules each scenario ended up importing.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["sqlalchemy", "requests", "asyncio", "sqlite3", "tracemalloc", "numpy"]
+
+SCENARIOS = {
+    "baseline": "pass",
+    "import_interface": "from classes.interface import FantasyBaseballInterface",
+    "construct_interface": (
+        "from classes.interface import FantasyBaseballInterface\n"
+        "FantasyBaseballInterface(league_id=1, season=2025)"
+    ),
+    "construct_api": (
+        "from classes.interface import FantasyBaseballInterface\n"
+        "FantasyBaseballInterface(league_id=1, season=2025, espn_s2='x', swid='x', snapshot_directory=None).api"
+    ),
+}
+
+REPORT_MODULES = (
+    "\nimport sys, json\n"
+    "print(json.dumps([name for name in {modules} if name in sys.modules]))"
+)
+
+
+def run_scenario(code: str = None, repeat: int = 10):
+    timings = []
+    modules = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code + REPORT_MODULES.format(modules=HEAVY_MODULES)],
+                                capture_output=True, text=True, cwd=os.getcwd())
+        timings.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1]}
+        modules = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"median": statistics.median(timings), "min": min(timings), "heavy_modules": modules}
+
+
+def run_benchmarks(repeat: int = 10):
+    results = {name: run_scenario(code, repeat) for name, code in SCENARIOS.items()}
+    baseline = results["baseline"]["median"]
+    for name, result in results.items():
+        if "median" in result:
+            result["over_baseline"] = result["median"] - baseline
+    return {
+        "meta": {"timestamp": time.time(), "python": sys.version.split()[0], "repeat": repeat},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark interpreter startup for the interface.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    output = json.dumps(run_benchmarks(args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(output)
+    else:
+        print(output)
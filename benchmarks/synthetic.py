@@ -0,0 +1,255 @@
+import random
+import uuid
+from classes.espn.base import Position, Stat
+
+LINEUP_SLOT_COUNTS = {
+    Position.CATCHER: 1,
+    Position.FIRST_BASE: 1,
+    Position.SECOND_BASE: 1,
+    Position.THIRD_BASE: 1,
+    Position.SHORTSTOP: 1,
+    Position.OUTFIELD: 3,
+    Position.UTILITY: 1,
+    Position.PITCHER: 7,
+    Position.BENCH: 4,
+    Position.INJURED_LIST: 2,
+}
+
+BATTER_SLOTS = [
+    [Position.CATCHER], [Position.FIRST_BASE, Position.FIRST_BASE_THIRD_BASE],
+    [Position.SECOND_BASE, Position.SECOND_BASE_SHORTSTOP], [
+        Position.THIRD_BASE, Position.FIRST_BASE_THIRD_BASE],
+    [Position.SHORTSTOP, Position.SECOND_BASE_SHORTSTOP], [
+        Position.OUTFIELD, Position.LEFT_FIELD, Position.CENTER_FIELD],
+    [Position.OUTFIELD, Position.RIGHT_FIELD],
+]
+
+PITCHER_SLOTS = [
+    [Position.PITCHER, Position.STARTING_PITCHER], [
+        Position.PITCHER, Position.RELIEF_PITCHER],
+]
+
+WEEKDAYS = ["MONDAY", "TUESDAY", "WEDNESDAY",
+            "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+
+def espn_uuid(rng: random.Random = None):
+    return f"{{{str(uuid.UUID(int=rng.getrandbits(128))).upper()}}}"
+
+
+def generate_members(rng: random.Random = None, count: int = 10):
+    return [
+        {
+            "id": espn_uuid(rng),
+            "displayName": f"member{index}",
+            "firstName": f"First{index}",
+            "lastName": f"Last{index}",
+            "notificationSettings": [
+                {"enabled": rng.random() < 0.5, "id": espn_uuid(rng), "type": f"TYPE_{setting}"} for setting in range(4)
+            ],
+        } for index in range(count)
+    ]
+
+
+def generate_player(rng: random.Random = None, player_id: int = None, scoring_period_id: int = 1):
+    is_pitcher = rng.random() < 0.45
+    slots = rng.choice(PITCHER_SLOTS if is_pitcher else BATTER_SLOTS)
+    eligible_slots = [slot.id for slot in slots] + [
+        Position.BENCH.id, Position.INJURED_LIST.id]
+    if not is_pitcher:
+        eligible_slots.append(Position.UTILITY.id)
+    stats = {
+        str(stat.id): float(rng.randint(0, 30)) for stat in Stat if stat is not Stat.DEFAULT
+    }
+    return {
+        "id": player_id,
+        "fullName": f"Player {player_id}",
+        "eligibleSlots": eligible_slots,
+        "defaultPositionId": slots[0].id,
+        "proTeamId": rng.randint(0, 30),
+        "status": rng.choice(["ACTIVE", "ACTIVE", "ACTIVE", "INJURY_RESERVE"]),
+        "stats": [
+            {"seasonId": 0, "scoringPeriodId": scoring_period_id,
+                "statSourceId": 0, "statSplitTypeId": 5, "stats": stats},
+        ],
+    }
+
+
+def generate_players(count: int = 3000, seed: int = 0):
+    """
+    Generate a synthetic ``players`` response with the given number of players.
+    """
+    rng = random.Random(seed)
+    return [
+        {"id": player_id, "player": generate_player(rng, player_id)} for player_id in range(1, count + 1)
+    ]
+
+
+def generate_roster(rng: random.Random = None, players: list = None):
+    return {
+        "entries": [
+            {
+                "playerId": player["id"],
+                "lineupSlotId": player["eligibleSlots"][0],
+                "playerPoolEntry": {"appliedStatTotal": round(rng.uniform(-5, 25), 1), "player": player},
+            } for player in players
+        ]
+    }
+
+
+def generate_schedule(rng: random.Random = None, team_ids: list = None, rosters: dict = None,
+                      matchup_periods: int = 22):
+    schedule = []
+    matchup_id = 1
+    for matchup_period_id in range(1, matchup_periods + 1):
+        order = list(team_ids)
+        rng.shuffle(order)
+        for home_team_id, away_team_id in zip(order[::2], order[1::2]):
+            sides = {}
+            for side, team_id in (("home", home_team_id), ("away", away_team_id)):
+                sides[side] = {
+                    "teamId": team_id,
+                    "totalPoints": round(rng.uniform(50, 150), 1),
+                    "pointsByScoringPeriod": {
+                        str(period): round(rng.uniform(0, 25), 1) for period in range(1, 8)
+                    },
+                    "rosterForCurrentScoringPeriod": generate_roster(rng, rosters[team_id]),
+                }
+            schedule.append({
+                "id": matchup_id,
+                "matchupPeriodId": matchup_period_id,
+                "winner": "UNDECIDED",
+                **sides,
+            })
+            matchup_id += 1
+    return schedule
+
+
+def generate_settings(rng: random.Random = None, team_ids: list = None, divisions: int = 2, scoring_items: int = 20,
+                      matchup_periods: int = 22):
+    scoring_stats = rng.sample(
+        [stat for stat in Stat if stat is not Stat.DEFAULT], scoring_items)
+    return {
+        "name": "Synthetic League",
+        "size": len(team_ids),
+        "restrictionType": "NONE",
+        "isPublic": False,
+        "isCustomizable": True,
+        "acquisitionSettings": {
+            "acquisitionBudget": 100,
+            "acquisitionLimit": -1,
+            "acquisitionType": "WAIVERS_TRADITIONAL",
+            "minimumBid": 0,
+            "waiverHours": 24,
+            "waiverProcessDays": rng.sample(WEEKDAYS, 3),
+            "waiverProcessHour": 0,
+        },
+        "financeSettings": {"entryFee": 0.0, "miscFee": 0.0},
+        "draftSettings": {
+            "auctionBudget": 260,
+            "keeperCount": 0,
+            "keeperOrderType": "TRADITIONAL",
+            "leagueSubType": "NONE",
+            "orderType": "MANUAL",
+            "pickOrder": list(team_ids),
+            "timePerSelection": 90,
+            "type": "SNAKE",
+            "date": 1711900800000,
+        },
+        "rosterSettings": {
+            "lineupLocktimeType": "INDIVIDUAL_GAME",
+            "rosterLocktimeType": "INDIVIDUAL_GAME",
+            "moveLimit": -1,
+            "lineupSlotCounts": {str(position.id): count for position, count in LINEUP_SLOT_COUNTS.items()},
+            "positionLimits": {str(position.id): 0 for position in LINEUP_SLOT_COUNTS},
+            "lineupSlotStatLimits": {},
+            "universeIds": [1],
+        },
+        "scheduleSettings": {
+            "divisions": [
+                {"id": division_id, "name": f"Division {division_id}", "size": len(
+                    team_ids) // divisions} for division_id in range(divisions)
+            ],
+            "matchupPeriodCount": matchup_periods,
+            "matchupPeriodLength": 1,
+            "matchupPeriods": {
+                str(period): [period * 7 + day for day in range(7)] for period in range(1, matchup_periods + 1)
+            },
+            "periodTypeId": 1,
+            "playoffSeedingRule": "TOTAL_H2H_WINS",
+            "playoffTeamCount": 4,
+        },
+        "scoringSettings": {
+            "scoringType": "H2H_POINTS",
+            "matchupTieRule": "NONE",
+            "playerRankType": "TOTAL",
+            "playoffMatchupTieRule": "NONE",
+            "scoringItems": [
+                {"statId": stat.id, "points": round(rng.uniform(-2, 5), 1), "isReverseItem": False,
+                 "pointsOverrides": {}} for stat in scoring_stats
+            ],
+        },
+        "tradeSettings": {"max": -1, "revisionHours": 24, "vetoVotesRequired": 4, "deadlineDate": 1723000000000},
+    }
+
+
+def generate_league(teams: int = 10, members: int = None, scoring_items: int = 20, matchup_periods: int = 22,
+                    roster_size: int = 26, league_id: int = 1, season: int = 2025, seed: int = 0):
+    """
+    Generate a synthetic league response shaped like ``FantasyBaseballAPI.get_league`` plus the boxscore schedule.
+
+    Args:
+        teams (int): The number of teams. Defaults to 10.
+        members (int): The number of league members. Defaults to one per team.
+        scoring_items (int): The number of scored stats. Defaults to 20.
+        matchup_periods (int): The number of matchup periods in the schedule. Defaults to 22.
+        roster_size (int): The number of players on each roster. Defaults to 26.
+        league_id (int): The league id. Defaults to 1.
+        season (int): The season. Defaults to 2025.
+        seed (int): The random seed, identical arguments always generate an identical league. Defaults to 0.
+
+    Returns:
+        dict: The synthetic league payload.
+    """
+    rng = random.Random(seed)
+    member_data = generate_members(rng, members or teams)
+    team_ids = list(range(1, teams + 1))
+    rosters = {
+        team_id: [
+            generate_player(rng, (team_id - 1) * roster_size + index + 1) for index in range(roster_size)
+        ] for team_id in team_ids
+    }
+    settings = generate_settings(
+        rng, team_ids, scoring_items=scoring_items, matchup_periods=matchup_periods)
+    division_count = len(settings["scheduleSettings"]["divisions"])
+    team_data = [
+        {
+            "id": team_id,
+            "name": f"Team {team_id}",
+            "abbrev": f"T{team_id}",
+            "divisionId": team_id % division_count,
+            "primaryOwner": member_data[(team_id - 1) % len(member_data)]["id"],
+            "owners": [member_data[(team_id - 1) % len(member_data)]["id"]],
+            "logo": f"https://example.com/{team_id}.png",
+            "logoType": "CUSTOM_VALID",
+            "playoffSeed": team_id,
+            "points": round(rng.uniform(0, 1000), 1),
+            "currentProjectedRank": team_id,
+            "draftDayProjectedRank": team_id,
+            "waiverRank": team_id,
+            "isActive": True,
+            "roster": generate_roster(rng, rosters[team_id]),
+        } for team_id in team_ids
+    ]
+    return {
+        "id": league_id,
+        "seasonId": season,
+        "segmentId": 0,
+        "scoringPeriodId": 1,
+        "gameId": 2,
+        "status": {"currentMatchupPeriod": 1},
+        "members": member_data,
+        "teams": team_data,
+        "settings": settings,
+        "schedule": generate_schedule(rng, team_ids, rosters, matchup_periods),
+    }
@@ -0,0 +1,178 @@
+from classes.instrumentation import metrics
+from settings import ACTIVITY_MAP
+from utilities.espn import convert_epoch_to_date
+
+ACTIVITY_TABLE = "league_activity"
+TRANSACTIONS_TABLE = "league_transactions"
+CURSOR_TABLE = "league_activity_cursors"
+
+TRADED = ACTIVITY_MAP["TRADED"]
+# Commissioner drops name the team in "for" rather than "to"
+DROPPED_FOR_TEAM = 239
+
+
+def transaction_team_id(message: dict = None):
+    message_type_id = message.get("messageTypeId")
+    if message_type_id == TRADED:
+        return message.get("from")
+    if message_type_id == DROPPED_FOR_TEAM:
+        return message.get("for")
+    return message.get("to")
+
+
+def parse_activity(topic: dict = None, league_id: str = None, season: int = None):
+    """
+    Decode a ``kona_league_messageboard`` topic into an activity row and its transaction rows.
+
+    Returns:
+        tuple: The ``league_activity`` row and the list of ``league_transactions`` rows.
+    """
+    activity = {
+        "id": str(topic.get("id")),
+        "league_id": str(league_id),
+        "season": season,
+        "activity_date": convert_epoch_to_date(topic.get("date")),
+        "type": topic.get("type"),
+    }
+    transactions = [
+        {
+            "activity_id": activity["id"],
+            "message_index": message_index,
+            "message_type_id": message.get("messageTypeId"),
+            "action": ACTIVITY_MAP.get(message.get("messageTypeId"), "UNKNOWN"),
+            "team_id": transaction_team_id(message),
+            "player_id": message.get("targetId"),
+            "bid_amount": topic.get("bidAmount"),
+        } for message_index, message in enumerate(topic.get("messages", list()))
+    ]
+    return activity, transactions
+
+
+class ActivityIngester(object):
+    def __init__(self, api=None, database=None, page_size: int = 25, max_pages: int = None):
+        """
+        Initialize an ingester of the league's transactions (adds, drops, waiver claims and trades).
+
+        The activity feed is paged newest first. Every league keeps a cursor in
+        ``league_activity_cursors`` with the newest topic it stored, and paging stops as soon as that
+        topic (or anything older) comes up. The first poll reads the whole history, every later poll
+        only reads the pages with new activity, which usually means a single request.
+
+        The new topics are bulk inserted before the cursor moves, so a poll that fails halfway is
+        simply repeated by the next one. A poll cut short by ``max_pages`` leaves the cursor where it
+        was and saves the offset it stopped at along with the newest topic it stored, the next poll
+        resumes from that offset and the cursor only moves once paging reaches it or the end of the feed.
+
+        Args:
+            api (FantasyBaseballAPI): The API client the activity is fetched with.
+            database (DatabaseEngine): The engine the activity is written through.
+            page_size (int): The number of topics requested per page. Defaults to 25.
+            max_pages (int): The maximum number of pages read per poll. Defaults to unlimited.
+        """
+        self.api = api
+        self.database = database
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+    @property
+    def cursor_key(self):
+        return {"league_id": str(self.api.league_id), "season": int(self.api.season)}
+
+    def load_cursor(self):
+        """
+        Get the newest topic stored for the league.
+
+        Returns:
+            dict: The cursor row, None before the first poll.
+        """
+        # The league and season are the primary key, so at most one cursor row matches
+        row = self.database.get_by_column_value_multiple(
+            CURSOR_TABLE, self.cursor_key)
+        if row is None:
+            return None
+        return {column: getattr(row, column) for column in (
+            "last_activity_id", "last_activity_epoch", "pending_activity_id", "pending_activity_epoch",
+            "backfill_offset")}
+
+    def fetch_new(self, last_activity_id: str = None, last_activity_epoch: int = None, offset: int = 0):
+        """
+        Page through the activity feed until the stored cursor is reached.
+
+        Args:
+            last_activity_id (str): The id of the newest topic stored.
+            last_activity_epoch (int): The epoch of the newest topic stored, in milliseconds.
+            offset (int): The offset paging starts at, non-zero when resuming a backfill. Defaults to 0.
+
+        Returns:
+            tuple: The new topics, newest first, and the offset to resume at, None when paging reached
+            the cursor or the end of the feed.
+        """
+        topics = []
+        pages = 0
+        while self.max_pages is None or pages < self.max_pages:
+            page = self.api.get_league_activity(
+                limit=self.page_size, offset=offset)
+            pages += 1
+            for topic in page:
+                # Topics sharing the cursor's millisecond are kept, the upsert skips the stored ones
+                if str(topic.get("id")) == last_activity_id or (
+                        last_activity_epoch is not None and topic.get("date") is not None
+                        and topic["date"] < last_activity_epoch):
+                    metrics.increment("activity_pages", pages)
+                    return topics, None
+                topics.append(topic)
+            offset += len(page)
+            if len(page) < self.page_size:
+                metrics.increment("activity_pages", pages)
+                return topics, None
+        metrics.increment("activity_pages", pages)
+        return topics, offset
+
+    def poll(self):
+        """
+        Store the league activity added since the last poll and move the cursor to the newest topic.
+
+        Returns:
+            int: The number of new topics stored.
+        """
+        with metrics.span("activity_poll"):
+            cursor = self.load_cursor() or dict()
+            backfill_offset = cursor.get("backfill_offset")
+            topics, next_offset = self.fetch_new(
+                cursor.get("last_activity_id"), cursor.get("last_activity_epoch"), backfill_offset or 0)
+            if not topics and next_offset is None and backfill_offset is None:
+                return 0
+            activities = {}
+            transactions = []
+            for topic in topics:
+                activity, topic_transactions = parse_activity(
+                    topic, self.api.league_id, int(self.api.season))
+                # Activity posted while paging shifts the offsets, so a topic can show up on two pages
+                if activity["id"] in activities:
+                    continue
+                activities[activity["id"]] = activity
+                transactions += topic_transactions
+            if activities:
+                self.database.upsert(ACTIVITY_TABLE, list(activities.values()), index_elements=["id"])
+            if transactions:
+                self.database.upsert(TRANSACTIONS_TABLE, transactions, index_elements=[
+                                     "activity_id", "message_index"])
+            # The feed is newest first, so the first topic read from the top becomes the next cursor
+            if backfill_offset is None:
+                pending_activity_id = str(topics[0].get("id")) if topics else None
+                pending_activity_epoch = topics[0].get("date") if topics else None
+            else:
+                pending_activity_id = cursor.get("pending_activity_id")
+                pending_activity_epoch = cursor.get("pending_activity_epoch")
+            if next_offset is None:
+                row = dict(self.cursor_key, last_activity_id=pending_activity_id,
+                           last_activity_epoch=pending_activity_epoch, pending_activity_id=None,
+                           pending_activity_epoch=None, backfill_offset=None)
+            else:
+                # Paging stopped short of the cursor, the topics between stay to be backfilled
+                row = dict(self.cursor_key, last_activity_id=cursor.get("last_activity_id"),
+                           last_activity_epoch=cursor.get("last_activity_epoch"),
+                           pending_activity_id=pending_activity_id, pending_activity_epoch=pending_activity_epoch,
+                           backfill_offset=next_offset)
+            self.database.upsert(CURSOR_TABLE, [row], index_elements=["league_id", "season"])
+            return len(activities)
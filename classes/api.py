@@ -1,6 +1,8 @@
-import requests
 import json
 from collections import defaultdict
+from classes.snapshots import SnapshotStore, request_view
+from classes.instrumentation import metrics
+from settings import ACTIVITY_MAP
 
 # TODO: Put this in a config
 VALID_VIEWS = [
@@ -23,9 +25,11 @@ MAX_API_LIMIT = 3500
 
 
 class FantasyBaseballAPI:
-    def __init__(self, is_private: bool = True, season: str = None, league_id: str = None, espn_s2: str = None, swid: str = None):
+    def __init__(self, is_private: bool = True, season: str = None, league_id: str = None, espn_s2: str = None, swid: str = None,
+                 snapshot_store: SnapshotStore = None):
         self.season = season
         self.league_id = league_id
+        self.snapshot_store = snapshot_store
         self.fantasy_url = f"https://lm-api-reads.fantasy.espn.com/apis/v3/games/flb/seasons/{self.season}/segments/0/leagues/{self.league_id}"
         self.initialize_session(is_private=is_private,
                                 espn_s2=espn_s2, swid=swid)
@@ -43,14 +47,28 @@ class FantasyBaseballAPI:
         self.session.cookies.set("SWID", swid)
 
     def initialize_session(self, is_private: bool = True, espn_s2: str = None, swid: str = None):
+        # requests is only imported once a live client is actually built
+        import requests
         self.session = requests.Session()
         self.validate_set_cookies(is_private=is_private,
                                   espn_s2=espn_s2, swid=swid)
 
     def send_request(self, endpoint: str = "", params: dict = None, headers: dict = None):
         url = f"{self.fantasy_url}/{endpoint}".strip("/")
-        response = self.session.get(url, params=params, headers=headers)
-        return response.json()
+        view = request_view(endpoint, params)[0] if metrics.enabled else None
+        with metrics.span("api_request", view=view):
+            response = self.session.get(url, params=params, headers=headers)
+        with metrics.span("json_decode", view=view):
+            data = response.json()
+        metrics.increment("api_round_trips", view=view)
+        if metrics.enabled:
+            metrics.increment("api_response_bytes",
+                              len(response.content), view=view)
+        if self.snapshot_store is not None:
+            view, request_digest = request_view(endpoint, params, headers)
+            self.snapshot_store.save(
+                data, self.league_id, self.season, view, request_digest)
+        return data
 
     def get_league(self):
         """Gets all of the leagues initial data (teams, roster, matchups, settings)"""
@@ -60,6 +78,27 @@ class FantasyBaseballAPI:
         data = self.send_request(params=params)
         return data
 
+    def get_league_status(self):
+        """Gets the leagues current scoring and matchup period"""
+        data = self.send_request()
+        return data
+
+    def get_boxscore(self, matchup_period_id: int = None, scoring_period_id: int = None):
+        """Gets the live boxscores for every matchup in the given matchup period"""
+        params = {
+            "view": ["mBoxscore", "mMatchup"]
+        }
+        if scoring_period_id is not None:
+            params["scoringPeriodId"] = scoring_period_id
+        headers = None
+        if matchup_period_id is not None:
+            # Restrict the schedule to the live matchup period instead of the whole season
+            filters = {"schedule": {"filterMatchupPeriodIds": {
+                "value": [matchup_period_id]}}}
+            headers = {"x-fantasy-filter": json.dumps(filters)}
+        data = self.send_request(params=params, headers=headers)
+        return data
+
     def get_league_settings(self):
         params = {
             "view": "mSettings"
@@ -100,26 +139,35 @@ class FantasyBaseballAPI:
     def set_player_filters(self, filters: dict = defaultdict(dict), values: dict = defaultdict(dict)):
         filters["players"] = {**filters["players"], **values}
 
-    def get_players(self, filters: dict = defaultdict(dict)):
+    def iter_player_pages(self, filters: dict = defaultdict(dict), limit: int = MAX_API_LIMIT, sort: dict = None,
+                          max_pages: int = None):
+        """Yields the players a page at a time, so each page can be processed while the next downloads"""
         params = {
             "view": "kona_player_info"
         }
-        limit = MAX_API_LIMIT
         offset = 0
-        sort_perc_owned = {
+        sort = sort or {"sortPercOwned": {
             "sortPriority": 2, "sortAsc": False
-        }
+        }}
         self.set_player_filters(
-            filters, {"limit": limit, "offset": offset, "sortPercOwned": sort_perc_owned})
+            filters, {"limit": limit, "offset": offset, **sort})
         headers = {"x-fantasy-filter": json.dumps(filters)}
         data = self.send_request(params=params, headers=headers)
-        players = list()
+        pages = 0
         while len(data.get("players", list())):
-            players += data.get("players", list())
+            yield data.get("players", list())
+            pages += 1
+            if max_pages is not None and pages >= max_pages:
+                return
             offset = offset + limit
             self.set_player_filters(filters, {"offset": offset})
             headers = {"x-fantasy-filter": json.dumps(filters)}
             data = self.send_request(params=params, headers=headers)
+
+    def get_players(self, filters: dict = defaultdict(dict)):
+        players = list()
+        for page in self.iter_player_pages(filters=filters):
+            players += page
         return players
 
     def get_free_agent_players(self):
@@ -130,6 +178,27 @@ class FantasyBaseballAPI:
         }
         return self.get_players(filters=filters)
 
+    def get_free_agent_movers(self, limit: int = 50):
+        """Gets the free agents whose ownership changed the most recently, a single short page"""
+        filters = {
+            "players": {
+                "filterStatus": {"value": ["FREEAGENT", "WAIVERS"]}
+            }
+        }
+        sort = {"sortPercChanged": {"sortPriority": 1, "sortAsc": False}}
+        pages = self.iter_player_pages(
+            filters=filters, limit=limit, sort=sort, max_pages=1)
+        return next(pages, list())
+
+    def get_players_by_id(self, player_ids: list = None):
+        """Gets the given players, whatever team they are on"""
+        filters = {
+            "players": {
+                "filterIds": {"value": list(player_ids)}
+            }
+        }
+        return self.get_players(filters=filters)
+
     def get_players_on_team(self):
         filters = {
             "players": {
@@ -148,6 +217,28 @@ class FantasyBaseballAPI:
             endpoint="players", params=params, headers=headers)
         return data
 
+    def get_league_activity(self, limit: int = 25, offset: int = 0, message_type_ids: list = None):
+        """Gets a page of the leagues transactions, newest first"""
+        params = {
+            "view": "kona_league_messageboard"
+        }
+        filters = {
+            "topics": {
+                "filterType": {"value": ["ACTIVITY_TRANSACTIONS"]},
+                "limit": limit,
+                "limitPerMessageSet": {"value": 25},
+                "offset": offset,
+                "sortMessageDate": {"sortPriority": 1, "sortAsc": False},
+                "filterIncludeMessageTypeIds": {
+                    "value": message_type_ids or [key for key in ACTIVITY_MAP if isinstance(key, int)]
+                }
+            }
+        }
+        headers = {"x-fantasy-filter": json.dumps(filters)}
+        data = self.send_request(
+            endpoint="communication/", params=params, headers=headers)
+        return data.get("topics", list())
+
     def get_league_draft(self):
         """Gets the leagues draft"""
         params = {
@@ -157,10 +248,10 @@ class FantasyBaseballAPI:
         return data
 
     def get_player_card(self, playerIds: list[int], max_scoring_period: int, additional_filters: list = None):
-        """Gets the player card"""
+        """Gets the player cards of the given players, see PlayerCardService for batched, cached fetching"""
         params = {"view": "kona_playercard"}
 
-        additional_value = ["00{}".format(self.year), "10{}".format(self.year)]
+        additional_value = ["00{}".format(self.season), "10{}".format(self.season)]
         if additional_filters:
             additional_value += additional_filters
 
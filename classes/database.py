@@ -1,37 +1,146 @@
+import contextlib
+import threading
 from sqlalchemy.ext.automap import automap_base
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine, insert, select, update, and_
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import create_engine, insert, select, update, delete, and_
+from sqlalchemy.dialects import postgresql
 from typing import Any
+from classes.instrumentation import metrics
+from classes.slow_queries import SlowQueryLog
+from classes.read_cache import ReadCache
 
 
 class DatabaseEngine(object):
-    def __init__(self, connection_string: str = "postgresql:///postgres"):
+    def __init__(self, connection_string: str = "postgresql:///postgres", pool_size: int = 5, max_overflow: int = 10):
         """
         Initialize the Engine instance by setting up SQLAlchemy components.
 
-        This includes automapping of the database schema, creating the engine, and
-        reflecting the database tables.
+        This creates the engine and its connection pool without connecting. The database schema
+        is automapped by reflecting the database tables the first time a table is needed.
+
+        Sessions are scoped to the calling thread, so every thread that uses the engine works in
+        its own session and connection. Size the pool for the number of threads that write or read
+        at the same time.
 
         Args:
             connection_string (str): The database connection string. Defaults to "postgresql:///postgres".
+            pool_size (int): The number of connections kept open in the pool. Defaults to 5.
+            max_overflow (int): The number of extra connections opened when the pool is exhausted. Defaults to 10.
         """
         self.base = automap_base()
-        self.engine = create_engine(connection_string, convert_unicode=True)
-        self.base.prepare(self.engine, reflect=True)
-        self.tables = self.base.classes
-        self.session = None
+        self.engine = create_engine(connection_string, convert_unicode=True, pool_size=pool_size,
+                                    max_overflow=max_overflow, pool_pre_ping=True)
+        metrics.register_engine(self.engine)
+        self._tables = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._session_factory = sessionmaker(bind=self.engine)
+        self._scoped_session = scoped_session(self._session_factory)
+        self._session_started = False
+        self._units_of_work = 0
+        self._units_of_work_peak = 0
+        self._units_of_work_total = 0
+        self.slow_query_log = None
+        self.read_cache = None
+        self._write_listeners = []
+
+    @property
+    def tables(self):
+        """
+        The automapped table classes, reflected from the database on first access.
+        """
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self.base.prepare(self.engine, reflect=True)
+                    self._tables = self.base.classes
+        return self._tables
+
+    @property
+    def session(self):
+        """
+        The session of the calling thread.
+
+        Inside :meth:`unit_of_work` this is the unit's session, otherwise it is the thread's scoped
+        session, or None before :meth:`start_session` is called.
+        """
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            return session
+        if not self._session_started:
+            return None
+        return self._scoped_session()
 
     def start_session(self):
         """
-        Start a new SQLAlchemy session using the current engine.
+        Allow threads to use scoped SQLAlchemy sessions from the engine's pool.
         """
-        self.session = Session(self.engine)
+        self._session_started = True
 
     def end_session(self):
         """
-        Close the current SQLAlchemy session.
+        Close the calling thread's SQLAlchemy session and return its connection to the pool.
+        """
+        self._scoped_session.remove()
+
+    @contextlib.contextmanager
+    def unit_of_work(self):
+        """
+        Run the enclosed block in a dedicated session that is committed when the block succeeds,
+        rolled back when it raises, and closed either way.
+
+        Every engine method called from the same thread inside the block uses this session, so
+        parallel workers can each wrap their work in a unit without sharing state. Writes made inside
+        the block are only flushed, the whole unit is committed at once and write listeners are told
+        about the tables it wrote after that commit.
+
+        Yields:
+            Session: The unit's session.
+        """
+        previous_session = getattr(self._local, "session", None)
+        previous_writes = getattr(self._local, "pending_writes", None)
+        session = self._session_factory()
+        pending_writes = set()
+        self._local.session = session
+        self._local.pending_writes = pending_writes
+        with self._lock:
+            self._units_of_work += 1
+            self._units_of_work_total += 1
+            self._units_of_work_peak = max(
+                self._units_of_work_peak, self._units_of_work)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+            self._local.session = previous_session
+            self._local.pending_writes = previous_writes
+            with self._lock:
+                self._units_of_work -= 1
+        for table_name in sorted(pending_writes):
+            self.notify_write(table_name)
+
+    def get_pool_stats(self):
         """
-        self.session.close()
+        Retrieve connection pool and unit of work usage.
+
+        Returns:
+            dict: The pool size, connections checked in and out, overflow connections in use, and the
+            current, peak and total number of units of work.
+        """
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "units_of_work": self._units_of_work,
+            "units_of_work_peak": self._units_of_work_peak,
+            "units_of_work_total": self._units_of_work_total,
+        }
 
     def get_session(self):
         """
@@ -74,6 +183,119 @@ class DatabaseEngine(object):
                 return table
         raise ValueError("Invalid Table")
 
+    def enable_slow_query_log(self, threshold_ms: float = 50.0, analyze: bool = False):
+        """
+        Record every statement slower than the threshold along with its plan and call site.
+
+        Args:
+            threshold_ms (float): Statements at or above this duration are recorded. Defaults to 50.
+            analyze (bool): Use EXPLAIN ANALYZE for slow SELECT statements. Defaults to False.
+
+        Returns:
+            SlowQueryLog: The log, also available as ``slow_query_log``.
+        """
+        if self.slow_query_log is None:
+            self.slow_query_log = SlowQueryLog(
+                threshold_ms=threshold_ms, analyze=analyze)
+            self.slow_query_log.attach(self.engine)
+        return self.slow_query_log
+
+    def enable_read_cache(self, policies: dict = None, default_policy=None):
+        """
+        Serve repeated reads from memory until the table they read is written to through the engine.
+
+        Cached rows are detached from their session, so they can be shared between threads and units of
+        work, but relationships that were not loaded cannot be lazily loaded from them.
+
+        Args:
+            policies (dict): Table name to ``TablePolicy``, overriding the defaults (pinned reference tables,
+                an LRU with a TTL for the rest).
+            default_policy (TablePolicy): The policy of tables that are neither pinned nor listed in ``policies``.
+
+        Returns:
+            ReadCache: The cache, also available as ``read_cache``.
+        """
+        if self.read_cache is None:
+            self.read_cache = ReadCache(
+                policies=policies, default_policy=default_policy)
+            self.add_write_listener(self.read_cache.invalidate)
+        return self.read_cache
+
+    def cached_read(self, table_name: str = None, key: tuple = None, read=None):
+        """
+        Run a read through the read cache, if it is enabled.
+
+        Args:
+            table_name (str): The table the read queries.
+            key (tuple): Identifies the read within the table.
+            read (callable): Runs the query when the result is not cached.
+
+        Returns:
+            The result of the read, cached or not.
+        """
+        pending_writes = getattr(self._local, "pending_writes", None)
+        # A unit that wrote the table reads its own uncommitted rows, they must not be shared
+        if self.read_cache is None or (pending_writes and table_name in pending_writes):
+            return read()
+        found, result = self.read_cache.get(table_name, key)
+        if found:
+            return result
+        generation = self.read_cache.generation(table_name)
+        result = read()
+        # Detached rows are neither expired by later commits nor tied to this thread's session
+        for row in (result if isinstance(result, list) else [result]):
+            if row is not None and row in self.session:
+                self.session.expunge(row)
+        self.read_cache.set(table_name, key, result, generation)
+        return result
+
+    def add_write_listener(self, callback):
+        """
+        Register a callable that is invoked with the table name after every write made through the engine.
+
+        Args:
+            callback (callable): A function accepting a single table name argument.
+        """
+        self._write_listeners.append(callback)
+
+    def remove_write_listener(self, callback):
+        """
+        Remove a previously registered write listener.
+
+        Args:
+            callback (callable): The listener to remove.
+        """
+        if callback in self._write_listeners:
+            self._write_listeners.remove(callback)
+
+    def notify_write(self, table_name: str = None):
+        """
+        Inform every write listener that the given table changed.
+
+        Args:
+            table_name (str): The name of the table that was written to.
+        """
+        for callback in list(self._write_listeners):
+            callback(table_name)
+
+    def finish_write(self, table_name: str = None):
+        """
+        Commit a write made through the current session and notify the write listeners.
+
+        Inside :meth:`unit_of_work` the write is only flushed, the unit commits it with everything
+        else it wrote and notifies the listeners once it did.
+
+        Args:
+            table_name (str): The name of the table that was written to.
+        """
+        pending_writes = getattr(self._local, "pending_writes", None)
+        if pending_writes is not None:
+            self.session.flush()
+            pending_writes.add(table_name)
+            return
+        self.session.commit()
+        self.notify_write(table_name)
+
     def commit(self):
         """
         Commit the current transaction.
@@ -106,7 +328,7 @@ class DatabaseEngine(object):
         table = self.get_table(name=table_name)
         self.session.execute(update(table).where(
             table.id == row_id).values(**values))
-        self.session.commit()
+        self.finish_write(table_name)
 
     def insert(self, table_name: str = None, values: dict = None):
         """
@@ -114,7 +336,7 @@ class DatabaseEngine(object):
 
         This function first checks if a record with the same values already exists.
         If found, it updates the existing record; otherwise, it inserts a new record.
-        Finally, it commits the transaction.
+        Finally, it commits the transaction (see :meth:`finish_write`).
 
         Args:
             table_name (str): The name of the table where the record will be inserted.
@@ -122,6 +344,9 @@ class DatabaseEngine(object):
 
         Raises:
             ValueError: If the provided values are invalid or table_name is invalid (handled within get_table).
+
+        Returns:
+            The id of the inserted or updated record.
         """
         if not values or not isinstance(values, dict):
             raise ValueError("Invalid Insert values!")
@@ -137,8 +362,70 @@ class DatabaseEngine(object):
             row_id = row_by_id.id
             self.update(table_name=table_name, row_id=row_id, values=values)
         else:
-            self.session.execute(insert(table).values(**values))
-        self.session.commit()
+            result = self.session.execute(insert(table).values(**values))
+            row_id = result.inserted_primary_key[0]
+            self.finish_write(table_name)
+        return row_id
+
+    def upsert(self, table_name: str = None, rows: list = None, index_elements: list = None, returning: list = None):
+        """
+        Insert records into the specified table, updating any that already exist.
+
+        All rows are sent in a single ``INSERT ... ON CONFLICT DO UPDATE`` statement, so the
+        cost is one round trip regardless of how many rows are written.
+
+        Args:
+            table_name (str): The name of the table where the records will be written.
+            rows (list): A list of dictionaries of column names and values. Every row must share the same keys.
+            index_elements (list): The columns of the unique constraint used to detect existing rows. Defaults to ["id"].
+            returning (list): Columns to return for every written row, e.g. ["id"] for generated ids.
+
+        Raises:
+            ValueError: If the provided rows are invalid or table_name is invalid (handled within get_table).
+
+        Returns:
+            list: The ``returning`` columns of every inserted or updated row, empty without ``returning``.
+        """
+        if not rows or not isinstance(rows, list):
+            raise ValueError("Invalid Upsert values!")
+        index_elements = index_elements or ["id"]
+        table = self.get_table(name=table_name)
+        statement = postgresql.insert(table.__table__).values(rows)
+        update_values = {
+            column: statement.excluded[column] for column in rows[0] if column not in index_elements
+        }
+        if update_values:
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements, set_=update_values)
+        else:
+            statement = statement.on_conflict_do_nothing(
+                index_elements=index_elements)
+        if returning:
+            statement = statement.returning(
+                *[table.__table__.c[column] for column in returning])
+        result = self.session.execute(statement)
+        returned = result.fetchall() if returning else list()
+        self.finish_write(table_name)
+        return returned
+
+    def delete(self, table_name: str = None, filter_dict: dict = None):
+        """
+        Delete all records from the specified table where the columns match the given filter dictionary.
+
+        Args:
+            table_name (str): The name of the table to delete from.
+            filter_dict (dict): A dictionary mapping column names to filter values.
+
+        Raises:
+            ValueError: If no filter dictionary is provided or table_name is invalid (handled within get_table).
+        """
+        if not filter_dict:
+            raise ValueError("A filter dictionary must be provided.")
+        table = self.get_table(name=table_name)
+        conditions = [table.__table__.c[col_name] ==
+                      value for col_name, value in filter_dict.items()]
+        self.session.execute(delete(table.__table__).where(and_(*conditions)))
+        self.finish_write(table_name)
 
     def get_all(self, table_name: str = None):
         """
@@ -154,7 +441,8 @@ class DatabaseEngine(object):
             list: A list of all records in the table.
         """
         table = self.get_table(name=table_name)
-        result = self.session.query(table).all()
+        result = self.cached_read(
+            table_name, ("all",), lambda: self.session.query(table).all())
         return result
 
     def get_by_id(self, table_name: str = None, row_id: int = None):
@@ -174,7 +462,8 @@ class DatabaseEngine(object):
         if row_id is None:
             return None
         table = self.get_table(name=table_name)
-        result = self.session.query(table).filter_by(id=row_id).first()
+        result = self.cached_read(
+            table_name, ("id", row_id), lambda: self.session.query(table).filter_by(id=row_id).first())
         return result
 
     def get_by_column_value(self, table_name: str = None, column_name: str = None, column_value: Any = None):
@@ -194,7 +483,34 @@ class DatabaseEngine(object):
         """
         table = self.get_table(name=table_name)
         column = table.__table__.c[column_name]
-        result = self.session.query(table).filter(column == column_value).all()
+        result = self.cached_read(
+            table_name, ("column", column_name, repr(column_value)),
+            lambda: self.session.query(table).filter(column == column_value).all())
+        return result
+
+    def get_by_column_values(self, table_name: str = None, column_name: str = None, column_values: list = None):
+        """
+        Retrieve all records from the specified table where a column matches any of the given values.
+
+        Args:
+            table_name (str): The name of the table to query.
+            column_name (str): The name of the column to filter by.
+            column_values (list): The values to match in the specified column.
+
+        Raises:
+            ValueError: If the table_name is invalid (handled within get_table).
+
+        Returns:
+            list: A list of records that match any of the given values.
+        """
+        table = self.get_table(name=table_name)
+        column = table.__table__.c[column_name]
+        column_values = sorted(set(column_values or list()))
+        if not column_values:
+            return list()
+        result = self.cached_read(
+            table_name, ("column_in", column_name, repr(column_values)),
+            lambda: self.session.query(table).filter(column.in_(column_values)).all())
         return result
 
     def get_by_column_value_multiple(self, table_name: str = None, filter_dict: dict = None):
@@ -224,6 +540,8 @@ class DatabaseEngine(object):
                       value for col_name, value in filter_dict.items()]
 
         # Query the table filtering on all conditions. You can use *conditions to unpack the list.
-        result = self.session.query(table).filter(*conditions).first()
+        key = ("columns", repr(sorted(filter_dict.items())))
+        result = self.cached_read(
+            table_name, key, lambda: self.session.query(table).filter(*conditions).first())
 
         return result
@@ -0,0 +1,332 @@
+import time
+from classes.espn.base import Position
+from classes.espn.settings import DraftSettings, RosterSettings
+from classes.instrumentation import metrics
+from classes.player_stats import load_numpy, projected_stats
+from classes.rankings import projected_points
+
+SNAKE_DRAFT = "SNAKE"
+AUCTION_DRAFT = "AUCTION"
+
+# ESPN publishes an average draft position but no spread, picks are drawn around it with this share of it
+ADP_SPREAD = 0.2
+
+# Share of the time per selection spent simulating, the rest is left to the drafter
+SIMULATION_TIME_SHARE = 0.5
+
+# Simulations are drawn in batches so the time budget is checked between them
+SIMULATION_BATCH = 250
+
+MIN_AUCTION_BID = 1
+
+
+def roster_rounds(roster_settings: RosterSettings = None):
+    """
+    Count the players every team drafts, one per lineup slot except the injured list.
+    """
+    return sum(slot.slot_count for slot in roster_settings.lineup_slot_counts
+               if slot.position_id != Position.INJURED_LIST.id)
+
+
+def draft_pool_row(player_data: dict = None, weights: dict = None, season: int = None):
+    """
+    Reduce a ``kona_player_info`` entry to what the draft engine ranks players by.
+    """
+    player = player_data.get("player", dict())
+    ownership = player.get("ownership", dict())
+    return {
+        "id": player_data.get("id", player.get("id")),
+        "name": player.get("fullName"),
+        "eligible_slots": sorted(player.get("eligibleSlots", list())),
+        "adp": ownership.get("averageDraftPosition"),
+        "auction_value": ownership.get("auctionValueAverage"),
+        "value": projected_points(projected_stats(player, season), weights),
+    }
+
+
+def pick_order(draft_settings: DraftSettings = None, rounds: int = None):
+    """
+    Build the team on the clock for every pick of the draft.
+
+    Snake drafts reverse the order every other round, any other order type repeats it. Auctions have
+    no order.
+
+    Returns:
+        list: Team ids by overall pick.
+    """
+    if draft_settings.type == AUCTION_DRAFT:
+        return list()
+    teams = [order._team_id for order in sorted(
+        draft_settings.pick_order, key=lambda order: order.position)]
+    picks = []
+    for round_index in range(rounds):
+        reverse = draft_settings.type == SNAKE_DRAFT and round_index % 2 == 1
+        picks += teams[::-1] if reverse else teams
+    return picks
+
+
+class DraftEngine(object):
+    def __init__(self, draft_settings: DraftSettings = None, players: list = None, rounds: int = None,
+                 team_id: int = None, simulations: int = 2000, pool_size: int = 300, candidates: int = 15,
+                 seed: int = None):
+        """
+        Initialize a live draft engine for one team.
+
+        The available players are kept in arrays (ADP, ADP spread, projected value) and every pick only
+        flips an availability flag. A recommendation draws the remaining picks of the other teams
+        thousands of times at once from a normal distribution around each player's ADP, so it knows how
+        likely every player is to survive to the team's next pick and what the best player left will be
+        worth. It stops drawing when ``time_per_selection`` is half spent. Auctions draw the same way
+        to estimate which players will be bought and what share of the money left they are worth.
+
+        Args:
+            draft_settings (DraftSettings): The league draft settings, driving the order type, pick
+                order, auction budget and time per selection.
+            players (list): Player dictionaries with ``id``, ``adp`` and ``value``, see ``draft_pool_row``.
+            rounds (int): The number of players every team drafts, see ``roster_rounds``.
+            team_id (int): The team recommendations are made for.
+            simulations (int): The maximum number of drafts drawn per recommendation. Defaults to 2000.
+            pool_size (int): The number of available players, by ADP, drawn in every simulation. Defaults to 300.
+            candidates (int): The number of most valuable players scored per recommendation. Defaults to 15.
+            seed (int): Seeds the simulations, for repeatable recommendations.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            raise ValueError("numpy is required to run the draft engine")
+        self.numpy = numpy
+        self.draft_settings = draft_settings
+        self.rounds = rounds
+        self.team_id = team_id
+        self.simulations = simulations
+        self.pool_size = pool_size
+        self.candidates = candidates
+        self.random = numpy.random.default_rng(seed)
+        self.is_auction = draft_settings.type == AUCTION_DRAFT
+        self.order = pick_order(draft_settings, rounds)
+        self.pick_index = 0
+        self.picks = []
+        teams = {order._team_id for order in draft_settings.pick_order}
+        if team_id is not None:
+            teams.add(team_id)
+        self.budgets = {team: draft_settings.auction_budget or 0 for team in teams}
+        self.roster_counts = {team: 0 for team in teams}
+
+        players = [player for player in players or list() if player.get("id") is not None]
+        self.players = players
+        self._index = {player["id"]: index for index, player in enumerate(players)}
+        # Players nobody drafts are placed after every player that has an ADP
+        last_adp = max([player["adp"] for player in players if player.get("adp")] or [0.0])
+        self.adp = numpy.array([player.get("adp") or last_adp + 1.0 + index
+                                for index, player in enumerate(players)], dtype=float)
+        self.spread = numpy.maximum(self.adp * ADP_SPREAD, 1.0)
+        self.value = numpy.array([player.get("value") or 0.0 for player in players], dtype=float)
+        self.available = numpy.ones(len(players), dtype=bool)
+
+    @property
+    def on_the_clock(self):
+        if self.is_auction or self.pick_index >= len(self.order):
+            return None
+        return self.order[self.pick_index]
+
+    def team_picks(self, team_id: int = None):
+        return [index for index in range(self.pick_index, len(self.order)) if self.order[index] == team_id]
+
+    def remove_player(self, player_id: int = None):
+        index = self._index.get(player_id)
+        if index is None or not self.available[index]:
+            raise ValueError(f"Player {player_id} is not available")
+        self.available[index] = False
+
+    def record_pick(self, player_id: int = None, team_id: int = None, bid: int = None):
+        """
+        Take a player out of the pool.
+
+        Args:
+            player_id (int): The player drafted.
+            team_id (int): The team drafting, required in auctions. Defaults to the team on the clock.
+            bid (int): The winning auction bid, taken from the team's budget.
+        """
+        if self.is_auction:
+            if team_id is None:
+                raise ValueError("Auction picks need the team that won the player")
+            self.remove_player(player_id)
+            self.budgets[team_id] = self.budgets.get(team_id, 0) - (bid or 0)
+        else:
+            if self.pick_index >= len(self.order):
+                raise ValueError("The draft is complete")
+            team_id = self.order[self.pick_index] if team_id is None else team_id
+            picks = self.team_picks(team_id)
+            if not picks:
+                raise ValueError(f"Team {team_id} has no picks left")
+            self.remove_player(player_id)
+            if picks[0] == self.pick_index:
+                self.pick_index += 1
+            else:
+                # Commissioners can draft out of turn, the team gives up its next pick instead
+                del self.order[picks[0]]
+        self.roster_counts[team_id] = self.roster_counts.get(team_id, 0) + 1
+        self.picks.append({"team_id": team_id, "player_id": player_id, "bid": bid})
+
+    def add_keepers(self, keepers: dict = None):
+        """
+        Take every team's keepers out of the pool before the draft starts.
+
+        Keepers use up a team's last rounds (or the keeper's cost in an auction), so the order of the
+        picks left is unchanged for everyone else.
+
+        Args:
+            keepers (dict): Team id to a list of player ids, or of (player id, auction cost) tuples.
+        """
+        for team_id, players in (keepers or dict()).items():
+            if len(players) > (self.draft_settings.keeper_count or 0):
+                raise ValueError(f"Team {team_id} has more keepers than the league allows")
+            for keeper in players:
+                player_id, cost = keeper if isinstance(keeper, tuple) else (keeper, None)
+                self.remove_player(player_id)
+                if self.is_auction:
+                    self.budgets[team_id] = self.budgets.get(team_id, 0) - (cost or 0)
+                else:
+                    picks = self.team_picks(team_id)
+                    if not picks:
+                        raise ValueError(f"Team {team_id} has no picks left")
+                    del self.order[picks[-1]]
+                self.roster_counts[team_id] = self.roster_counts.get(team_id, 0) + 1
+                self.picks.append({"team_id": team_id, "player_id": player_id, "bid": cost, "keeper": True})
+
+    def simulation_pool(self):
+        # The players the other teams can realistically take, plus the most valuable ones left
+        numpy = self.numpy
+        available = numpy.flatnonzero(self.available)
+        by_adp = available[numpy.argsort(self.adp[available], kind="stable")[:self.pool_size]]
+        by_value = available[numpy.argsort(-self.value[available], kind="stable")[:self.candidates]]
+        return numpy.union1d(by_adp, by_value)
+
+    def draw_ranks(self, pool=None, count: int = None):
+        """
+        Draw ``count`` orders in which the other teams take the pool.
+
+        Returns:
+            tuple: The pool positions by draft order and the draft order of every pool position, both sims x players.
+        """
+        numpy = self.numpy
+        noisy_adp = self.random.normal(self.adp[pool], self.spread[pool], size=(count, len(pool)))
+        order = numpy.argsort(noisy_adp, axis=1)
+        ranks = numpy.empty_like(order)
+        numpy.put_along_axis(ranks, order, numpy.arange(len(pool))[None, :].repeat(count, axis=0), axis=1)
+        return order, ranks
+
+    def deadline(self, time_budget: float = None):
+        if time_budget is None and self.draft_settings.time_per_selection:
+            time_budget = self.draft_settings.time_per_selection * SIMULATION_TIME_SHARE
+        return None if time_budget is None else time.monotonic() + time_budget
+
+    def recommend(self, time_budget: float = None, limit: int = 5):
+        """
+        Recommend the team's next pick, or its auction bids.
+
+        Every candidate is scored by its value, weighted by the chance it is still there at the team's
+        pick, plus the expected value of the best player left at the team's following pick if the
+        candidate is taken now.
+
+        Args:
+            time_budget (float): Seconds to simulate for. Defaults to half of ``time_per_selection``,
+                or ``simulations`` draws without a time limit.
+            limit (int): The number of recommendations returned. Defaults to 5.
+
+        Returns:
+            list: Dictionaries with the player, their value, survival probability and score, best
+            first. Auctions return the expected price and the team's maximum bid instead.
+        """
+        if not self.available.any():
+            return list()
+        if self.is_auction:
+            return self.recommend_bids(time_budget, limit)
+        numpy = self.numpy
+        picks = self.team_picks(self.team_id)
+        if not picks:
+            return list()
+        pool = self.simulation_pool()
+        # Picks made by the other teams before the team's pick and between it and the following one
+        before = picks[0] - self.pick_index
+        between = (picks[1] - picks[0] - 1) if len(picks) > 1 else None
+        candidates = numpy.argsort(-self.value[pool], kind="stable")[:self.candidates]
+        values = self.value[pool]
+        survived = numpy.zeros(len(candidates))
+        best_next = numpy.zeros(len(candidates))
+        drawn = 0
+        deadline = self.deadline(time_budget)
+        with metrics.span("draft_simulation", draft_type=self.draft_settings.type):
+            while drawn < self.simulations and (deadline is None or drawn == 0 or time.monotonic() < deadline):
+                count = min(SIMULATION_BATCH, self.simulations - drawn)
+                order, ranks = self.draw_ranks(pool, count)
+                rows = numpy.arange(count)
+                sorted_values = values[order]
+                for position, candidate in enumerate(candidates):
+                    candidate_ranks = ranks[:, candidate]
+                    survived[position] += (candidate_ranks >= before).sum()
+                    if between is None:
+                        continue
+                    # The candidate is on the team's roster, the others take the next players in drawn order
+                    remaining = sorted_values.copy()
+                    remaining[rows, candidate_ranks] = -numpy.inf
+                    best_left = numpy.maximum.accumulate(remaining[:, ::-1], axis=1)[:, ::-1]
+                    best_left = numpy.concatenate([best_left, numpy.zeros((count, 1))], axis=1)
+                    taken = before + between
+                    cutoff = numpy.minimum(taken + (candidate_ranks < taken), len(pool))
+                    best_next[position] += numpy.maximum(best_left[rows, cutoff], 0.0).sum()
+                drawn += count
+        survival = survived / drawn
+        expected_next = best_next / drawn
+        scores = survival * values[candidates] + expected_next
+        recommendations = [
+            {
+                "player": self.players[pool[candidate]],
+                "value": float(values[candidate]),
+                "survival": float(survival[position]),
+                "expected_next_value": float(expected_next[position]),
+                "score": float(scores[position]),
+                "simulations": drawn,
+            } for position, candidate in enumerate(candidates)
+        ]
+        return sorted(recommendations, key=lambda recommendation: -recommendation["score"])[:limit]
+
+    def recommend_bids(self, time_budget: float = None, limit: int = 5):
+        numpy = self.numpy
+        pool = self.simulation_pool()
+        values = self.value[pool]
+        # Roster spots and money left across the league, every spot costs at least the minimum bid
+        spots = sum(max(self.rounds - count, 0) for count in self.roster_counts.values())
+        money = sum(max(budget, 0) for budget in self.budgets.values())
+        spare_money = max(money - spots * MIN_AUCTION_BID, 0)
+        replacement = numpy.sort(values)[::-1][spots] if spots < len(pool) else 0.0
+        surplus = numpy.maximum(values - replacement, 0.0)
+        bought = numpy.zeros(len(pool))
+        prices = numpy.zeros(len(pool))
+        drawn = 0
+        deadline = self.deadline(time_budget)
+        with metrics.span("draft_simulation", draft_type=self.draft_settings.type):
+            while drawn < self.simulations and (deadline is None or drawn == 0 or time.monotonic() < deadline):
+                count = min(SIMULATION_BATCH, self.simulations - drawn)
+                _, ranks = self.draw_ranks(pool, count)
+                # The players the league fills its open spots with share the money left by their surplus value
+                drafted = ranks < spots
+                drafted_surplus = numpy.where(drafted, surplus[None, :], 0.0)
+                totals = numpy.maximum(drafted_surplus.sum(axis=1, keepdims=True), 1e-9)
+                bought += drafted.sum(axis=0)
+                prices += numpy.where(drafted, MIN_AUCTION_BID + spare_money * drafted_surplus / totals, 0.0).sum(axis=0)
+                drawn += count
+        expected_prices = numpy.where(bought > 0, prices / numpy.maximum(bought, 1), MIN_AUCTION_BID)
+        open_spots = max(self.rounds - self.roster_counts.get(self.team_id, 0), 0)
+        max_bid = max(self.budgets.get(self.team_id, 0) - (open_spots - 1) * MIN_AUCTION_BID, 0) if open_spots else 0
+        candidates = numpy.argsort(-values, kind="stable")[:self.candidates]
+        recommendations = [
+            {
+                "player": self.players[pool[candidate]],
+                "value": float(values[candidate]),
+                "drafted": float(bought[candidate] / drawn),
+                "expected_price": float(expected_prices[candidate]),
+                "max_bid": int(min(max_bid, round(expected_prices[candidate]))),
+                "simulations": drawn,
+            } for candidate in candidates if max_bid >= MIN_AUCTION_BID
+        ]
+        return recommendations[:limit]
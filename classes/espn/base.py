@@ -1,6 +1,13 @@
+import hashlib
+import json
 from enum import Enum
-from typing import Any
-from classes.database import DatabaseEngine
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from classes.database import DatabaseEngine
+
+# Stores a checksum of each reference enumeration as last written, see ESPNEnum.write_all_to_database
+CHECKSUM_TABLE = "reference_checksums"
 
 
 class ESPNObject:
@@ -66,6 +73,22 @@ class ESPNObject:
                           value in self.__dict__.items() if f"{key}".lower() != "data")
         return f"'{self.__class__.__name__}': {{{attrs}}}"
 
+    def iter_objects(self):
+        """
+        Iterate over this object and every ESPNObject nested in its serialized attributes, depth first.
+
+        :return: A generator of ESPNObject instances.
+        :rtype: Iterator[ESPNObject]
+        """
+        yield self
+        for val in self.serialize().values():
+            if isinstance(val, ESPNObject):
+                yield from val.iter_objects()
+            elif isinstance(val, (list, set, dict)):
+                for item in (val.values() if isinstance(val, dict) else val):
+                    if isinstance(item, ESPNObject):
+                        yield from item.iter_objects()
+
     def serialize_for_db(self):
         db_serialized_object = {}
         for key, val in self.serialize().items():
@@ -91,7 +114,7 @@ class ESPNObject:
             serialized_object[key] = val
         return serialized_object
 
-    def read_database_id(self, engine: DatabaseEngine, table: str = None, data: dict = None):
+    def read_database_id(self, engine: "DatabaseEngine", table: str = None, data: dict = None):
         if engine is None:
             return None
 
@@ -105,7 +128,7 @@ class ESPNObject:
         except Exception as exc:
             print(exc)
 
-    def write_to_database(self, engine: DatabaseEngine, table: str = None, ignore_children: bool = False):
+    def write_to_database(self, engine: "DatabaseEngine", table: str = None, ignore_children: bool = False):
         if engine is None:
             return None
 
@@ -209,15 +232,68 @@ class ESPNEnum(ESPNObject, Enum):
         return cls.DEFAULT
 
     @classmethod
-    def write_all_to_database(cls, engine):
-        table = None
+    def database_table(cls):
+        """
+        The reference table the enumeration is stored in.
 
+        :return: The table name, or None if the enumeration is not stored.
+        :rtype: str
+        """
         if cls is Stat:
-            table = "stats"
+            return "stats"
         if cls is Position:
-            table = "positions"
-        for member in cls:
-            member.write_to_database(engine, table)
+            return "positions"
+        return None
+
+    @classmethod
+    def database_rows(cls):
+        """
+        Serialize every member of the enumeration as a row of its reference table.
+
+        :return: One dictionary per member, ordered by id.
+        :rtype: list
+        """
+        return sorted(
+            ({"id": member.id, "shorthand": member.shorthand, "label": member.label} for member in cls),
+            key=lambda row: row["id"]
+        )
+
+    @classmethod
+    def checksum(cls):
+        """
+        Hash the definition of the enumeration, so a changed member changes the checksum.
+
+        :return: The SHA-256 hex digest of the serialized rows.
+        :rtype: str
+        """
+        encoded = json.dumps(cls.database_rows(), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def write_all_to_database(cls, engine, force: bool = False):
+        """
+        Sync every member of the enumeration to its reference table with a single bulk upsert.
+
+        The checksum of the definitions is stored in ``reference_checksums`` after each write, and the
+        write is skipped entirely while the stored checksum still matches.
+
+        :param engine: The database engine to write through.
+        :type engine: DatabaseEngine
+        :param force: Write even if the stored checksum matches.
+        :type force: bool
+        :return: Whether the table was written.
+        :rtype: bool
+        """
+        table = cls.database_table()
+        if engine is None or table is None:
+            return False
+        checksum = cls.checksum()
+        stored = engine.get_by_id(CHECKSUM_TABLE, table)
+        if not force and stored is not None and stored.checksum == checksum:
+            return False
+        engine.upsert(table, cls.database_rows())
+        engine.upsert(CHECKSUM_TABLE, [{"id": table, "checksum": checksum}])
+        return True
 
 
 class Position(ESPNEnum):
@@ -3,6 +3,7 @@ from classes.espn.division import Division
 from classes.espn.member import Member
 from classes.espn.team import Team
 from classes.espn.base import ESPNObject
+from classes.instrumentation import metrics
 
 
 class League(ESPNObject):
@@ -10,6 +11,10 @@ class League(ESPNObject):
         self._data = data
 
     def parse_league_data(self):
+        with metrics.span("parse", object=self.__class__.__name__):
+            self.parse_league_fields()
+
+    def parse_league_fields(self):
         self.id = self._data.get("id", None)
         self.season_id = self._data.get("seasonId", None)
         self.segment_id = self._data.get("segmentId", None)
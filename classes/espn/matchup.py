@@ -0,0 +1,114 @@
+from classes.espn.base import ESPNObject
+from classes.instrumentation import metrics
+
+
+class MatchupObject(ESPNObject):
+    default_read_value = None
+
+    """
+    Base class for matchup objects.
+
+    This class provides common functionality for reading and parsing data from a dictionary.
+    Subclasses should override :meth:`parse_data` to implement custom parsing logic.
+    """
+
+    def __init__(self, data: dict = None, parse_data: bool = True):
+        """
+        Initialize a new MatchupObject instance.
+
+        :param data: Dictionary containing the matchup data returned by the ESPN API.
+        :type data: dict, optional
+        :param parse_data: If True, automatically parse the data by calling :meth:`parse_data`.
+        :type parse_data: bool, optional
+        """
+        self._data = data
+        if parse_data:
+            with metrics.span("parse", object=self.__class__.__name__):
+                self.parse_data()
+
+
+class RosterSlot(ESPNObject):
+    _database_table = "rosters"
+
+    def __init__(self, team_id: int = None, player_id: int = None, lineup_slot_id: int = None):
+        self.team_id = team_id
+        self.player_id = player_id
+        self.lineup_slot_id = lineup_slot_id
+
+
+class MatchupPlayerScore(ESPNObject):
+    _database_table = "matchup_player_scores"
+
+    def __init__(self, matchup_id: int = None, team_id: int = None, player_id: int = None,
+                 scoring_period_id: int = None, lineup_slot_id: int = None, points: float = 0.0):
+        self.matchup_id = matchup_id
+        self.team_id = team_id
+        self.player_id = player_id
+        self.scoring_period_id = scoring_period_id
+        self.lineup_slot_id = lineup_slot_id
+        self.points = points
+
+
+class Matchup(MatchupObject):
+    _database_table = "matchups"
+
+    """
+    Class representing a single head-to-head matchup from the league schedule.
+
+    Parses both sides of the matchup along with the per-player scores for the current
+    scoring period when the boxscore view is included in the response.
+    """
+
+    def __init__(self, data: dict = None, scoring_period_id: int = None, parse_data: bool = True):
+        self._scoring_period_id = scoring_period_id
+        super().__init__(data=data, parse_data=parse_data)
+
+    def parse_data(self):
+        self.id = self.read_data("id")
+        self.matchup_period_id = self.read_data("matchupPeriodId")
+        self.winner = self.read_data("winner", "UNDECIDED")
+        home_data = self.read_data("home", dict())
+        away_data = self.read_data("away", dict())
+        self.home_team_id = home_data.get("teamId")
+        self.away_team_id = away_data.get("teamId")
+        self.home_score = self.parse_team_score(home_data)
+        self.away_score = self.parse_team_score(away_data)
+        self._player_scores = self.parse_player_scores(home_data) + \
+            self.parse_player_scores(away_data)
+        self._roster_slots = self.parse_roster_slots(home_data) + \
+            self.parse_roster_slots(away_data)
+
+    def parse_team_score(self, team_data: dict = None):
+        # totalPointsLive is only present while games for the period are in progress
+        return team_data.get("totalPointsLive", team_data.get("totalPoints", 0.0))
+
+    def read_roster_entries(self, team_data: dict = None):
+        return team_data.get("rosterForCurrentScoringPeriod", dict()).get("entries", list())
+
+    def parse_player_scores(self, team_data: dict = None):
+        return [
+            MatchupPlayerScore(
+                matchup_id=self.id,
+                team_id=team_data.get("teamId"),
+                player_id=entry.get("playerId"),
+                scoring_period_id=self._scoring_period_id,
+                lineup_slot_id=entry.get("lineupSlotId"),
+                points=entry.get("playerPoolEntry", dict()).get(
+                    "appliedStatTotal", 0.0)
+            ) for entry in self.read_roster_entries(team_data)
+        ]
+
+    def parse_roster_slots(self, team_data: dict = None):
+        return [
+            RosterSlot(
+                team_id=team_data.get("teamId"),
+                player_id=entry.get("playerId"),
+                lineup_slot_id=entry.get("lineupSlotId")
+            ) for entry in self.read_roster_entries(team_data)
+        ]
+
+    def get_player_scores(self):
+        return self._player_scores
+
+    def get_roster_slots(self):
+        return self._roster_slots
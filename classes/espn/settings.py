@@ -1,6 +1,7 @@
 from typing import Any
 from utilities.espn import get_position, get_stat, convert_epoch_to_date
 from classes.espn.base import ESPNObject, Position, Stat
+from classes.instrumentation import metrics
 
 
 class SettingsObject(ESPNObject):
@@ -24,7 +25,8 @@ class SettingsObject(ESPNObject):
         """
         self._data = data
         if parse_data:
-            self.parse_data()
+            with metrics.span("parse", object=self.__class__.__name__):
+                self.parse_data()
 
 
 class SettingsObjectValue(SettingsObject):
@@ -112,6 +114,8 @@ class DraftSettingsPickOrder(SettingsObjectValue):
     def __init__(self, team_id: int = None, position: int = None, draft_settings: Any = None):
         self.position = position
         # self.team_id = team_id
+        # Kept out of the database row, the draft engine needs it to build the pick order
+        self._team_id = team_id
         self._parent = draft_settings
 
 
@@ -1,4 +1,5 @@
 from classes.espn.base import ESPNObject
+from classes.instrumentation import metrics
 
 
 class TeamObject(ESPNObject):
@@ -22,7 +23,8 @@ class TeamObject(ESPNObject):
         """
         self._data = data
         if parse_data:
-            self.parse_data()
+            with metrics.span("parse", object=self.__class__.__name__):
+                self.parse_data()
 
 
 class TeamOwner(TeamObject):
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+DEFAULT_HISTORY_SIZE = 10000
+
+
+class EventHub(object):
+    def __init__(self, history_size: int = DEFAULT_HISTORY_SIZE):
+        """
+        Initialize a hub that fans per-entity deltas out to any number of live subscribers.
+
+        Every published delta gets the next sequence number and is encoded as a server-sent-events
+        frame exactly once. The most recent frames are kept in a bounded history so a client that
+        reconnects with its last sequence number only receives what it missed. Subscribers all wait
+        on one shared future, so an idle subscriber holds no queue and costs nothing per event.
+
+        Args:
+            history_size (int): The number of recent events kept for resuming clients. Defaults to 10000.
+        """
+        self._history = deque(maxlen=history_size)
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._changed = None
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def attach(self, loop: asyncio.AbstractEventLoop = None):
+        """
+        Bind the hub to the event loop its subscribers run on.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop serving the subscribers.
+        """
+        self._loop = loop
+        self._changed = loop.create_future()
+
+    def encode_event(self, sequence: int = None, delta: dict = None):
+        payload = {
+            "seq": sequence,
+            "action": delta.get("action"),
+            "key": delta.get("key"),
+            "values": delta.get("values"),
+        }
+        data = json.dumps(payload, separators=(",", ":"), default=str)
+        return f"id: {sequence}\nevent: {delta.get('entity')}\ndata: {data}\n\n".encode("utf-8")
+
+    def publish(self, deltas: list = None):
+        """
+        Assign sequence numbers to a batch of deltas and wake every subscriber.
+
+        Safe to call from any thread, so sync writers and pollers can publish directly.
+
+        Args:
+            deltas (list): Dictionaries with ``entity``, ``action``, ``key`` and ``values`` entries.
+        """
+        if not deltas:
+            return
+        with self._lock:
+            for delta in deltas:
+                self._sequence += 1
+                self._history.append(
+                    (self._sequence, self.encode_event(self._sequence, delta)))
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        changed, self._changed = self._changed, self._loop.create_future()
+        if not changed.done():
+            changed.set_result(None)
+
+    def read_since(self, last_sequence: int = 0):
+        """
+        Retrieve the encoded events published after the given sequence number.
+
+        Returns:
+            tuple: A flag that is True when events after last_sequence have already left the history and
+            the client must reload, followed by the list of ``(sequence, frame)`` pairs to send. A sequence
+            ahead of the hub was issued before a restart, so that client must reload as well.
+        """
+        with self._lock:
+            # Sequence numbers restart with the process, a client's last id may be from a previous run
+            if last_sequence > self._sequence:
+                return True, list(self._history)
+            if not self._history or last_sequence == self._sequence:
+                return False, []
+            first_sequence = self._history[0][0]
+            if last_sequence < first_sequence - 1:
+                return True, list(self._history)
+            # Indexing from the right keeps this proportional to the missed events, not the history
+            history_size = len(self._history)
+            missed = self._sequence - last_sequence
+            return False, [self._history[index] for index in range(history_size - missed, history_size)]
+
+    async def wait(self, timeout: float = None):
+        """
+        Wait until the next batch of events is published or the timeout expires.
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(self._changed), timeout)
+        except asyncio.TimeoutError:
+            pass
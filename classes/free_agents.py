@@ -0,0 +1,194 @@
+import time
+import threading
+from classes.instrumentation import metrics
+from classes.player_stats import projected_stats
+
+POOL_STATUSES = ["FREEAGENT", "WAIVERS"]
+
+
+def free_agent_row(player_data: dict = None, season: int = None):
+    """
+    Reduce a ``kona_player_info`` entry to the fields the watcher tracks, with the projection of the given season.
+    """
+    player = player_data.get("player", dict())
+    return {
+        "id": player_data.get("id", player.get("id")),
+        "name": player.get("fullName"),
+        "pro_team_id": player.get("proTeamId"),
+        "eligible_slots": sorted(player.get("eligibleSlots", list())),
+        "status": player_data.get("status"),
+        "injury_status": player.get("injuryStatus"),
+        "percent_owned": player.get("ownership", dict()).get("percentOwned"),
+        "on_team_id": player_data.get("onTeamId"),
+        "projected_stats": projected_stats(player, season),
+    }
+
+
+class FreeAgentWatcher(object):
+    def __init__(self, api=None, interval: float = 60.0, full_refresh_every: int = 30, movers_limit: int = 50):
+        """
+        Initialize a watcher that keeps the league's free-agent pool current without downloading it every poll.
+
+        The first poll downloads the whole pool (free agents and players on waivers) and indexes it by
+        player id. Later polls only download the rostered players, which are a small fraction of the
+        universe: players who became rostered left the pool and players who are no longer rostered joined
+        it. The free agents whose ownership moved the most are fetched with the ownership change sort to
+        catch status changes. Every ``full_refresh_every`` polls the whole pool is downloaded again to
+        pick up changes the cheap polls cannot see.
+
+        Each poll publishes only the players who joined, left or changed, as deltas with ``entity``
+        "free_agent" and ``action`` "join", "leave" or "update".
+
+        Args:
+            api (FantasyBaseballAPI): The API client used to fetch players.
+            interval (float): The number of seconds between the start of each poll. Defaults to 60.
+            full_refresh_every (int): Download the full pool on every n-th poll. Defaults to 30.
+            movers_limit (int): The number of ownership movers fetched on the cheap polls. Defaults to 50.
+        """
+        self.api = api
+        self.interval = interval
+        self.full_refresh_every = full_refresh_every
+        self.movers_limit = movers_limit
+        self.polls = 0
+        self._pool = {}
+        self._rostered = None
+        self._subscribers = []
+
+    @property
+    def season(self):
+        return int(self.api.season)
+
+    @property
+    def pool(self):
+        return self._pool
+
+    def subscribe(self, callback):
+        """
+        Register a callable that receives the list of deltas produced by every poll that changed something.
+
+        Args:
+            callback (callable): A function accepting a single list of delta dictionaries.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, deltas: list = None):
+        if not deltas:
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(deltas)
+            except Exception as exc:
+                print(f"FreeAgentWatcher subscriber {callback} failed\n{exc}\n\n")
+
+    def fetch_pool(self):
+        filters = {
+            "players": {
+                "filterStatus": {"value": POOL_STATUSES}
+            }
+        }
+        rows = [free_agent_row(player_data, self.season) for player_data in self.api.get_players(filters=filters)]
+        return {row["id"]: row for row in rows}
+
+    def fetch_rostered(self):
+        return {player_data.get("id", player_data.get("player", dict()).get("id"))
+                for player_data in self.api.get_players_on_team()}
+
+    def join(self, row: dict = None):
+        self._pool[row["id"]] = row
+        return {"entity": "free_agent", "action": "join", "key": {"id": row["id"]}, "values": row, "row": row}
+
+    def leave(self, player_id: int = None):
+        del self._pool[player_id]
+        return {"entity": "free_agent", "action": "leave", "key": {"id": player_id}, "values": {}}
+
+    def update(self, row: dict = None):
+        previous_row = self._pool.get(row["id"], dict())
+        changes = {
+            key: val for key, val in row.items() if previous_row.get(key) != val
+        }
+        if not changes:
+            return None
+        self._pool[row["id"]] = row
+        return {"entity": "free_agent", "action": "update", "key": {"id": row["id"]}, "values": changes, "row": row}
+
+    def diff_pool(self, pool: dict = None):
+        deltas = []
+        for player_id in [player_id for player_id in self._pool if player_id not in pool]:
+            deltas.append(self.leave(player_id))
+        for player_id, row in pool.items():
+            if player_id not in self._pool:
+                deltas.append(self.join(row))
+                continue
+            delta = self.update(row)
+            if delta is not None:
+                deltas.append(delta)
+        return deltas
+
+    def diff_rostered(self, rostered: set = None):
+        deltas = []
+        for player_id in rostered:
+            if player_id in self._pool:
+                deltas.append(self.leave(player_id))
+        dropped = self._rostered - rostered
+        if dropped:
+            for player_data in self.api.get_players_by_id(sorted(dropped)):
+                row = free_agent_row(player_data, self.season)
+                if row["status"] in POOL_STATUSES and row["id"] not in self._pool:
+                    deltas.append(self.join(row))
+        return deltas
+
+    def diff_movers(self):
+        deltas = []
+        for player_data in self.api.get_free_agent_movers(limit=self.movers_limit):
+            row = free_agent_row(player_data, self.season)
+            if row["status"] not in POOL_STATUSES:
+                continue
+            delta = self.join(row) if row["id"] not in self._pool else self.update(row)
+            if delta is not None:
+                deltas.append(delta)
+        return deltas
+
+    def poll(self):
+        """
+        Bring the pool up to date and publish what changed.
+
+        Returns:
+            list: The deltas produced by this poll, in the order they were published.
+        """
+        full_refresh = self._rostered is None or self.polls % self.full_refresh_every == 0
+        with metrics.span("free_agent_poll", full=full_refresh):
+            rostered = self.fetch_rostered()
+            if full_refresh:
+                deltas = self.diff_pool(self.fetch_pool())
+            else:
+                deltas = self.diff_rostered(rostered) + self.diff_movers()
+        self._rostered = rostered
+        self.polls += 1
+        self.publish(deltas)
+        return deltas
+
+    def run(self, stop_event: threading.Event = None, max_polls: int = None):
+        """
+        Poll on the configured interval until the stop event is set or max_polls is reached.
+
+        Args:
+            stop_event (threading.Event): Set from another thread to stop polling. Defaults to never stopping.
+            max_polls (int): The maximum number of polls to run. Defaults to unlimited.
+        """
+        stop_event = stop_event or threading.Event()
+        polls = 0
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception as exc:
+                print(f"FreeAgentWatcher failed to poll\n{exc}\n\n")
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            stop_event.wait(
+                max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,235 @@
+import re
+import threading
+import time
+from collections import defaultdict
+
+STATEMENT_TABLE_PATTERN = re.compile(
+    r'\b(?:FROM|INTO|UPDATE)\s+"?(\w+)"?', re.IGNORECASE)
+
+METRIC_PREFIX = "fantasy_baseball"
+
+
+class NullSpan(object):
+    """
+    Span returned while instrumentation is disabled. Entering and exiting it does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(object):
+    def __init__(self, instrumentation=None, key: tuple = None):
+        self.instrumentation = instrumentation
+        self.key = key
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrumentation.record(
+            self.key, time.perf_counter() - self.started)
+        return False
+
+
+def span_key(name: str = None, labels: dict = None):
+    return (name, tuple(sorted(labels.items())))
+
+
+def escape_label(value=None):
+    # Prometheus label values escape backslashes, double quotes and line feeds
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: tuple = None):
+    if not labels:
+        return ""
+    escaped = ",".join(
+        f'{key}="{escape_label(value)}"' for key, value in labels)
+    return f"{{{escaped}}}"
+
+
+class Instrumentation(object):
+    def __init__(self):
+        """
+        Initialize a collector of timed spans and counters for a sync run.
+
+        Instrumentation starts disabled. While disabled, :meth:`span` hands back one shared no-op
+        context manager, :meth:`increment` returns immediately and no database event listeners are
+        attached, so instrumented code paths cost a method call and an attribute check. Spans and
+        counters are recorded under a lock, since pipeline workers and pollers record from many threads.
+        """
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._engines = []
+        self._attached = set()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard everything recorded so far.
+        """
+        with self._lock:
+            self.spans = defaultdict(lambda: [0, 0.0, 0.0])
+            self.counters = defaultdict(float)
+            self.started = time.time()
+
+    def enable(self):
+        """
+        Start recording spans and counters, including every statement of registered database engines.
+        """
+        self.enabled = True
+        for engine in self._engines:
+            self.attach_engine(engine)
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name: str = None, **labels):
+        """
+        Time the enclosed block under the given name and labels.
+
+        Args:
+            name (str): The span name, e.g. "api_request".
+            **labels: Labels that split the span, e.g. ``view="league:mTeam"``.
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, span_key(name, labels))
+
+    def record(self, key: tuple = None, duration: float = 0.0):
+        with self._lock:
+            aggregate = self.spans[key]
+            aggregate[0] += 1
+            aggregate[1] += duration
+            aggregate[2] = max(aggregate[2], duration)
+
+    def increment(self, name: str = None, value: float = 1, **labels):
+        """
+        Add to a counter, e.g. round trips or rows written.
+        """
+        if not self.enabled:
+            return
+        key = span_key(name, labels)
+        with self._lock:
+            self.counters[key] += value
+
+    def snapshot(self):
+        """
+        Copy the spans and counters recorded so far, so they can be rendered while threads keep recording.
+
+        Returns:
+            tuple: Span key to (count, total, longest) and counter key to value.
+        """
+        with self._lock:
+            return {key: tuple(aggregate) for key, aggregate in self.spans.items()}, dict(self.counters)
+
+    def register_engine(self, engine=None):
+        """
+        Remember a SQLAlchemy engine so its statements are timed whenever instrumentation is enabled.
+
+        Listeners are only attached once instrumentation is enabled, so a disabled run has no
+        per-statement overhead at all.
+        """
+        self._engines.append(engine)
+        if self.enabled:
+            self.attach_engine(engine)
+
+    def attach_engine(self, engine=None):
+        if id(engine) in self._attached:
+            return
+        from sqlalchemy import event
+        self._attached.add(id(engine))
+        event.listen(engine, "before_cursor_execute",
+                     self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute",
+                     self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("instrumentation_started", []).append(
+            time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["instrumentation_started"].pop()
+        if not self.enabled:
+            return
+        statement_type = statement.lstrip().split(None, 1)[0].upper()
+        table_match = STATEMENT_TABLE_PATTERN.search(statement)
+        table = table_match.group(1) if table_match else ""
+        self.record(span_key("db_statement", {"type": statement_type, "table": table}),
+                    time.perf_counter() - started)
+        self.increment("db_round_trips", type=statement_type)
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            self.increment("db_rows", cursor.rowcount,
+                           type=statement_type, table=table)
+
+    def summary(self):
+        """
+        Render a human readable summary of the run, slowest spans first.
+
+        Returns:
+            str: The summary.
+        """
+        spans, counters = self.snapshot()
+        lines = [f"{'span':<70} {'count':>8} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for (name, labels), (count, total, longest) in sorted(spans.items(), key=lambda item: -item[1][1]):
+            label = f"{name}{format_labels(labels)}"
+            lines.append(
+                f"{label:<70} {count:>8} {total:>10.3f} {total / count * 1000:>10.2f} {longest * 1000:>10.2f}")
+        lines.append("")
+        lines.append(f"{'counter':<70} {'value':>8}")
+        for (name, labels), value in sorted(counters.items()):
+            label = f"{name}{format_labels(labels)}"
+            lines.append(f"{label:<70} {value:>8g}")
+        return "\n".join(lines)
+
+    def to_prometheus(self):
+        """
+        Render every span and counter in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        spans, counters = self.snapshot()
+        lines = []
+        span_names = sorted({name for name, _ in spans})
+        for span_name in span_names:
+            metric = f"{METRIC_PREFIX}_{span_name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (name, labels), (count, total, longest) in sorted(spans.items()):
+                if name != span_name:
+                    continue
+                lines.append(f"{metric}_count{format_labels(labels)} {count}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for (name, labels), (count, total, longest) in sorted(spans.items()):
+                if name == span_name:
+                    lines.append(f"{metric}_max{format_labels(labels)} {longest:.6f}")
+        counter_names = sorted({name for name, _ in counters})
+        for counter_name in counter_names:
+            metric = f"{METRIC_PREFIX}_{counter_name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == counter_name:
+                    lines.append(f"{metric}{format_labels(labels)} {value:g}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_started_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_started_seconds {self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = None):
+        with open(path, "w") as outfile:
+            outfile.write(self.to_prometheus())
+
+
+metrics = Instrumentation()
@@ -1,44 +1,289 @@
-from classes.database import DatabaseEngine
-from classes.api import FantasyBaseballAPI
 from classes.espn.league import League
+from classes.instrumentation import metrics
+import contextlib
+import hashlib
+import json
 from classes.espn.base import Stat, Position
-from settings import PRO_TEAM_MAP, POSITION_MAP, UTIL_POSITIONS
+from utilities.espn import convert_epoch_to_date
+from settings import PRO_TEAM_MAP, POSITION_MAP, UTIL_POSITIONS, SNAPSHOT_DIRECTORY, PLAYER_SEARCH_INDEX, PROJECTION_DIRECTORY
+
+# The API client, database engine, snapshot archive and event hub pull in requests, SQLAlchemy,
+# sqlite3 and asyncio. They are imported and built on first use so short jobs only pay for what they touch.
 
 
 class FantasyBaseballInterface:
-    def __init__(self, league_id: str = None, espn_s2: str = None, swid: str = None, season: int = None, db_connection_string: str = None):
+    def __init__(self, league_id: str = None, espn_s2: str = None, swid: str = None, season: int = None, db_connection_string: str = None,
+                 snapshot_directory: str = SNAPSHOT_DIRECTORY, api=None,
+                 memory_profiler=None):
         self.league_id = league_id
         self.espn_s2 = espn_s2
         self.swid = swid
         self.season = season
         self.db_connection_string = db_connection_string
-        self.initialize_tools()
+        self.snapshot_directory = snapshot_directory
+        # A ReplayAPI here runs every sync offline from archived responses
+        self._api = api
+        self._database = None
+        self._snapshots = None
+        self._events = None
+        self._player_card_service = None
+        self._player_search = None
+        self.memory_profiler = memory_profiler
+        self._team_rows = {}
 
     def initialize_tools(self):
-        self.api = FantasyBaseballAPI(
-            season=self.season,
-            league_id=self.league_id,
-            espn_s2=self.espn_s2,
-            swid=self.swid
-        )
-        self.database = DatabaseEngine(
-            connection_string=self.db_connection_string
-        )
-        self.database.start_session()
+        # Tools are otherwise created on first use, call this to pay the startup cost up front
+        return self.api, self.database
+
+    @property
+    def snapshots(self):
+        # Every raw response is archived, pass snapshot_directory=None to disable
+        if self._snapshots is None and self.snapshot_directory:
+            from classes.snapshots import SnapshotStore
+            self._snapshots = SnapshotStore(
+                directory=self.snapshot_directory
+            )
+        return self._snapshots
+
+    @property
+    def api(self):
+        if self._api is None:
+            from classes.api import FantasyBaseballAPI
+            self._api = FantasyBaseballAPI(
+                season=self.season,
+                league_id=self.league_id,
+                espn_s2=self.espn_s2,
+                swid=self.swid,
+                snapshot_store=self.snapshots
+            )
+        return self._api
+
+    @property
+    def database(self):
+        if self._database is None:
+            from classes.database import DatabaseEngine
+            self._database = DatabaseEngine(
+                connection_string=self.db_connection_string
+            )
+            self._database.start_session()
+        return self._database
+
+    @property
+    def events(self):
+        if self._events is None:
+            from classes.events import EventHub
+            self._events = EventHub()
+        return self._events
+
+    def close(self):
+        # Only release the tools that were actually created
+        if self._database is not None:
+            self._database.end_session()
+        if self._snapshots is not None:
+            self._snapshots.close()
+
+    @contextlib.contextmanager
+    def stage(self, name: str = None):
+        # Sync stage boundaries shared by the timing spans and the memory profiler
+        with metrics.span("sync_stage", stage=name):
+            if self.memory_profiler is None:
+                yield
+            else:
+                with self.memory_profiler.stage(name):
+                    yield
 
     def create_league(self):
+        with self.stage("fetch"):
+            league_data = self.api.get_league()
+        with self.stage("parse"):
+            league = self.parse_league(league_data)
+        if self.memory_profiler is not None:
+            # Serialization normally happens inside the write, isolate it only when measuring it
+            # Rows are discarded as they are built, so they do not stay alive through the write stage
+            with self.stage("serialize"):
+                for obj in league.iter_objects():
+                    obj.serialize_for_db()
+        with self.stage("write"):
+            self.write_league(league, self.database)
+        self._team_rows = {
+            team.id: team.serialize_for_db() for team in league.teams
+        }
+
+    def update_league(self):
+        # Only teams whose values changed since the last update are written and published
         league_data = self.api.get_league()
         league = League(data=league_data)
         league.parse_league_data()
-        import json
-        with open("league_info.json", "w") as outfile:
-            outfile.write(json.dumps(league_data, indent=2))
-        Stat.write_all_to_database(self.database)
-        Position.write_all_to_database(self.database)
-        league.write_to_database(self.database)
+        deltas = []
+        for team in league.teams:
+            team_row = team.serialize_for_db()
+            previous_row = self._team_rows.get(team.id, dict())
+            changes = {
+                key: val for key, val in team_row.items() if previous_row.get(key) != val
+            }
+            if not changes:
+                continue
+            team.write_to_database(self.database)
+            self._team_rows[team.id] = team_row
+            deltas.append({"entity": "team", "action": "update",
+                           "key": {"id": team.id}, "values": changes})
+        self.events.publish(deltas)
+        return deltas
+
+    def create_sync_pipeline(self, fetchers: int = 2, parsers: int = 1, writers: int = 2):
+        # League and player pages download, parse and write concurrently instead of one after another
+        from classes.pipeline import SyncPipeline, SyncJob
+        pipeline = SyncPipeline(
+            database=self.database,
+            fetchers=fetchers,
+            parsers=parsers,
+            writers=writers
+        )
+        pipeline.add_job(SyncJob(
+            name="league",
+            fetch=self.api.get_league,
+            parse=self.parse_league,
+            write=self.write_league,
+            keep_results=True
+        ))
+        pipeline.add_job(SyncJob(
+            name="players",
+            fetch=self.api.iter_player_pages,
+            parse=self.parse_players,
+            write=lambda players, database: database.upsert(
+                "players", players),
+            paged=True,
+            keep_results=True
+        ))
+        return pipeline
+
+    def sync(self):
+        # Run the full sync through the pipeline, keeping the parsed league and players around
+        pipeline = self.create_sync_pipeline()
+        results = pipeline.run()
+        league = results.get("league")
+        if league is not None:
+            self._team_rows = {
+                team.id: team.serialize_for_db() for team in league.teams
+            }
+        self.players = [
+            player for page in results.get("players", list()) for player in page
+        ]
+        return pipeline.errors
+
+    def parse_league(self, league_data: dict = None):
+        league = League(data=league_data)
+        league.parse_league_data()
+        return league
 
-    def update_league(self):
-        pass
+    def write_league(self, league: League = None, database=None):
+        Stat.write_all_to_database(database)
+        Position.write_all_to_database(database)
+        league.write_to_database(database)
+
+    def create_score_poller(self, interval: float = 30.0):
+        # Live scores for the current matchup period, written to the database as they change
+        from classes.poller import LiveScorePoller
+        poller = LiveScorePoller(
+            api=self.api,
+            database=self.database,
+            interval=interval
+        )
+        poller.subscribe(self.events.publish)
+        return poller
+
+    def create_free_agent_watcher(self, interval: float = 60.0):
+        # Free-agent pool changes, published as deltas instead of re-downloading the pool for every consumer
+        from classes.free_agents import FreeAgentWatcher
+        watcher = FreeAgentWatcher(
+            api=self.api,
+            interval=interval
+        )
+        watcher.subscribe(self.events.publish)
+        return watcher
+
+    def create_free_agent_ranking(self, watcher=None, scoring_settings=None):
+        # Best available players per lineup slot, kept in step with the watcher's pool deltas
+        from classes.rankings import FreeAgentRanking
+        ranking = FreeAgentRanking(scoring_settings=scoring_settings)
+        for player_id, row in watcher.pool.items():
+            ranking.add(player_id, row.get("eligible_slots"),
+                        row.get("projected_stats"), row)
+        watcher.subscribe(ranking.apply_deltas)
+        return ranking
+
+    def create_draft_engine(self, settings=None, team_id: int = None, players_data: list = None, seed: int = None):
+        # Live draft recommendations, the player pool is valued with the league's own scoring
+        from classes.draft import DraftEngine, draft_pool_row, roster_rounds
+        from classes.rankings import scoring_weights
+        weights = scoring_weights(settings.scoring)
+        if players_data is None:
+            players_data = self.api.get_players()
+        return DraftEngine(
+            draft_settings=settings.draft,
+            players=[draft_pool_row(player_data, weights, self.season)
+                     for player_data in players_data],
+            rounds=roster_rounds(settings.roster),
+            team_id=team_id,
+            seed=seed
+        )
+
+    def create_trade_evaluator(self, settings=None, remaining_share: float = 1.0, players_data: list = None):
+        # Rest-of-season lineup values of every team, trades are scored as the change of two lineups
+        from classes.free_agents import free_agent_row
+        from classes.trades import TradeEvaluator
+        if players_data is None:
+            players_data = self.api.get_players_on_team()
+        rosters = {}
+        for row in (free_agent_row(player_data, int(self.api.season)) for player_data in players_data):
+            if row["on_team_id"]:
+                rosters.setdefault(row["on_team_id"], list()).append(row)
+        return TradeEvaluator(
+            roster_settings=settings.roster,
+            scoring_settings=settings.scoring,
+            rosters=rosters,
+            remaining_share=remaining_share
+        )
+
+    def create_activity_ingester(self, page_size: int = 25):
+        # Transactions are paged newest first and stop at the league's stored cursor
+        from classes.activity import ActivityIngester
+        return ActivityIngester(api=self.api, database=self.database, page_size=page_size)
+
+    def sync_activity(self):
+        return self.create_activity_ingester().poll()
+
+    def sync_draft(self):
+        # Fetch the draft and write the header and picks together, an unchanged draft is skipped
+        self.draft = self.setup_draft()
+        with self.database.unit_of_work():
+            return self.write_draft_db()
+
+    def create_projection_store(self, directory: str = PROJECTION_DIRECTORY):
+        # Memory-mapped projections, shared by every process that opens the same directory
+        from classes.projections import ProjectionStore
+        return ProjectionStore(directory=directory)
+
+    def ingest_projections(self, paths: list = None, column_map: dict = None, directory: str = PROJECTION_DIRECTORY):
+        from classes.projections import ProjectionIngester
+        players = getattr(self, "players", None) or self.setup_players()
+        ingester = ProjectionIngester(
+            store=self.create_projection_store(directory),
+            players=players,
+            column_map=column_map
+        )
+        return ingester.ingest(paths)
+
+    def create_read_server(self, host: str = "127.0.0.1", port: int = 8080, workers: int = 4):
+        # JSON read API over the league tables, cached until the writers above touch them
+        from classes.server import LeagueReadServer
+        return LeagueReadServer(
+            database=self.database,
+            host=host,
+            port=port,
+            events=self.events,
+            workers=workers
+        )
 
     def setup_league(self):
         # Fetch and set up all league-wide info.
@@ -46,7 +291,7 @@ class FantasyBaseballInterface:
         # self.league_teams = self.league.get("teams", [])
         # self.league_members = self.get_league_members()
         # self.rosters = self.setup_rosters()
-        # self.draft = self.setup_draft()
+        # The draft is fetched and written by sync_draft
         # self.matchups = self.setup_matchups()
         # self.standings = self.setup_standings()
         # self.pro_schedule = self.setup_pro_schedule()
@@ -94,21 +339,23 @@ class FantasyBaseballInterface:
         return rosters
 
     def setup_draft(self):
-        # Retrieve draft details from the API.
+        # Retrieve draft details from the API, the picks are listed under draftDetail.
         draft_data = self.api.get_league_draft()
+        draft_detail = draft_data.get("draftDetail", {})
         draft = {
-            "season": draft_data.get("season"),
-            "draft_date": draft_data.get("draftDate"),
+            "season": draft_data.get("seasonId", self.season),
+            "draft_date": convert_epoch_to_date(draft_detail.get("completeDate")),
             "picks": []
         }
-        # Assuming draft_data contains a list of picks.
-        for pick in draft_data.get("picks", []):
+        for pick in draft_detail.get("picks", []):
             draft["picks"].append({
-                "round": pick.get("round"),
-                "pick_number": pick.get("pickNumber"),
+                "round": pick.get("roundId"),
+                "round_pick_number": pick.get("roundPickNumber"),
+                "pick_number": pick.get("overallPickNumber"),
                 "team_id": pick.get("teamId"),
                 "player_id": pick.get("playerId"),
-                # Include more details if needed.
+                "bid_amount": pick.get("bidAmount"),
+                "keeper": pick.get("keeper", False),
             })
         return draft
 
@@ -164,7 +411,26 @@ class FantasyBaseballInterface:
 
     def setup_players(self):
         # Retrieve player information from the API.
-        players_data = self.api.get_pro_players()
+        with self.stage("fetch"):
+            players_data = self.api.get_pro_players()
+        with self.stage("parse"):
+            self.players = self.parse_players(players_data)
+        self._player_search = None
+        return self.players
+
+    @property
+    def player_search(self):
+        # Loaded from disk when it was built from the same players, rebuilt and saved otherwise
+        if self._player_search is None:
+            from classes.player_search import PlayerSearchIndex
+            self._player_search = PlayerSearchIndex.load(
+                PLAYER_SEARCH_INDEX, getattr(self, "players", None))
+        return self._player_search
+
+    def search_players(self, query: str = None, limit: int = 10):
+        return self.player_search.search(query, limit)
+
+    def parse_players(self, players_data: list = None):
         players = []
         for player_data in players_data:
             player = player_data.get("player", dict())
@@ -184,7 +450,6 @@ class FantasyBaseballInterface:
                 "team": PRO_TEAM_MAP.get(player.get("proTeamId", 0)),
                 "status": player.get("status")
             })
-        self.players = players
         return players
 
     def setup_player_stats(self, stats_data):
@@ -192,25 +457,23 @@ class FantasyBaseballInterface:
         Expects stats_data to be a list of dicts, each containing:
             - player_id
             - season
-            - game_date
-            - entries: list of { stat_key, stat_value }
+            - scoring_period_id
+            - stats: { stat id: stat_value }, or entries: list of { stat_key, stat_value }
         """
         self.player_stats = stats_data
         return stats_data
 
+    @property
+    def player_card_service(self):
+        if self._player_card_service is None:
+            from classes.player_cards import PlayerCardService
+            self._player_card_service = PlayerCardService(api=self.api)
+        return self._player_card_service
+
     def setup_player_cards(self, player_ids: list, max_scoring_period: int, additional_filters: list = None):
-        # Retrieve player card snapshots.
-        player_card_data = self.api.get_player_card(
+        # Cards are fetched in concurrent batches and only refetched once their scoring period moved on
+        cards = self.player_card_service.card_rows(
             player_ids, max_scoring_period, additional_filters)
-        cards = []
-        # Adjust the following parsing as per the actual API response structure.
-        for card in player_card_data.get("playerCards", []):
-            cards.append({
-                "player_id": card.get("playerId"),
-                "card_data": card,
-                "retrieval_date": card.get("retrievalDate"),
-                "scoring_period": card.get("scoringPeriod")
-            })
         self.player_cards = cards
         return cards
 
@@ -234,24 +497,54 @@ class FantasyBaseballInterface:
             self.database.insert("rosters", roster)
 
     def write_draft_db(self):
-        # Insert draft header first.
-        draft_header = {
-            "season": self.draft.get("season"),
-            "draft_date": self.draft.get("draft_date"),
-            "details": None  # Modify if you have extra details.
+        """
+        Write the draft header and all of its picks.
+
+        The header is written once and returns its id, then every pick of every round is written in a
+        single statement. The header keeps a checksum of the draft, so writing an unchanged draft
+        again is skipped.
+
+        Returns:
+            bool: True if the draft was written, False if it was already current.
+        """
+        picks = sorted(self.draft.get("picks", []),
+                       key=lambda pick: pick.get("pick_number") or 0)
+        checksum = hashlib.sha1(json.dumps(
+            [self.draft.get("draft_date"), picks], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        draft_key = {
+            "league_id": str(self.league_id),
+            "season": int(self.draft.get("season")),
         }
-        draft_id = self.database.insert("draft", draft_header)
-        # Insert each pick.
-        for pick in self.draft.get("picks", []):
-            pick_row = {
+        # The league and season are the header's unique key, so at most one row matches
+        existing = self.database.get_by_column_value_multiple("draft", draft_key)
+        if existing is not None and existing.checksum == checksum:
+            return False
+        draft_header = dict(
+            draft_key,
+            draft_date=self.draft.get("draft_date"),
+            details=None  # Modify if you have extra details.
+        )
+        draft_id = self.database.upsert(
+            "draft", [draft_header], index_elements=["league_id", "season"], returning=["id"])[0].id
+        pick_rows = [
+            {
                 "draft_id": draft_id,
                 "pick_number": pick.get("pick_number"),
                 "round": pick.get("round"),
+                "round_pick_number": pick.get("round_pick_number"),
                 "team_id": pick.get("team_id"),
                 "player_id": pick.get("player_id"),
+                "bid_amount": pick.get("bid_amount"),
+                "keeper": pick.get("keeper", False),
                 "details": pick.get("details")
-            }
-            self.database.insert("draft_picks", pick_row)
+            } for pick in picks
+        ]
+        if pick_rows:
+            self.database.upsert("draft_picks", pick_rows, index_elements=[
+                                 "draft_id", "pick_number"])
+        # Stored last, a write interrupted before this point is repeated in full by the next run
+        self.database.update("draft", draft_id, {"checksum": checksum})
+        return True
 
     def write_matchups_db(self):
         for matchup in self.matchups:
@@ -275,20 +568,17 @@ class FantasyBaseballInterface:
 
     def write_player_stats_db(self):
         """
-        For each stat record in self.player_stats, insert a header into player_stats and then
-        each key/value pair into player_stat_entries.
+        Bulk load self.player_stats into the wide player_stats table, one row per player and scoring period,
+        then move the rolling window aggregates forward to the newest periods, all in one unit of work.
         """
-        for stat in self.player_stats:
-            stat_header = {
-                "player_id": stat.get("player_id"),
-                "season": stat.get("season"),
-                "game_date": stat.get("game_date")
-            }
-            stat_id = self.database.insert("player_stats", stat_header)
-            for entry in stat.get("entries", []):
-                entry_row = {
-                    "player_stats_id": stat_id,
-                    "stat_key": entry.get("stat_key"),
-                    "stat_value": entry.get("stat_value")
-                }
-                self.database.insert("player_stat_entries", entry_row)
+        from classes.player_stats import PlayerStatsStore
+        from classes.rolling_stats import RollingStats
+        previous = {}
+        # One transaction, so a failed refresh also rolls back the stats it would have aggregated
+        with self.database.unit_of_work():
+            written = PlayerStatsStore(self.database).write(self.player_stats, previous)
+            rolling_stats = RollingStats(self.database)
+            for season in sorted({season for season, _ in written}):
+                rolling_stats.refresh(
+                    season, [period for written_season, period in written if written_season == season], previous)
+        return written
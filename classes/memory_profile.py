@@ -0,0 +1,84 @@
+import contextlib
+import json
+import tracemalloc
+
+DEFAULT_TOP_SITES = 10
+
+
+class MemoryProfiler(object):
+    def __init__(self, top_sites: int = DEFAULT_TOP_SITES, frames: int = 1):
+        """
+        Initialize a profiler that measures memory per sync stage with tracemalloc.
+
+        Every stage records the memory it allocated and kept (the difference between snapshots taken
+        at its boundaries), the allocation sites that grew the most, and the peak traced memory reached
+        while it ran.
+
+        Args:
+            top_sites (int): The number of allocation sites reported per stage. Defaults to 10.
+            frames (int): The number of stack frames stored per allocation. More frames group sites by
+                caller as well, at a higher tracing cost. Defaults to 1.
+        """
+        self.top_sites = top_sites
+        self.frames = frames
+        self.stages = []
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str = None):
+        """
+        Profile the enclosed block as one stage, e.g. "fetch", "parse", "serialize" or "write".
+        """
+        self.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        current_before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            current_after, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            statistics = after.compare_to(before, "lineno")
+            self.stages.append({
+                "stage": name,
+                "retained_bytes": current_after - current_before,
+                "peak_bytes": peak,
+                "peak_over_start_bytes": peak - current_before,
+                "current_bytes": current_after,
+                "top_sites": [
+                    {
+                        "site": str(statistic.traceback),
+                        "size_diff_bytes": statistic.size_diff,
+                        "count_diff": statistic.count_diff,
+                        "size_bytes": statistic.size,
+                    } for statistic in statistics[:self.top_sites]
+                ],
+            })
+
+    def report(self):
+        """
+        Render a human readable report of every stage in the order they ran.
+
+        Returns:
+            str: The report.
+        """
+        lines = []
+        for stage in self.stages:
+            lines.append(
+                f"[{stage['stage']}] retained {stage['retained_bytes'] / 1024:.1f} KiB, "
+                f"peak {stage['peak_bytes'] / 1024:.1f} KiB "
+                f"(+{stage['peak_over_start_bytes'] / 1024:.1f} KiB over stage start)")
+            for site in stage["top_sites"]:
+                lines.append(
+                    f"    {site['size_diff_bytes'] / 1024:>+10.1f} KiB {site['count_diff']:>+8} blocks  {site['site']}")
+        return "\n".join(lines)
+
+    def write_report(self, path: str = None):
+        with open(path, "w") as outfile:
+            outfile.write(json.dumps(self.stages, indent=2))
@@ -0,0 +1,177 @@
+import queue
+import threading
+from classes.instrumentation import metrics
+
+DEFAULT_QUEUE_SIZE = 4
+
+# Placed on a stage's queue once per worker when the stage upstream of it has finished
+STOP = object()
+
+
+class SyncJob(object):
+    def __init__(self, name: str = None, fetch=None, parse=None, write=None, paged: bool = False,
+                 keep_results: bool = False):
+        """
+        Initialize one unit of sync work made of a fetch, a parse and a write step.
+
+        Args:
+            name (str): The name the job is reported under, e.g. "league" or "players".
+            fetch (callable): Takes no arguments and returns the raw API response. For a paged job it returns
+                an iterable of pages instead, and every page is parsed and written on its own.
+            parse (callable): Takes a raw response (or page) and returns what the write step needs.
+                Defaults to passing the response through.
+            write (callable): Takes the parsed data and the database engine. Always runs inside a unit of work.
+            paged (bool): Whether fetch returns an iterable of pages. Defaults to False.
+            keep_results (bool): Whether the parsed data is kept in ``results`` once written. Otherwise it
+                is released after the write and only counted. Defaults to False.
+        """
+        self.name = name
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.paged = paged
+        self.keep_results = keep_results
+
+
+class SyncPipeline(object):
+    def __init__(self, database=None, fetchers: int = 2, parsers: int = 1, writers: int = 2,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Initialize a staged sync in which fetching, parsing and writing run at the same time.
+
+        Fetch, parse and write workers are threads connected by bounded queues. A stage that gets ahead
+        blocks on the full queue in front of the next one, so no more than ``queue_size`` responses wait
+        in memory between two stages while the network and the database are both kept busy. Every write
+        runs in its own :meth:`DatabaseEngine.unit_of_work`, so the engine pool must hold at least
+        ``writers`` connections.
+
+        A failing step only fails its own job (or page); the error is recorded and the rest of the sync carries on.
+
+        Args:
+            database (DatabaseEngine): The engine the writers write through.
+            fetchers (int): The number of fetch threads. Defaults to 2.
+            parsers (int): The number of parse threads. Parsing is CPU bound, so more than one rarely helps. Defaults to 1.
+            writers (int): The number of write threads. Defaults to 2.
+            queue_size (int): The capacity of each queue between two stages. Defaults to 4.
+        """
+        self.database = database
+        self.fetchers = fetchers
+        self.parsers = parsers
+        self.writers = writers
+        self.queue_size = queue_size
+        self.jobs = []
+        self.results = {}
+        self.counts = {}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add_job(self, job: SyncJob = None):
+        self.jobs.append(job)
+        return job
+
+    def record_error(self, job: SyncJob = None, stage: str = None, exc: Exception = None):
+        with self._lock:
+            self.errors.append(
+                {"job": job.name, "stage": stage, "error": repr(exc)})
+        print(f"Sync job {job.name} failed to {stage}: {exc!r}")
+
+    def record_result(self, job: SyncJob = None, result=None):
+        with self._lock:
+            self.counts[job.name] = self.counts.get(job.name, 0) + 1
+            if not job.keep_results:
+                return
+            if job.paged:
+                self.results.setdefault(job.name, list()).append(result)
+            else:
+                self.results[job.name] = result
+
+    def fetch_worker(self, jobs: queue.Queue = None, parse_queue: queue.Queue = None):
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                with metrics.span("pipeline_stage", stage="fetch", job=job.name):
+                    if not job.paged:
+                        parse_queue.put((job, job.fetch()))
+                        continue
+                    # Every page is handed on as soon as it arrives, while the next one downloads
+                    for page in job.fetch():
+                        parse_queue.put((job, page))
+            except Exception as exc:
+                self.record_error(job, "fetch", exc)
+
+    def parse_worker(self, parse_queue: queue.Queue = None, write_queue: queue.Queue = None):
+        while True:
+            item = parse_queue.get()
+            if item is STOP:
+                return
+            job, data = item
+            try:
+                with metrics.span("pipeline_stage", stage="parse", job=job.name):
+                    parsed = job.parse(data) if job.parse is not None else data
+            except Exception as exc:
+                self.record_error(job, "parse", exc)
+                continue
+            write_queue.put((job, parsed))
+
+    def write_worker(self, write_queue: queue.Queue = None):
+        while True:
+            item = write_queue.get()
+            if item is STOP:
+                return
+            job, parsed = item
+            try:
+                with metrics.span("pipeline_stage", stage="write", job=job.name):
+                    if job.write is not None:
+                        with self.database.unit_of_work():
+                            job.write(parsed, self.database)
+            except Exception as exc:
+                self.record_error(job, "write", exc)
+                continue
+            self.record_result(job, parsed)
+
+    def start_workers(self, count: int = None, target=None, args: tuple = None, stage: str = None):
+        threads = [
+            threading.Thread(target=target, args=args,
+                             name=f"sync-{stage}-{index}", daemon=True)
+            for index in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def stop_workers(self, threads: list = None, stage_queue: queue.Queue = None):
+        for _ in threads:
+            stage_queue.put(STOP)
+        for thread in threads:
+            thread.join()
+
+    def run(self):
+        """
+        Run every added job through the pipeline and wait for all of them to be written.
+
+        Returns:
+            dict: The parsed data of every job with ``keep_results`` that was written, by job name. Paged
+            jobs map to a list of their parsed pages. The number of responses (or pages) written per job
+            is kept in ``counts`` and failures are listed in ``errors``.
+        """
+        jobs = queue.Queue()
+        for job in self.jobs:
+            jobs.put(job)
+        parse_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        fetch_threads = self.start_workers(
+            self.fetchers, self.fetch_worker, (jobs, parse_queue), "fetch")
+        parse_threads = self.start_workers(
+            self.parsers, self.parse_worker, (parse_queue, write_queue), "parse")
+        write_threads = self.start_workers(
+            self.writers, self.write_worker, (write_queue,), "write")
+        # Shut the stages down front to back so every queued item is drained first
+        with metrics.span("pipeline_run"):
+            for thread in fetch_threads:
+                thread.join()
+            self.stop_workers(parse_threads, parse_queue)
+            self.stop_workers(write_threads, write_queue)
+        return self.results
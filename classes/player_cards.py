@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from classes.instrumentation import metrics
+
+# Keeps the filterIds header of a single request well below the size ESPN accepts
+PLAYER_CARD_BATCH_SIZE = 50
+
+
+def chunk(items: list = None, size: int = PLAYER_CARD_BATCH_SIZE):
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+def card_player_id(card: dict = None):
+    return card.get("id", card.get("player", dict()).get("id"))
+
+
+class PlayerCardService(object):
+    def __init__(self, api=None, batch_size: int = PLAYER_CARD_BATCH_SIZE, max_workers: int = 4):
+        """
+        Initialize a cached, batched source of player cards.
+
+        Player ids are split into batches of ``batch_size`` that are fetched concurrently. Every card
+        is cached by (player, season, filters, max scoring period), so a refresh only requests the cards
+        that are missing or were fetched for an earlier scoring period. Players ESPN returns no card for
+        are cached as missing too, so they are not requested again until the scoring period moves on.
+
+        Args:
+            api (FantasyBaseballAPI): The client the cards are fetched with.
+            batch_size (int): The number of players requested at once. Defaults to 50.
+            max_workers (int): The number of batches fetched at the same time. Defaults to 4.
+        """
+        self.api = api
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        # (player id, season, filters) to (max scoring period, card or None when ESPN returned none),
+        # older periods are replaced as they move on
+        self._cards = {}
+        self._lock = threading.Lock()
+
+    def card_key(self, player_id: int = None, additional_filters: list = None):
+        return player_id, self.api.season, tuple(additional_filters or list())
+
+    def cached_entry(self, player_id: int = None, max_scoring_period: int = None, additional_filters: list = None):
+        entry = self._cards.get(self.card_key(player_id, additional_filters))
+        if entry is None or entry[0] < max_scoring_period:
+            return None
+        return entry
+
+    def cached_card(self, player_id: int = None, max_scoring_period: int = None, additional_filters: list = None):
+        entry = self.cached_entry(player_id, max_scoring_period, additional_filters)
+        return None if entry is None else entry[1]
+
+    def fetch_batch(self, player_ids: list = None, max_scoring_period: int = None, additional_filters: list = None):
+        with metrics.span("player_card_batch"):
+            data = self.api.get_player_card(
+                player_ids, max_scoring_period, additional_filters)
+        cards = {}
+        for card in data.get("players", list()):
+            cards[card_player_id(card)] = card
+        with self._lock:
+            for player_id in player_ids:
+                self._cards[self.card_key(player_id, additional_filters)] = (
+                    max_scoring_period, cards.get(player_id))
+        return cards
+
+    def refresh(self, player_ids: list = None, max_scoring_period: int = None, additional_filters: list = None):
+        """
+        Fetch the cards that are missing from the cache or older than the given scoring period.
+
+        Args:
+            player_ids (list): The players whose cards should be current.
+            max_scoring_period (int): The latest scoring period the cards should include.
+            additional_filters (list): Extra ``additionalValue`` filters passed to the API.
+
+        Returns:
+            dict: Player id to card, for the cards that were fetched.
+        """
+        stale = [
+            player_id for player_id in dict.fromkeys(player_ids or list())
+            if self.cached_entry(player_id, max_scoring_period, additional_filters) is None
+        ]
+        metrics.increment("player_card_cache_hits",
+                          len(set(player_ids or list())) - len(stale))
+        if not stale:
+            return dict()
+        batches = chunk(stale, self.batch_size)
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches)),
+                                thread_name_prefix="player-cards") as executor:
+            for cards in executor.map(
+                    lambda batch: self.fetch_batch(batch, max_scoring_period, additional_filters), batches):
+                fetched.update(cards)
+        return fetched
+
+    def get_cards(self, player_ids: list = None, max_scoring_period: int = None, additional_filters: list = None):
+        """
+        Get current cards for the given players, fetching only the ones that changed, see :meth:`refresh`.
+
+        Returns:
+            dict: Player id to card, for every player the API returned a card for.
+        """
+        self.refresh(player_ids, max_scoring_period, additional_filters)
+        cards = {}
+        for player_id in player_ids or list():
+            card = self.cached_card(player_id, max_scoring_period, additional_filters)
+            if card is not None:
+                cards[player_id] = card
+        return cards
+
+    def card_rows(self, player_ids: list = None, max_scoring_period: int = None, additional_filters: list = None):
+        """
+        Get current cards as rows of the ``player_cards`` table.
+        """
+        retrieval_date = time.time()
+        return [
+            {
+                "player_id": player_id,
+                "card_data": card,
+                "retrieval_date": retrieval_date,
+                "scoring_period": max_scoring_period,
+            } for player_id, card in self.get_cards(player_ids, max_scoring_period, additional_filters).items()
+        ]
+
+    def evict(self, season: int = None):
+        """
+        Drop every cached card of a season, or of every season.
+        """
+        with self._lock:
+            for key in [key for key in self._cards if season is None or key[1] == season]:
+                del self._cards[key]
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+INDEX_VERSION = 2
+
+# Trigrams shared by more players than this are only used when a query has nothing rarer
+COMMON_TRIGRAM_POSTINGS = 2000
+
+# Typo tolerant lookups rank this many trigram candidates per requested result by edit distance
+CANDIDATES_PER_RESULT = 3
+
+# Typo tolerant lookups rank at least this many candidates, a short limit must not hide the intended player
+MIN_FUZZY_CANDIDATES = 50
+
+NON_ALPHANUMERIC_PATTERN = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize_name(name: str = None):
+    """
+    Fold a name to lowercase ASCII words, so "Ronald Acuña Jr." and "ronald acuna jr" compare equal.
+    """
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(
+        character for character in decomposed if not unicodedata.combining(character))
+    return " ".join(NON_ALPHANUMERIC_PATTERN.sub(" ", stripped.lower()).split())
+
+
+def trigrams(text: str = None):
+    # Every word is padded on its own, so a word keeps its leading trigrams wherever it sits in a name
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[index:index + 3]
+                     for index in range(len(padded) - 2))
+    return grams
+
+
+def edit_distance(source: str = None, target: str = None, max_distance: int = None):
+    """
+    Count the insertions, deletions, substitutions and adjacent transpositions that turn one word into another.
+
+    With ``max_distance`` the count stops as soon as it is certain to exceed it and returns ``max_distance + 1``.
+    """
+    if max_distance is not None and abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    previous_row = None
+    row = list(range(len(target) + 1))
+    for source_index in range(1, len(source) + 1):
+        previous_row, before_row, row = row, previous_row, [source_index] + [0] * len(target)
+        for target_index in range(1, len(target) + 1):
+            cost = source[source_index - 1] != target[target_index - 1]
+            row[target_index] = min(previous_row[target_index] + 1, row[target_index - 1] + 1,
+                                    previous_row[target_index - 1] + cost)
+            if source_index > 1 and target_index > 1 and source[source_index - 1] == target[target_index - 2] \
+                    and source[source_index - 2] == target[target_index - 1]:
+                row[target_index] = min(
+                    row[target_index], before_row[target_index - 2] + 1)
+        if max_distance is not None and min(row) > max_distance:
+            return max_distance + 1
+    return row[-1]
+
+
+def word_similarity(query: str = None, name: str = None, threshold: float = 0.0):
+    """
+    Score how closely every word of the query matches its closest word of the name, from 0 to 1.
+
+    Words further apart than the threshold allows are not measured exactly and score 0.
+    """
+    name_words = name.split()
+    scores = []
+    for query_word in query.split():
+        max_distance = int(len(query_word) * (1.0 - threshold))
+        distance = min(edit_distance(query_word, name_word[:len(query_word) + 2], max_distance)
+                       for name_word in name_words)
+        scores.append(max(0.0, 1.0 - distance / max(len(query_word), 1)))
+    return sum(scores) / len(scores)
+
+
+class PlayerSearchIndex(object):
+    def __init__(self, players: list = None):
+        """
+        Initialize a name search index over the player universe.
+
+        Names are accent-folded and lowercased. Every word of every name is kept in a sorted array for
+        prefix lookups, next to the sorted full names, and every name is split into trigrams with an
+        inverted index from trigram to players for typo tolerant lookups. Exact and prefix matches are
+        answered with bisections that stop once enough players matched; only a query without enough of
+        them falls back to ranking players by shared trigrams.
+
+        Args:
+            players (list): Player dictionaries with at least ``id`` and ``name``, e.g. from ``setup_players``.
+        """
+        players = [
+            player for player in players or list() if player.get("name")]
+        self.players = players
+        self.names = [normalize_name(player.get("name")) for player in players]
+        self.checksum = self.players_checksum(players)
+        self._words = sorted(
+            (word, index) for index, name in enumerate(self.names) for word in name.split()
+        )
+        self._word_keys = [word for word, _ in self._words]
+        self._sorted_names = sorted((name, index) for index, name in enumerate(self.names))
+        self._name_keys = [name for name, _ in self._sorted_names]
+        postings = {}
+        for index, name in enumerate(self.names):
+            for trigram in trigrams(name):
+                postings.setdefault(trigram, array("I")).append(index)
+        self._postings = postings
+
+    @staticmethod
+    def players_checksum(players: list = None):
+        digest = hashlib.sha1()
+        for player in players:
+            digest.update(f"{player.get('id')}\t{player.get('name')}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def prefix_matches(self, query: str = None, limit: int = None):
+        """
+        Find the players with a name, or a word of their name, starting with the query.
+
+        Full-name matches are collected first, in name order, then word matches in word order, and the
+        scan stops as soon as ``limit`` players matched.
+
+        Returns:
+            dict: Player index to score, 1.0 for the full name and 0.9 for a word.
+        """
+        matches = {}
+        position = bisect_left(self._name_keys, query)
+        while position < len(self._sorted_names) and (limit is None or len(matches) < limit):
+            name, index = self._sorted_names[position]
+            if not name.startswith(query):
+                break
+            matches[index] = 1.0
+            position += 1
+        words = query.split()
+        last_word = words[-1]
+        position = bisect_left(self._word_keys, last_word)
+        while position < len(self._words) and (limit is None or len(matches) < limit):
+            word, index = self._words[position]
+            if not word.startswith(last_word):
+                break
+            position += 1
+            # Every earlier word of the query must also appear in the name, e.g. "shohei oht"
+            if index not in matches and all(other in self.names[index] for other in words[:-1]):
+                matches[index] = 0.9
+        return matches
+
+    def fuzzy_matches(self, query: str = None, limit: int = 10, threshold: float = 0.5):
+        """
+        Find players whose name is within a few typos of the query.
+
+        Candidates are the players sharing the most trigrams with the query, which are then ranked by
+        the edit distance between the query words and their closest name words.
+
+        Returns:
+            dict: Player index to similarity, for players at or above the threshold.
+        """
+        query_trigrams = trigrams(query)
+        known = [trigram for trigram in query_trigrams if trigram in self._postings]
+        rare = [trigram for trigram in known if len(
+            self._postings[trigram]) <= COMMON_TRIGRAM_POSTINGS]
+        counts = Counter()
+        for trigram in rare or known:
+            counts.update(self._postings[trigram])
+        matches = {}
+        for index, _ in counts.most_common(max(limit * CANDIDATES_PER_RESULT, MIN_FUZZY_CANDIDATES)):
+            similarity = word_similarity(
+                query, self.names[index], threshold)
+            if similarity >= threshold:
+                matches[index] = similarity * 0.8
+        return matches
+
+    def search(self, query: str = None, limit: int = 10):
+        """
+        Resolve a typed name against the player universe.
+
+        Args:
+            query (str): Any part of a name, e.g. "ohtani", "acuna" or a misspelling like "ohtnai".
+            limit (int): The maximum number of players returned. Defaults to 10.
+
+        Returns:
+            list: (player, score) tuples, best first. Scores are 1.0 for a full-name prefix, 0.9 for a
+            word prefix and below 0.8 for typo tolerant matches.
+        """
+        query = normalize_name(query)
+        if not query:
+            return list()
+        matches = self.prefix_matches(query, limit)
+        if len(matches) < limit:
+            for index, score in self.fuzzy_matches(query, limit).items():
+                matches.setdefault(index, score)
+        ranked = sorted(matches.items(), key=lambda match: (-match[1], self.names[match[0]]))[:limit]
+        return [(self.players[index], score) for index, score in ranked]
+
+    def save(self, path: str = None):
+        """
+        Serialize the index next to the player store, so later runs can load it instead of rebuilding it.
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(file_descriptor, "wb") as outfile:
+            pickle.dump((INDEX_VERSION, self.__dict__), outfile,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str = None, players: list = None):
+        """
+        Load a serialized index.
+
+        Args:
+            path (str): The file written by :meth:`save`.
+            players (list): When provided, the index is rebuilt (and saved again) unless it was built from
+                exactly these players.
+
+        Returns:
+            PlayerSearchIndex: The loaded or rebuilt index.
+        """
+        index = None
+        if os.path.exists(path):
+            with open(path, "rb") as infile:
+                version, state = pickle.load(infile)
+            if version == INDEX_VERSION:
+                index = cls.__new__(cls)
+                index.__dict__.update(state)
+        if players is not None and (index is None or index.checksum != cls.players_checksum(
+                [player for player in players if player.get("name")])):
+            index = cls(players)
+            index.save(path)
+        if index is None:
+            raise ValueError(f"Invalid Player Search Index {path}")
+        return index
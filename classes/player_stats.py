@@ -0,0 +1,298 @@
+import io
+from classes.espn.base import Stat
+from classes.instrumentation import metrics
+
+PLAYER_STATS_TABLE = "player_stats"
+
+# Every stat line is stored as one array indexed by Stat id, so stat_values[id] (0-based) holds that stat
+STAT_VECTOR_SIZE = max(stat.id for stat in Stat) + 1
+
+# Each season partition is split into ranges of this many scoring periods
+PERIODS_PER_PARTITION = 30
+
+# ESPN stat entries: statSourceId 0 are actual stats and 1 projections, statSplitTypeId 0 is the whole
+# season and 5 a single scoring period
+ACTUAL_STAT_SOURCE = 0
+PROJECTED_STAT_SOURCE = 1
+SEASON_SPLIT = 0
+SCORING_PERIOD_SPLIT = 5
+
+# False until load_numpy first runs, None when the package is not installed
+numpy = False
+
+
+def load_numpy():
+    """
+    Import the optional ``numpy`` package on first use.
+
+    :return: The numpy module, or None when it is not installed.
+    """
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as numpy_module
+            numpy = numpy_module
+        except ImportError:
+            numpy = None
+    return numpy
+
+
+def stat_vector(stats: dict = None):
+    """
+    Lay out a stat line as a list indexed by Stat id, with None for stats that were not recorded.
+    """
+    vector = [None] * STAT_VECTOR_SIZE
+    for stat_id, value in (stats or dict()).items():
+        stat_id = int(stat_id)
+        if 0 <= stat_id < STAT_VECTOR_SIZE and value is not None:
+            vector[stat_id] = float(value)
+    return vector
+
+
+def format_array(vector: list = None):
+    """
+    Encode a stat vector as a Postgres array literal for COPY's text format.
+    """
+    return "{" + ",".join("NULL" if value is None else repr(value) for value in vector) + "}"
+
+
+def parse_player_stats(players_data: list = None, season: int = None):
+    """
+    Extract the per scoring period stat lines from a ``kona_player_info`` response.
+
+    Args:
+        players_data (list): The ``players`` of the response.
+        season (int): Only keep lines of this season. Defaults to every season.
+
+    Returns:
+        list: One record per player and scoring period, see :meth:`PlayerStatsStore.write`.
+    """
+    records = []
+    for player_data in players_data or list():
+        player = player_data.get("player", player_data)
+        for entry in player.get("stats", list()):
+            if entry.get("statSourceId") != ACTUAL_STAT_SOURCE or entry.get("statSplitTypeId") != SCORING_PERIOD_SPLIT:
+                continue
+            if season is not None and entry.get("seasonId") != season:
+                continue
+            records.append({
+                "player_id": player.get("id"),
+                "season": entry.get("seasonId"),
+                "scoring_period_id": entry.get("scoringPeriodId"),
+                "stats": entry.get("stats", dict()),
+            })
+    return records
+
+
+def projected_stats(player: dict = None, season: int = None):
+    """
+    Read a player's projected season stats from a ``kona_player_info`` player.
+
+    Returns:
+        dict: Stat id to projected value, empty when ESPN has no projection.
+    """
+    for entry in player.get("stats", list()):
+        if entry.get("statSourceId") != PROJECTED_STAT_SOURCE or entry.get("statSplitTypeId") != SEASON_SPLIT:
+            continue
+        if season is not None and entry.get("seasonId") != season:
+            continue
+        return {int(stat_id): value for stat_id, value in entry.get("stats", dict()).items()}
+    return dict()
+
+
+class PlayerStatsStore(object):
+    def __init__(self, database=None):
+        """
+        Initialize a store of per scoring period player stats kept as one wide row per player and period.
+
+        Every row holds all stats of the period in a ``stat_values`` array indexed by Stat id, instead of
+        one row per stat. The table is partitioned by season and then by ranges of scoring periods, so
+        reads of a window of periods only touch the partitions that hold it. Rows are loaded in bulk with COPY into a temporary table and merged in a single
+        ``INSERT ... ON CONFLICT``, so a refresh of any size costs a handful of round trips.
+
+        Args:
+            database (DatabaseEngine): The engine to read and write through.
+        """
+        self.database = database
+        self._partitions = set()
+
+    def partition_names(self, season: int = None, scoring_period_id: int = None):
+        start = scoring_period_id // PERIODS_PER_PARTITION * PERIODS_PER_PARTITION
+        season_partition = f"{PLAYER_STATS_TABLE}_{int(season)}"
+        return season_partition, f"{season_partition}_p{start}", start
+
+    def ensure_partitions(self, cursor=None, keys: list = None):
+        """
+        Create the season and scoring period partitions the given rows fall into, if they are missing.
+
+        Args:
+            cursor: A cursor on the connection the rows are written through.
+            keys (list): The (player id, season, scoring period id) of every row.
+        """
+        for _, season, scoring_period_id in keys:
+            season_partition, period_partition, start = self.partition_names(
+                season, scoring_period_id)
+            if period_partition in self._partitions:
+                continue
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {season_partition} PARTITION OF {PLAYER_STATS_TABLE} "
+                f"FOR VALUES IN ({int(season)}) PARTITION BY RANGE (scoring_period_id)")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {period_partition} PARTITION OF {season_partition} "
+                f"FOR VALUES FROM ({start}) TO ({start + PERIODS_PER_PARTITION})")
+            self._partitions.add(period_partition)
+
+    def to_row(self, record: dict = None):
+        """
+        Convert a stat record to a row of the store.
+
+        Records hold ``player_id``, ``season``, ``scoring_period_id`` and either ``stats`` (Stat id to
+        value) or ``entries`` (a list of ``stat_key`` and ``stat_value`` pairs).
+
+        Raises:
+            ValueError: If the record does not identify its player, season and scoring period.
+
+        Returns:
+            tuple: The player id, season, scoring period id and stat vector.
+        """
+        key = (record.get("player_id"), record.get(
+            "season"), record.get("scoring_period_id"))
+        if any(value is None for value in key):
+            raise ValueError(f"Invalid Player Stats {key}")
+        stats = record.get("stats")
+        if stats is None:
+            stats = {
+                entry.get("stat_key"): entry.get("stat_value") for entry in record.get("entries", list())
+            }
+        return key + (stat_vector(stats),)
+
+    def write(self, records: list = None, previous: dict = None):
+        """
+        Insert or replace the stat lines of many players and periods at once.
+
+        Args:
+            records (list): Stat records, see :meth:`to_row`. A later record for the same player and
+                period replaces an earlier one.
+            previous (dict): Filled with (player id, season, scoring period id) to the stat vector each
+                written row replaced, None for new rows, so aggregates can swap old values for new ones.
+
+        Returns:
+            list: The (season, scoring period id) pairs that were written, sorted.
+        """
+        rows = {}
+        for record in records or list():
+            row = self.to_row(record)
+            rows[row[:3]] = row
+        if not rows:
+            return list()
+        buffer = io.StringIO()
+        for player_id, season, scoring_period_id, vector in rows.values():
+            buffer.write(
+                f"{int(player_id)}\t{int(season)}\t{int(scoring_period_id)}\t{format_array(vector)}\n")
+        buffer.seek(0)
+        session = self.database.session
+        # COPY runs on the session's own connection so it joins the current unit of work
+        cursor = session.connection().connection.cursor()
+        with metrics.span("player_stats_copy"):
+            self.ensure_partitions(cursor, list(rows))
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {PLAYER_STATS_TABLE}_staging "
+                f"(LIKE {PLAYER_STATS_TABLE} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+            # Earlier writes of the same unit of work are still staged until it commits
+            cursor.execute(f"TRUNCATE {PLAYER_STATS_TABLE}_staging")
+            cursor.copy_expert(
+                f"COPY {PLAYER_STATS_TABLE}_staging (player_id, season, scoring_period_id, stat_values) "
+                f"FROM STDIN", buffer)
+            if previous is not None:
+                previous.update((key, None) for key in rows)
+                cursor.execute(
+                    f"SELECT stats.player_id, stats.season, stats.scoring_period_id, stats.stat_values "
+                    f"FROM {PLAYER_STATS_TABLE} stats JOIN {PLAYER_STATS_TABLE}_staging staging "
+                    f"USING (player_id, season, scoring_period_id)")
+                for player_id, season, scoring_period_id, stat_values in cursor.fetchall():
+                    previous[(player_id, season, scoring_period_id)] = stat_values
+            cursor.execute(
+                f"INSERT INTO {PLAYER_STATS_TABLE} (player_id, season, scoring_period_id, stat_values) "
+                f"SELECT player_id, season, scoring_period_id, stat_values FROM {PLAYER_STATS_TABLE}_staging "
+                f"ON CONFLICT (player_id, season, scoring_period_id) DO UPDATE SET stat_values = EXCLUDED.stat_values")
+        self.database.finish_write(PLAYER_STATS_TABLE)
+        metrics.increment("db_rows", len(rows), type="COPY",
+                          table=PLAYER_STATS_TABLE)
+        return sorted({key[1:] for key in rows})
+
+    def load_vectors(self, season: int = None, first_period: int = None, last_period: int = None,
+                     player_ids: list = None):
+        """
+        Load the stat vectors of a range of scoring periods.
+
+        Returns:
+            list: (player id, scoring period id, stat vector) tuples.
+        """
+        query = f"SELECT player_id, scoring_period_id, stat_values FROM {PLAYER_STATS_TABLE} " \
+                f"WHERE season = %s AND scoring_period_id BETWEEN %s AND %s"
+        args = [season, first_period, last_period]
+        if player_ids is not None:
+            query += " AND player_id = ANY(%s)"
+            args.append(list(player_ids))
+        cursor = self.database.session.connection().connection.cursor()
+        cursor.execute(query, args)
+        return cursor.fetchall()
+
+    def load_matrix(self, season: int = None, first_period: int = None, last_period: int = None,
+                    stat_ids: list = None, player_ids: list = None):
+        """
+        Load stats straight into a players by stats matrix, summed over a range of scoring periods.
+
+        Stats a player never recorded in the range are NaN. Summing only makes sense for counting stats,
+        derive ratio stats from their summed components.
+
+        Args:
+            season (int): The season to load.
+            first_period (int): The first scoring period, inclusive. Defaults to the start of the season.
+            last_period (int): The last scoring period, inclusive. Defaults to the end of the season.
+            stat_ids (list): The Stat ids to load, in column order. Defaults to every Stat id.
+            player_ids (list): The players to load. Defaults to every player with stats in the range.
+
+        Raises:
+            ValueError: If numpy is not installed.
+
+        Returns:
+            tuple: The player ids (one per matrix row), the stat ids (one per matrix column) and the matrix.
+        """
+        if load_numpy() is None:
+            raise ValueError("numpy is required to load player stat matrices")
+        stat_ids = list(stat_ids) if stat_ids is not None else [
+            stat.id for stat in Stat if stat.id >= 0]
+        query = f"SELECT player_id, stat_values FROM {PLAYER_STATS_TABLE} WHERE season = %s"
+        args = [season]
+        if first_period is not None:
+            query += " AND scoring_period_id >= %s"
+            args.append(first_period)
+        if last_period is not None:
+            query += " AND scoring_period_id <= %s"
+            args.append(last_period)
+        if player_ids is not None:
+            query += " AND player_id = ANY(%s)"
+            args.append(list(player_ids))
+        cursor = self.database.session.connection().connection.cursor()
+        with metrics.span("player_stats_load"):
+            cursor.execute(query + " ORDER BY player_id", args)
+            rows = cursor.fetchall()
+        row_players = numpy.fromiter(
+            (row[0] for row in rows), dtype=numpy.int64, count=len(rows))
+        # Rows written before the Stat enum grew are shorter than the current vector, None loads as NaN
+        values = numpy.array(
+            [row[1] + [None] * (STAT_VECTOR_SIZE - len(row[1])) for row in rows],
+            dtype=numpy.float64).reshape(len(rows), STAT_VECTOR_SIZE)
+        values = values[:, stat_ids]
+        unique_players, row_index = numpy.unique(
+            row_players, return_inverse=True)
+        matrix = numpy.full(
+            (len(unique_players), len(stat_ids)), numpy.nan)
+        recorded = ~numpy.isnan(values)
+        sums = numpy.zeros_like(matrix)
+        numpy.add.at(sums, row_index, numpy.where(recorded, values, 0.0))
+        counts = numpy.zeros(matrix.shape, dtype=numpy.int64)
+        numpy.add.at(counts, row_index, recorded)
+        matrix[counts > 0] = sums[counts > 0]
+        return unique_players, stat_ids, matrix
@@ -0,0 +1,197 @@
+import time
+import threading
+from classes.api import FantasyBaseballAPI
+from classes.database import DatabaseEngine
+from classes.espn.matchup import Matchup
+
+
+class LiveScorePoller(object):
+    def __init__(self, api: FantasyBaseballAPI = None, database: DatabaseEngine = None, interval: float = 30.0,
+                 matchup_period_id: int = None):
+        """
+        Initialize a poller that keeps live matchup scores in sync with the ESPN boxscore view.
+
+        The poller keeps the last response for every matchup in memory. Each poll only parses the
+        matchups whose raw data changed, only writes the rows whose values changed, and only publishes
+        those changes to subscribers.
+
+        Args:
+            api (FantasyBaseballAPI): The API client used to fetch the boxscores.
+            database (DatabaseEngine): The engine changed rows are written to. When None, nothing is written.
+            interval (float): The number of seconds between the start of each poll. Defaults to 30.
+            matchup_period_id (int): The matchup period to poll. Defaults to the league's current matchup period.
+        """
+        self.api = api
+        self.database = database
+        self.interval = interval
+        self.matchup_period_id = matchup_period_id
+        self.scoring_period_id = None
+        self._raw_matchups = {}
+        self._matchups = {}
+        self._player_scores = {}
+        self._roster_slots = {}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        Register a callable that receives the list of deltas produced by every poll that changed something.
+
+        Args:
+            callback (callable): A function accepting a single list of delta dictionaries.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Remove a previously registered subscriber.
+
+        Args:
+            callback (callable): The subscriber to remove.
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def publish(self, deltas: list = None):
+        if not deltas:
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(deltas)
+            except Exception as exc:
+                print(f"LiveScorePoller subscriber {callback} failed\n{exc}\n\n")
+
+    def resolve_periods(self):
+        status_data = self.api.get_league_status()
+        self.scoring_period_id = status_data.get("scoringPeriodId")
+        self.matchup_period_id = status_data.get(
+            "status", dict()).get("currentMatchupPeriod", self.matchup_period_id)
+
+    def poll(self):
+        """
+        Fetch the boxscore view once and process whatever changed since the previous poll.
+
+        Returns:
+            list: The deltas produced by this poll, in the order they were published.
+        """
+        if self.matchup_period_id is None:
+            self.resolve_periods()
+        data = self.api.get_boxscore(matchup_period_id=self.matchup_period_id)
+
+        scoring_period_id = data.get("scoringPeriodId", self.scoring_period_id)
+        if scoring_period_id != self.scoring_period_id:
+            # A new scoring period starts every player score from scratch
+            self.scoring_period_id = scoring_period_id
+            self._raw_matchups = {}
+        current_matchup_period_id = data.get(
+            "status", dict()).get("currentMatchupPeriod")
+        if current_matchup_period_id is not None:
+            self.matchup_period_id = current_matchup_period_id
+
+        changed_matchups = []
+        for matchup_data in data.get("schedule", list()):
+            if matchup_data.get("matchupPeriodId") != self.matchup_period_id:
+                continue
+            matchup_id = matchup_data.get("id")
+            # Identical raw data means nothing in this matchup moved, skip parsing it entirely
+            if self._raw_matchups.get(matchup_id) == matchup_data:
+                continue
+            self._raw_matchups[matchup_id] = matchup_data
+            changed_matchups.append(
+                Matchup(data=matchup_data, scoring_period_id=self.scoring_period_id))
+
+        deltas = self.diff_matchups(changed_matchups)
+        self.write_deltas(deltas)
+        self.publish(deltas)
+        return deltas
+
+    def diff_matchups(self, matchups: list = None):
+        deltas = []
+        for matchup in matchups:
+            matchup_row = matchup.serialize_for_db()
+            previous_row = self._matchups.get(matchup.id, dict())
+            changes = {
+                key: val for key, val in matchup_row.items() if previous_row.get(key) != val
+            }
+            if changes:
+                self._matchups[matchup.id] = matchup_row
+                deltas.append({"entity": "matchup", "action": "update",
+                               "key": {"id": matchup.id}, "values": changes, "row": matchup_row})
+
+            for player_score in matchup.get_player_scores():
+                score_row = player_score.serialize_for_db()
+                score_key = (player_score.matchup_id, player_score.team_id,
+                             player_score.player_id, player_score.scoring_period_id)
+                previous_score = self._player_scores.get(score_key, dict())
+                changes = {
+                    key: val for key, val in score_row.items() if previous_score.get(key) != val
+                }
+                if changes:
+                    self._player_scores[score_key] = score_row
+                    deltas.append({"entity": "player_score", "action": "update", "key": {
+                        "matchup_id": score_key[0], "team_id": score_key[1], "player_id": score_key[2],
+                        "scoring_period_id": score_key[3]}, "values": changes, "row": score_row})
+
+            deltas += self.diff_roster_slots(matchup)
+        return deltas
+
+    def diff_roster_slots(self, matchup: Matchup = None):
+        deltas = []
+        team_ids = {matchup.home_team_id, matchup.away_team_id}
+        current_slots = {}
+        for roster_slot in matchup.get_roster_slots():
+            current_slots[(roster_slot.team_id, roster_slot.player_id)] = roster_slot
+
+        for slot_key, roster_slot in current_slots.items():
+            if self._roster_slots.get(slot_key) != roster_slot.lineup_slot_id:
+                self._roster_slots[slot_key] = roster_slot.lineup_slot_id
+                deltas.append({"entity": "roster_slot", "action": "update", "key": {
+                    "team_id": slot_key[0], "player_id": slot_key[1]},
+                    "values": {"lineup_slot_id": roster_slot.lineup_slot_id},
+                    "row": roster_slot.serialize_for_db()})
+
+        for slot_key in list(self._roster_slots):
+            if slot_key[0] in team_ids and slot_key not in current_slots:
+                del self._roster_slots[slot_key]
+                deltas.append({"entity": "roster_slot", "action": "remove", "key": {
+                    "team_id": slot_key[0], "player_id": slot_key[1]}, "values": {}})
+        return deltas
+
+    def write_deltas(self, deltas: list = None):
+        if self.database is None or not deltas:
+            return
+        upserts = {
+            "matchup": ("matchups", ["id"]),
+            "player_score": ("matchup_player_scores", ["matchup_id", "team_id", "player_id", "scoring_period_id"]),
+            "roster_slot": ("rosters", ["team_id", "player_id"]),
+        }
+        for entity, (table, index_elements) in upserts.items():
+            rows = [
+                delta["row"] for delta in deltas if delta["entity"] == entity and delta["action"] == "update"
+            ]
+            if rows:
+                self.database.upsert(table, rows, index_elements)
+        for delta in deltas:
+            if delta["entity"] == "roster_slot" and delta["action"] == "remove":
+                self.database.delete("rosters", delta["key"])
+
+    def run(self, stop_event: threading.Event = None, max_polls: int = None):
+        """
+        Poll on the configured interval until the stop event is set or max_polls is reached.
+
+        Args:
+            stop_event (threading.Event): Set from another thread to stop polling. Defaults to never stopping.
+            max_polls (int): The maximum number of polls to run. Defaults to unlimited.
+        """
+        stop_event = stop_event or threading.Event()
+        polls = 0
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception as exc:
+                print(f"LiveScorePoller failed to poll\n{exc}\n\n")
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            stop_event.wait(
+                max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,412 @@
+import csv
+import json
+import os
+import uuid
+from classes.espn.base import Stat
+from classes.instrumentation import metrics
+from classes.player_search import normalize_name
+from classes.player_stats import load_numpy, STAT_VECTOR_SIZE
+
+MANIFEST_FILE = "manifest.json"
+
+# Columns read as the ESPN player id, the player name, the pro team and the scoring period, in that order of preference
+PLAYER_ID_COLUMNS = ("espn_id", "player_id", "id")
+
+# The only id column trusted without known players, the others usually hold the source's own ids
+ESPN_ID_COLUMN = "espn_id"
+NAME_COLUMNS = ("name", "player", "player_name", "full_name")
+TEAM_COLUMNS = ("team", "pro_team")
+PERIOD_COLUMNS = ("scoring_period_id", "period")
+
+# Periods without a period column hold season projections
+SEASON_PERIOD = 0
+
+# Rows read from a Parquet file at a time
+PARQUET_BATCH_SIZE = 65536
+
+# False until load_pyarrow first runs, None when the package is not installed
+pyarrow_parquet = False
+
+
+def load_pyarrow():
+    """
+    Import the optional ``pyarrow.parquet`` module on first use.
+
+    :return: The pyarrow.parquet module, or None when it is not installed.
+    """
+    global pyarrow_parquet
+    if pyarrow_parquet is False:
+        try:
+            import pyarrow.parquet as parquet_module
+            pyarrow_parquet = parquet_module
+        except ImportError:
+            pyarrow_parquet = None
+    return pyarrow_parquet
+
+
+def stat_columns(header: list = None, column_map: dict = None):
+    """
+    Map projection file columns to Stat ids.
+
+    Columns are matched to the ``Stat`` shorthand or name, case insensitively. Shorthands shared by
+    two stats (e.g. HBP for hitters and pitchers) and names the file uses differently (e.g. "BB")
+    must be given in ``column_map``.
+
+    Returns:
+        dict: Column name to Stat id.
+    """
+    candidates = {}
+    for stat in Stat:
+        if 0 <= stat.id < STAT_VECTOR_SIZE:
+            for key in {stat.shorthand.lower(), stat.name.lower()}:
+                candidates.setdefault(key, set()).add(stat.id)
+    columns = {}
+    for column in header:
+        if column_map and column in column_map:
+            columns[column] = int(column_map[column])
+            continue
+        stat_ids = candidates.get(column.strip().lower(), set())
+        if len(stat_ids) == 1:
+            columns[column] = next(iter(stat_ids))
+    return columns
+
+
+def find_column(header: list = None, names: tuple = None):
+    """
+    Find the first of the given column names in a file header, case insensitively.
+    """
+    columns = {column.strip().lower(): column for column in header}
+    for name in names:
+        if name in columns:
+            return columns[name]
+    return None
+
+
+class ProjectionStore(object):
+    def __init__(self, directory: str = None):
+        """
+        Initialize a store of projections kept as one memory-mapped array of players x stats x periods.
+
+        Values are float32 ``.npy`` files indexed by Stat id (NaN where a stat is not projected), next
+        to the sorted player ids and periods they are indexed by. Files are opened with ``mmap``, so
+        every worker process reading the same store shares one copy of the pages. Every write
+        creates new files and then swaps ``manifest.json`` to them, so readers never see a
+        half-written store. They pick the new version up with :meth:`refresh`, which only checks the
+        manifest until it changes.
+
+        Args:
+            directory (str): The directory the store lives in.
+        """
+        self.directory = directory
+        self.version = None
+        self.values = None
+        self.player_ids = None
+        self.periods = None
+        self._rows = {}
+        self._manifest_stat = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def create(self, player_ids: list = None, periods: list = None):
+        """
+        Start a new version of the store, with every projection missing.
+
+        Args:
+            player_ids (list): The sorted ESPN player ids of the first axis.
+            periods (list): The sorted scoring periods of the last axis, 0 for season projections.
+
+        Returns:
+            tuple: The version and its writable values array, shaped (players, STAT_VECTOR_SIZE, periods).
+            Readers only see it after :meth:`publish`.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            raise ValueError("numpy is required to write projections")
+        os.makedirs(self.directory, exist_ok=True)
+        version = uuid.uuid4().hex
+        numpy.save(os.path.join(self.directory, f"player_ids-{version}.npy"),
+                   numpy.asarray(player_ids, dtype=numpy.int64))
+        numpy.save(os.path.join(self.directory, f"periods-{version}.npy"),
+                   numpy.asarray(periods, dtype=numpy.int32))
+        # Written straight to disk, a full season of daily projections never has to fit in memory
+        values = numpy.lib.format.open_memmap(
+            os.path.join(self.directory, f"values-{version}.npy"), mode="w+", dtype=numpy.float32,
+            shape=(len(player_ids), STAT_VECTOR_SIZE, len(periods)))
+        values[:] = numpy.nan
+        return version, values
+
+    def publish(self, version: str = None, values=None):
+        """
+        Make a version created with :meth:`create` the one readers map, and remove the previous one.
+        """
+        values.flush()
+        manifest = {
+            "version": version,
+            "files": {name: f"{name}-{version}.npy" for name in ("values", "player_ids", "periods")},
+            "shape": list(values.shape),
+        }
+        temporary_path = f"{self.manifest_path}.{version}.tmp"
+        with open(temporary_path, "w") as outfile:
+            json.dump(manifest, outfile)
+        previous = self.read_manifest() if os.path.exists(self.manifest_path) else None
+        os.replace(temporary_path, self.manifest_path)
+        # Readers that mapped the previous version keep their pages after the files are unlinked
+        if previous is not None:
+            for file_name in previous.get("files", dict()).values():
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except OSError:
+                    pass
+        return version
+
+    def write(self, player_ids: list = None, periods: list = None, values=None):
+        """
+        Write a whole new version of the store from a (players, STAT_VECTOR_SIZE, periods) array.
+        """
+        version, stored_values = self.create(player_ids, periods)
+        stored_values[:] = values
+        return self.publish(version, stored_values)
+
+    def read_manifest(self):
+        with open(self.manifest_path) as infile:
+            return json.load(infile)
+
+    def refresh(self):
+        """
+        Map the newest version of the store, if it changed since the last call.
+
+        Returns:
+            bool: True if a new version was mapped.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            raise ValueError("numpy is required to read projections")
+        if not os.path.exists(self.manifest_path):
+            raise ValueError(f"Invalid Projection Store {self.directory}")
+        manifest_stat = os.stat(self.manifest_path)
+        manifest_key = (manifest_stat.st_mtime_ns, manifest_stat.st_size, manifest_stat.st_ino)
+        if manifest_key == self._manifest_stat:
+            return False
+        with metrics.span("projection_reload"):
+            for _ in range(3):
+                manifest = self.read_manifest()
+                if manifest["version"] == self.version:
+                    self._manifest_stat = manifest_key
+                    return False
+                files = manifest["files"]
+                try:
+                    values = numpy.load(os.path.join(self.directory, files["values"]), mmap_mode="r")
+                    player_ids = numpy.load(os.path.join(self.directory, files["player_ids"]), mmap_mode="r")
+                    periods = numpy.load(os.path.join(self.directory, files["periods"]))
+                except FileNotFoundError:
+                    # A newer version was published (and this one removed) between reading the manifest and its files
+                    continue
+                self.values, self.player_ids, self.periods = values, player_ids, periods
+                self._rows = {}
+                self.version = manifest["version"]
+                self._manifest_stat = manifest_key
+                return True
+        raise ValueError(f"Invalid Projection Store {self.directory}")
+
+    def player_row(self, player_id: int = None):
+        row = self._rows.get(player_id)
+        if row is None:
+            numpy = load_numpy()
+            row = int(numpy.searchsorted(self.player_ids, player_id))
+            if row >= len(self.player_ids) or self.player_ids[row] != player_id:
+                row = -1
+            self._rows[player_id] = row
+        return None if row < 0 else row
+
+    def period_column(self, scoring_period_id: int = None):
+        matches = load_numpy().flatnonzero(self.periods == scoring_period_id)
+        return int(matches[0]) if len(matches) else None
+
+    def get(self, player_id: int = None, scoring_period_id: int = SEASON_PERIOD):
+        """
+        Get a player's projection for a scoring period (0 for the season).
+
+        Returns:
+            dict: Stat id to projected value, empty when the player or period is not projected.
+        """
+        if self.values is None:
+            self.refresh()
+        row = self.player_row(player_id)
+        column = self.period_column(scoring_period_id)
+        if row is None or column is None:
+            return dict()
+        vector = self.values[row, :, column]
+        return {stat_id: float(value) for stat_id, value in enumerate(vector) if value == value}
+
+    def matrix(self, player_ids: list = None, stat_ids: list = None, scoring_period_id: int = SEASON_PERIOD):
+        """
+        Read the projections of many players as a players x stats array, NaN where a value is missing.
+        """
+        numpy = load_numpy()
+        if self.values is None:
+            self.refresh()
+        stat_ids = list(range(STAT_VECTOR_SIZE)) if stat_ids is None else list(stat_ids)
+        matrix = numpy.full((len(player_ids), len(stat_ids)), numpy.nan, dtype=numpy.float32)
+        column = self.period_column(scoring_period_id)
+        if column is None:
+            return matrix
+        rows = [self.player_row(player_id) for player_id in player_ids]
+        found = [index for index, row in enumerate(rows) if row is not None]
+        if found:
+            matrix[found] = self.values[[rows[index] for index in found]][:, stat_ids, column]
+        return matrix
+
+
+class ProjectionIngester(object):
+    def __init__(self, store: ProjectionStore = None, players: list = None, column_map: dict = None):
+        """
+        Initialize an ingester of third-party projection files.
+
+        Rows are matched to ESPN players by an id column when its value is the id of a known ESPN
+        player, otherwise by accent-folded name, using the pro team to tell players with the same name
+        apart. Without known players only an ``espn_id`` column is trusted. Columns are matched to
+        Stat ids, see ``stat_columns``. Files with a period column hold per scoring period projections,
+        the others hold season projections (period 0).
+
+        Args:
+            store (ProjectionStore): The store the projections are written to.
+            players (list): Player dictionaries with ``id``, ``name`` and ``team``, e.g. from ``setup_players``.
+            column_map (dict): File column to Stat id, for columns that do not match a Stat by name.
+        """
+        self.store = store
+        self.column_map = column_map or dict()
+        self._names = {}
+        self._player_ids = set()
+        for player in players or list():
+            if player.get("id") is not None:
+                self._player_ids.add(int(player["id"]))
+            if player.get("id") is not None and player.get("name"):
+                self._names.setdefault(normalize_name(player["name"]), list()).append(player)
+        self.unresolved = []
+        self.rows_read = 0
+
+    def read_rows(self, path: str = None):
+        """
+        Stream the rows of a CSV or Parquet file as dictionaries.
+        """
+        if path.lower().endswith((".parquet", ".pq")):
+            parquet = load_pyarrow()
+            if parquet is None:
+                raise ValueError("pyarrow is required to read Parquet projections")
+            for batch in parquet.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_SIZE):
+                yield from batch.to_pylist()
+            return
+        with open(path, newline="", encoding="utf-8-sig") as infile:
+            yield from csv.DictReader(infile)
+
+    def resolve_player(self, row: dict = None, id_column: str = None, name_column: str = None,
+                       team_column: str = None):
+        player_id = row.get(id_column) if id_column else None
+        if player_id not in (None, ""):
+            try:
+                player_id = int(float(player_id))
+            except (TypeError, ValueError):
+                player_id = None
+            # Files often carry their own ids under "id" or "player_id", so an id must name a known player
+            if player_id is not None and (player_id in self._player_ids or (
+                    not self._player_ids and id_column.strip().lower() == ESPN_ID_COLUMN)):
+                return player_id
+        name = row.get(name_column) if name_column else None
+        matches = self._names.get(normalize_name(str(name or "")), list())
+        if len(matches) > 1 and team_column:
+            team = str(row.get(team_column) or "").upper()
+            matches = [player for player in matches if str(player.get("team") or "").upper() == team]
+        if len(matches) == 1:
+            return matches[0]["id"]
+        self.unresolved.append(name)
+        return None
+
+    def read_projections(self, paths: list = None):
+        """
+        Stream the rows of projection files that match a player.
+
+        Returns:
+            generator: (player id, scoring period id, stat ids, values) for every matched row.
+        """
+        for path in paths or list():
+            columns = None
+            for row in self.read_rows(path):
+                if columns is None:
+                    header = list(row)
+                    identity = [find_column(header, names) for names in (
+                        PLAYER_ID_COLUMNS, NAME_COLUMNS, TEAM_COLUMNS)]
+                    period_column = find_column(header, PERIOD_COLUMNS)
+                    columns = {
+                        column: stat_id for column, stat_id in stat_columns(header, self.column_map).items()
+                        if column not in identity and column != period_column
+                    }
+                self.rows_read += 1
+                player_id = self.resolve_player(row, *identity)
+                if player_id is None:
+                    continue
+                period = row.get(period_column) if period_column else None
+                period = SEASON_PERIOD if period in (None, "") else int(float(period))
+                stat_ids = []
+                values = []
+                for column, stat_id in columns.items():
+                    value = row.get(column)
+                    if value in (None, ""):
+                        continue
+                    try:
+                        values.append(float(value))
+                    except (TypeError, ValueError):
+                        continue
+                    stat_ids.append(stat_id)
+                yield player_id, period, stat_ids, values
+
+    def ingest(self, paths: list = None):
+        """
+        Read projection files and write them to the store as a new version.
+
+        The files are read twice, once to collect the players and periods the array is sized by and
+        once to stream the values straight into it, so no more than a row is held outside the array.
+        Later files win where two files project the same player, stat and period.
+
+        Args:
+            paths (list): CSV (``.csv``) or Parquet (``.parquet``) files.
+
+        Returns:
+            dict: The number of rows read and of players stored, the periods stored and the number of rows
+            that matched no player.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            raise ValueError("numpy is required to ingest projections")
+        paths = list(paths or list())
+        self.unresolved = []
+        self.rows_read = 0
+        with metrics.span("projection_ingest"):
+            player_ids = set()
+            periods = set()
+            for player_id, period, _, _ in self.read_projections(paths):
+                player_ids.add(player_id)
+                periods.add(period)
+            player_ids = sorted(player_ids)
+            periods = sorted(periods)
+            # The second pass resolves the same rows again, the first pass already counted them
+            rows_read, unresolved = self.rows_read, self.unresolved
+            self.unresolved = []
+            player_rows = {player_id: row for row, player_id in enumerate(player_ids)}
+            period_columns = {period: column for column, period in enumerate(periods)}
+            version, values = self.store.create(player_ids, periods)
+            for player_id, period, stat_ids, row_values in self.read_projections(paths):
+                if stat_ids:
+                    values[player_rows[player_id], stat_ids, period_columns[period]] = row_values
+            self.store.publish(version, values)
+            self.rows_read, self.unresolved = rows_read, unresolved
+        if self.unresolved:
+            print(f"{len(self.unresolved)} projection rows did not match a player\n"
+                  f"{sorted(set(map(str, self.unresolved)))[:20]}\n\n")
+        return {
+            "rows": self.rows_read,
+            "players": len(player_ids),
+            "periods": periods,
+            "unresolved": len(self.unresolved),
+        }
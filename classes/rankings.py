@@ -0,0 +1,143 @@
+from bisect import bisect_left, insort
+from classes.espn.base import Position
+from classes.espn.settings import ScoringSettings
+
+# Slots a player can always be moved to, they never decide who is the best available
+IGNORED_SLOTS = frozenset({Position.BENCH.id, Position.INJURED_LIST.id})
+
+
+def scoring_weights(scoring_settings: ScoringSettings = None, slot_id: int = None):
+    """
+    Build the points awarded per unit of every scored stat, applying the point overrides of a lineup slot.
+
+    Returns:
+        dict: Stat id to points.
+    """
+    weights = {}
+    for item in scoring_settings.scoring_items:
+        points = item.points or 0.0
+        for override in item.point_overrides:
+            if slot_id is not None and str(override.key) == str(slot_id):
+                points = override.value
+        weights[item.stat_id] = points
+    return weights
+
+
+def projected_points(stats: dict = None, weights: dict = None):
+    return sum(weights[stat_id] * value for stat_id, value in stats.items() if stat_id in weights and value)
+
+
+class FreeAgentRanking(object):
+    def __init__(self, scoring_settings: ScoringSettings = None):
+        """
+        Initialize an index of available players ranked by projected fantasy points per lineup slot.
+
+        Every lineup slot a player is eligible for keeps a sorted array of (-points, player id), so the
+        best K players of a slot are its first K entries. Adding, dropping or re-projecting a player only
+        touches the slots that player is eligible for, and a top K query never looks past the first K
+        entries, however large the pool is. The same answer serves every team asking about the slot.
+
+        Args:
+            scoring_settings (ScoringSettings): The league scoring the projected points are computed with.
+        """
+        self.scoring_settings = scoring_settings
+        self._weights = {}
+        self._slots = {}
+        self._players = {}
+
+    def __len__(self):
+        return len(self._players)
+
+    def __contains__(self, player_id: int = None):
+        return player_id in self._players
+
+    def weights(self, slot_id: int = None):
+        # Point overrides make the weights slot specific, so they are built once per slot
+        weights = self._weights.get(slot_id)
+        if weights is None:
+            weights = scoring_weights(self.scoring_settings, slot_id)
+            self._weights[slot_id] = weights
+        return weights
+
+    def add(self, player_id: int = None, eligible_slots: list = None, stats: dict = None, row: dict = None):
+        """
+        Add a player to the index, replacing their previous entry.
+
+        Args:
+            player_id (int): The player to add.
+            eligible_slots (list): The lineup slot ids the player is eligible for.
+            stats (dict): Stat id to projected value.
+            row (dict): Any data returned alongside the player by :meth:`top`.
+        """
+        if player_id in self._players:
+            self.remove(player_id)
+        entries = {}
+        for slot_id in set(eligible_slots or list()) - IGNORED_SLOTS:
+            key = (-projected_points(stats or dict(), self.weights(slot_id)), player_id)
+            insort(self._slots.setdefault(slot_id, list()), key)
+            entries[slot_id] = key
+        self._players[player_id] = (entries, row)
+
+    def remove(self, player_id: int = None):
+        """
+        Remove a player from every slot they are ranked in. Unknown players are ignored.
+        """
+        entries, _ = self._players.pop(player_id, (dict(), None))
+        for slot_id, key in entries.items():
+            ranked = self._slots[slot_id]
+            index = bisect_left(ranked, key)
+            if index < len(ranked) and ranked[index] == key:
+                del ranked[index]
+
+    def top(self, slot_id: int = None, k: int = 10, exclude: set = None):
+        """
+        Get the best available players of a lineup slot.
+
+        Args:
+            slot_id (int): The lineup slot, see ``Position``.
+            k (int): The number of players to return. Defaults to 10.
+            exclude (set): Player ids to skip, e.g. players a team already claimed this round.
+
+        Returns:
+            list: (player id, projected points, row) tuples, best first.
+        """
+        results = []
+        for points, player_id in self._slots.get(slot_id, list()):
+            if len(results) >= k:
+                break
+            if exclude and player_id in exclude:
+                continue
+            results.append((player_id, -points, self._players[player_id][1]))
+        return results
+
+    def top_by_slot(self, slot_ids: list = None, k: int = 10):
+        """
+        Get the best available players of many lineup slots at once, e.g. every open slot of every team.
+
+        Returns:
+            dict: Slot id to the result of :meth:`top`, computed once per distinct slot.
+        """
+        return {slot_id: self.top(slot_id, k) for slot_id in set(slot_ids or self._slots)}
+
+    def apply_deltas(self, deltas: list = None):
+        """
+        Keep the index in step with the free-agent pool, see ``FreeAgentWatcher``.
+
+        Args:
+            deltas (list): Free-agent deltas. "join" and "update" (re)rank the player, "leave" removes them.
+        """
+        for delta in deltas or list():
+            if delta.get("entity") != "free_agent":
+                continue
+            player_id = delta["key"]["id"]
+            if delta["action"] == "leave":
+                self.remove(player_id)
+                continue
+            row = delta["row"]
+            if delta["action"] == "update" and player_id in self and not \
+                    {"eligible_slots", "projected_stats"} & set(delta["values"]):
+                # Nothing that affects the ranking moved, only refresh the returned row
+                self._players[player_id] = (self._players[player_id][0], row)
+                continue
+            self.add(player_id, row.get("eligible_slots"),
+                     row.get("projected_stats"), row)
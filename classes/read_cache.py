@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Reference tables only change when the league is set up or its settings are edited
+PINNED_TABLES = ("stats", "positions", "divisions", "settings")
+PINNED_TABLE_PREFIXES = ("settings_",)
+
+PINNED = "pinned"
+LRU = "lru"
+
+
+class TablePolicy(object):
+    def __init__(self, kind: str = LRU, max_entries: int = 256, ttl: float = 60.0):
+        """
+        Initialize the caching policy of one table.
+
+        Args:
+            kind (str): "pinned" keeps every read until the table is written to, "lru" evicts the least
+                recently used reads past ``max_entries`` and expires reads older than ``ttl``. Defaults to "lru".
+            max_entries (int): The number of reads kept for an LRU table. Defaults to 256.
+            ttl (float): Seconds an LRU read stays valid, or None to never expire. Defaults to 60.
+        """
+        if kind not in (PINNED, LRU):
+            raise ValueError(f"Invalid Cache Policy {kind}")
+        self.kind = kind
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+
+class ReadCache(object):
+    def __init__(self, policies: dict = None, default_policy: TablePolicy = None):
+        """
+        Initialize a read-through cache of query results, partitioned by table.
+
+        Reference tables (see ``PINNED_TABLES``) are pinned by default and every other table uses
+        ``default_policy``. Writing to a table invalidates all of its cached reads. Each table also keeps
+        a generation number, so a read that raced with a write is never stored.
+
+        Args:
+            policies (dict): Table name to :class:`TablePolicy`, overriding the defaults.
+            default_policy (TablePolicy): The policy of tables that are neither pinned nor listed in
+                ``policies``. Defaults to an LRU of 256 reads with a 60 second TTL.
+        """
+        self.policies = dict(policies or dict())
+        self.default_policy = default_policy or TablePolicy()
+        self.pinned_policy = TablePolicy(kind=PINNED)
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def policy(self, table_name: str = None):
+        policy = self.policies.get(table_name)
+        if policy is not None:
+            return policy
+        if table_name in PINNED_TABLES or table_name.startswith(PINNED_TABLE_PREFIXES):
+            return self.pinned_policy
+        return self.default_policy
+
+    def generation(self, table_name: str = None):
+        return self._generations.get(table_name, 0)
+
+    def get(self, table_name: str = None, key: tuple = None):
+        """
+        Look up a cached read.
+
+        Returns:
+            tuple: Whether the read was found and its result, since None is a valid cached result.
+        """
+        policy = self.policy(table_name)
+        with self._lock:
+            entries = self._entries.get(table_name)
+            entry = entries.get(key) if entries is not None else None
+            if entry is None or (policy.kind == LRU and policy.ttl is not None
+                                 and time.monotonic() - entry[1] > policy.ttl):
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return False, None
+            if policy.kind == LRU:
+                entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def set(self, table_name: str = None, key: tuple = None, result=None, generation: int = None):
+        policy = self.policy(table_name)
+        with self._lock:
+            # The table was written to while the read ran, so the result may already be stale
+            if generation is not None and generation != self.generation(table_name):
+                return
+            entries = self._entries.setdefault(table_name, OrderedDict())
+            entries[key] = (result, time.monotonic())
+            entries.move_to_end(key)
+            if policy.kind == LRU:
+                while len(entries) > policy.max_entries:
+                    entries.popitem(last=False)
+
+    def invalidate(self, table_name: str = None):
+        with self._lock:
+            self._generations[table_name] = self.generation(table_name) + 1
+            if self._entries.pop(table_name, None):
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for table_name in self._entries:
+                self._generations[table_name] = self.generation(
+                    table_name) + 1
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Retrieve hit, miss and size figures of the cache.
+
+        Returns:
+            dict: The hit and miss counts, the hit ratio, the number of invalidations and the number of
+            cached reads per table.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": {table_name: len(entries) for table_name, entries in self._entries.items()},
+            }
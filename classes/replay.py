@@ -0,0 +1,112 @@
+import gzip
+import json
+import os
+from classes.api import FantasyBaseballAPI
+from classes.snapshots import SnapshotStore, request_view
+
+
+def fixture_path(directory: str = None, view: str = None, request_digest: str = None):
+    # View names contain ':' and '+', which are not portable in file names
+    view_directory = view.replace(":", "__").replace("+", "_")
+    return os.path.join(directory, view_directory, f"{request_digest}.json.gz")
+
+
+class SnapshotReplaySource(object):
+    def __init__(self, store: SnapshotStore = None, league_id: str = None, season: int = None, as_of: float = None):
+        """
+        Initialize a replay source that answers requests from a snapshot archive.
+
+        Args:
+            store (SnapshotStore): The archive to read from.
+            league_id (str): The league the responses were archived for.
+            season (int): The season the responses were archived for.
+            as_of (float): Replay the responses that were current at this epoch time. Defaults to the latest.
+        """
+        self.store = store
+        self.league_id = league_id
+        self.season = season
+        self.as_of = as_of
+
+    def fetch(self, endpoint: str = "", params: dict = None, headers: dict = None):
+        view, request_digest = request_view(endpoint, params, headers)
+        data = self.store.latest(
+            self.league_id, self.season, view, request_digest, self.as_of)
+        if data is None:
+            raise ValueError(f"No archived response for {view} ({request_digest})")
+        return data
+
+
+class FixtureReplaySource(object):
+    def __init__(self, directory: str = None):
+        """
+        Initialize a replay source that answers requests from a directory of recorded fixtures.
+
+        Fixtures are gzipped JSON files laid out by :func:`fixture_path`, as written by
+        :func:`export_fixtures` or :meth:`record`.
+
+        Args:
+            directory (str): The fixture directory.
+        """
+        self.directory = directory
+
+    def fetch(self, endpoint: str = "", params: dict = None, headers: dict = None):
+        view, request_digest = request_view(endpoint, params, headers)
+        path = fixture_path(self.directory, view, request_digest)
+        if not os.path.exists(path):
+            raise ValueError(f"No recorded fixture for {view} ({request_digest})")
+        with gzip.open(path, "rb") as infile:
+            return json.loads(infile.read())
+
+    def record(self, data=None, endpoint: str = "", params: dict = None, headers: dict = None):
+        """
+        Store a response as the fixture for the given request.
+        """
+        view, request_digest = request_view(endpoint, params, headers)
+        path = fixture_path(self.directory, view, request_digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, "wb") as outfile:
+            outfile.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def export_fixtures(store: SnapshotStore = None, league_id: str = None, season: int = None, directory: str = None,
+                    as_of: float = None):
+    """
+    Write the archived responses of a league that were current at a point in time as fixtures.
+
+    Returns:
+        int: The number of fixtures written.
+    """
+    latest = {}
+    for row in store.history(league_id, season):
+        if as_of is None or row["fetched_at"] <= as_of:
+            latest[(row["view"], row["request_digest"])] = row["digest"]
+    for (view, request_digest), digest in latest.items():
+        path = fixture_path(directory, view, request_digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, "wb") as outfile:
+            outfile.write(json.dumps(store.load(digest), separators=(",", ":")).encode("utf-8"))
+    return len(latest)
+
+
+class ReplayAPI(FantasyBaseballAPI):
+    def __init__(self, source=None, season: str = None, league_id: str = None):
+        """
+        Initialize an API client that never touches the network.
+
+        Every request is answered by the replay source, so anything built on
+        :class:`FantasyBaseballAPI` (league creation, updates, players, schedules) runs offline.
+
+        Args:
+            source: A :class:`SnapshotReplaySource`, :class:`FixtureReplaySource` or any object with a
+                ``fetch(endpoint, params, headers)`` method.
+            season (str): The season being replayed.
+            league_id (str): The league being replayed.
+        """
+        self.source = source
+        super().__init__(is_private=False, season=season, league_id=league_id)
+
+    def initialize_session(self, is_private: bool = True, espn_s2: str = None, swid: str = None):
+        self.session = None
+
+    def send_request(self, endpoint: str = "", params: dict = None, headers: dict = None):
+        return self.source.fetch(endpoint=endpoint, params=params, headers=headers)
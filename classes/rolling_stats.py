@@ -0,0 +1,272 @@
+from classes.espn.base import Stat
+from classes.instrumentation import metrics
+from classes.player_stats import PlayerStatsStore, STAT_VECTOR_SIZE
+
+WINDOWS_TABLE = "player_stat_windows"
+
+# Window name to its length in scoring periods, None spans the whole season
+WINDOWS = {
+    "last_7": 7,
+    "last_14": 14,
+    "last_30": 30,
+    "season": None,
+}
+
+
+def ratio(numerator: float = None, denominator: float = None, scale: float = 1.0):
+    if numerator is None or not denominator:
+        return None
+    return scale * numerator / denominator
+
+
+def total(totals: list = None, *stats):
+    values = [totals[stat.id] for stat in stats]
+    if all(value is None for value in values):
+        return None
+    return sum(value for value in values if value is not None)
+
+
+def on_base_percentage(totals: list = None):
+    return ratio(total(totals, Stat.HITS, Stat.WALKS, Stat.HIT_BY_PITCH),
+                 total(totals, Stat.AT_BATS, Stat.WALKS, Stat.HIT_BY_PITCH, Stat.SACRIFICE_FLY))
+
+
+def on_base_plus_slugging(totals: list = None):
+    on_base = on_base_percentage(totals)
+    slugging = ratio(totals[Stat.TOTAL_BASES.id], totals[Stat.AT_BATS.id])
+    if on_base is None or slugging is None:
+        return None
+    return on_base + slugging
+
+
+def runs_created(totals: list = None):
+    # Basic runs created, (H + BB) * TB / (AB + BB), is a product of totals and does not add up across periods
+    on_base = total(totals, Stat.HITS, Stat.WALKS)
+    if on_base is None or totals[Stat.TOTAL_BASES.id] is None:
+        return None
+    return ratio(on_base * totals[Stat.TOTAL_BASES.id], total(totals, Stat.AT_BATS, Stat.WALKS))
+
+
+# Ratio stats are derived from the summed components of a window, summing or averaging them is meaningless
+RATIO_STATS = {
+    Stat.BATTING_AVG: lambda totals: ratio(totals[Stat.HITS.id], totals[Stat.AT_BATS.id]),
+    Stat.SLUGGING_PERCENT: lambda totals: ratio(totals[Stat.TOTAL_BASES.id], totals[Stat.AT_BATS.id]),
+    Stat.ON_BASE_PERCENTAGE: on_base_percentage,
+    Stat.ON_BASE_PLUS_SLUGGING: on_base_plus_slugging,
+    Stat.RUNS_CREATED: runs_created,
+    Stat.PITCHES_PER_APPEARANCE: lambda totals: ratio(totals[Stat.PITCHES_SEEN.id], totals[Stat.PLATE_APPEARANCES.id]),
+    # Innings pitched are outs / 3, so per 9 innings is 27 per out
+    Stat.EARNED_RUN_AVERAGE: lambda totals: ratio(totals[Stat.EARNED_RUNS.id], totals[Stat.OUTS.id], 27.0),
+    Stat.WHIP: lambda totals: ratio(total(totals, Stat.WALKS_ALLOWED, Stat.HITS_ALLOWED), totals[Stat.OUTS.id], 3.0),
+    Stat.STEIKE_OUTS_PER_9_INNINGS: lambda totals: ratio(totals[Stat.STRIKE_OUTS.id], totals[Stat.OUTS.id], 27.0),
+    Stat.STRIKEOUTS_PER_WALK: lambda totals: ratio(totals[Stat.STRIKE_OUTS.id], totals[Stat.WALKS_ALLOWED.id]),
+    Stat.WIN_PERCENTAGE: lambda totals: ratio(totals[Stat.WINS.id], total(totals, Stat.WINS, Stat.LOSSES)),
+    Stat.SAVE_PERCENTAGE: lambda totals: ratio(totals[Stat.SAVES.id], totals[Stat.SAVE_OPPORTUNITIES.id]),
+    Stat.FIELDING_PERCENTAGE: lambda totals: ratio(total(totals, Stat.PUTOUTS, Stat.ASSISTS),
+                                                   totals[Stat.TOTAL_CHANCES.id]),
+    # The components of these are not recorded, so they are left empty rather than summed
+    Stat.OPPONENT_BATTING_AVG: lambda totals: None,
+    Stat.OPPONENT_ON_BASE_PERCENTAGE: lambda totals: None,
+}
+
+RATIO_STAT_IDS = frozenset(stat.id for stat in RATIO_STATS)
+
+
+def add_vector(totals: list = None, vector: list = None, sign: int = 1):
+    """
+    Add (or with ``sign=-1`` subtract) a period's counting stats to running totals in place.
+    """
+    for stat_id, value in enumerate(vector[:STAT_VECTOR_SIZE]):
+        if value is None or stat_id in RATIO_STAT_IDS:
+            continue
+        totals[stat_id] = (totals[stat_id] or 0.0) + sign * value
+    return totals
+
+
+def derive_ratios(totals: list = None):
+    """
+    Fill the ratio stats of a totals vector from its summed components.
+    """
+    for stat, derive in RATIO_STATS.items():
+        totals[stat.id] = derive(totals)
+    return totals
+
+
+class RollingStats(object):
+    def __init__(self, database=None, windows: dict = None):
+        """
+        Initialize the rolling window aggregates kept on top of the player stats store.
+
+        Every window (last 7, 14 and 30 scoring periods and the season to date by default) keeps one
+        totals vector per player in ``player_stat_windows``. Moving a window forward by one period adds
+        the entering period and subtracts the period that leaves it, so a refresh only reads the
+        periods at the edges of each window instead of rescanning the season. Rewriting a period the
+        window already counts, as every live refresh of the current period does, subtracts the values
+        it replaced and adds the new ones. A window is rebuilt from the store only when it was never
+        built or fell further behind than its length.
+
+        Args:
+            database (DatabaseEngine): The engine to read and write through.
+            windows (dict): Window name to length in scoring periods (None for the whole season). Defaults to ``WINDOWS``.
+        """
+        self.database = database
+        self.store = PlayerStatsStore(database)
+        self.windows = windows or WINDOWS
+
+    def load_totals(self, season: int = None, window_name: str = None):
+        """
+        Load the current totals of a window.
+
+        Returns:
+            tuple: The period the window runs through (None if it was never built) and the totals by player id.
+        """
+        cursor = self.database.session.connection().connection.cursor()
+        cursor.execute(
+            f"SELECT player_id, through_period, stat_totals FROM {WINDOWS_TABLE} "
+            f"WHERE season = %s AND window_name = %s", (season, window_name))
+        through_period = None
+        totals = {}
+        for player_id, player_through_period, stat_totals in cursor.fetchall():
+            through_period = player_through_period if through_period is None else max(
+                through_period, player_through_period)
+            totals[player_id] = list(stat_totals) + \
+                [None] * (STAT_VECTOR_SIZE - len(stat_totals))
+        return through_period, totals
+
+    def window_start(self, length: int = None, scoring_period_id: int = None):
+        return 0 if length is None else scoring_period_id - length + 1
+
+    def rebuild(self, season: int = None, length: int = None, scoring_period_id: int = None):
+        with metrics.span("rolling_stats", action="rebuild"):
+            totals = {}
+            for player_id, _, vector in self.store.load_vectors(
+                    season, self.window_start(length, scoring_period_id), scoring_period_id):
+                add_vector(totals.setdefault(
+                    player_id, [None] * STAT_VECTOR_SIZE), vector)
+            return totals
+
+    def advance(self, season: int = None, length: int = None, totals: dict = None, through_period: int = None,
+                scoring_period_id: int = None):
+        with metrics.span("rolling_stats", action="advance"):
+            # The periods entering the window are added and the same number leaving it are subtracted
+            edges = [(through_period + 1, scoring_period_id, 1)]
+            if length is not None and scoring_period_id - length >= 0:
+                edges.append((max(through_period + 1 - length, 0),
+                              scoring_period_id - length, -1))
+            changed = set()
+            for first_period, last_period, sign in edges:
+                for player_id, _, vector in self.store.load_vectors(season, first_period, last_period):
+                    add_vector(totals.setdefault(
+                        player_id, [None] * STAT_VECTOR_SIZE), vector, sign)
+                    changed.add(player_id)
+            return changed
+
+    def replace(self, season: int = None, length: int = None, totals: dict = None, through_period: int = None,
+                previous: dict = None):
+        with metrics.span("rolling_stats", action="replace"):
+            # Rewritten rows inside the window swap the value they replaced for their new value
+            first_period = self.window_start(length, through_period)
+            keys = {
+                (player_id, scoring_period_id): vector
+                for (player_id, written_season, scoring_period_id), vector in previous.items()
+                if written_season == season and first_period <= scoring_period_id <= through_period
+            }
+            if not keys:
+                return set()
+            periods = [scoring_period_id for _, scoring_period_id in keys]
+            for player_id, scoring_period_id, vector in self.store.load_vectors(
+                    season, min(periods), max(periods), {player_id for player_id, _ in keys}):
+                if (player_id, scoring_period_id) in keys:
+                    add_vector(totals.setdefault(
+                        player_id, [None] * STAT_VECTOR_SIZE), vector)
+            for (player_id, _), vector in keys.items():
+                if vector is not None:
+                    add_vector(totals.setdefault(
+                        player_id, [None] * STAT_VECTOR_SIZE), vector, -1)
+            return {player_id for player_id, _ in keys}
+
+    def refresh(self, season: int = None, scoring_period_ids: list = None, previous: dict = None):
+        """
+        Bring every window up to date after the given scoring periods were written.
+
+        Args:
+            season (int): The season that was written.
+            scoring_period_ids (list): The scoring periods that were written.
+            previous (dict): The rows written and the vectors they replaced, see ``PlayerStatsStore.write``.
+                Without it, rewriting a period a window already counts rebuilds that window.
+
+        Returns:
+            dict: Window name to "advance", "replace", "rebuild" or "current", describing how it was updated.
+        """
+        if not scoring_period_ids:
+            return dict()
+        latest = max(scoring_period_ids)
+        actions = {}
+        for window_name, length in self.windows.items():
+            through_period, totals = self.load_totals(season, window_name)
+            latest_window = max(latest, through_period or latest)
+            steps = latest_window - (through_period or 0)
+            rewritten = through_period is not None and min(scoring_period_ids) <= through_period
+            # Never built, rewritten without the replaced values, or catching up costs more than rescanning
+            if through_period is None or (rewritten and previous is None) or \
+                    (length is not None and steps > length):
+                totals = self.rebuild(season, length, latest_window)
+                changed = set(totals)
+                actions[window_name] = "rebuild"
+            elif rewritten or steps:
+                changed = set()
+                if rewritten:
+                    changed |= self.replace(
+                        season, length, totals, through_period, previous)
+                if steps:
+                    changed |= self.advance(
+                        season, length, totals, through_period, latest_window)
+                actions[window_name] = "advance" if steps else "replace"
+            else:
+                actions[window_name] = "current"
+                continue
+            self.write(season, window_name, latest_window, totals,
+                       changed, replace=actions[window_name] == "rebuild")
+        return actions
+
+    def write(self, season: int = None, window_name: str = None, through_period: int = None, totals: dict = None,
+              changed: set = None, replace: bool = False):
+        cursor = self.database.session.connection().connection.cursor()
+        if replace:
+            # A rebuilt window drops the players that no longer have stats inside it
+            cursor.execute(
+                f"DELETE FROM {WINDOWS_TABLE} WHERE season = %s AND window_name = %s", (season, window_name))
+        else:
+            # Players without stats at the window's edges keep their totals, only the window position moves
+            cursor.execute(
+                f"UPDATE {WINDOWS_TABLE} SET through_period = %s WHERE season = %s AND window_name = %s",
+                (through_period, season, window_name))
+        rows = [
+            {
+                "player_id": player_id,
+                "season": season,
+                "window_name": window_name,
+                "through_period": through_period,
+                "stat_totals": derive_ratios(totals[player_id]),
+            } for player_id in sorted(changed)
+        ]
+        if rows:
+            self.database.upsert(WINDOWS_TABLE, rows, index_elements=[
+                                 "player_id", "season", "window_name"])
+        else:
+            self.database.finish_write(WINDOWS_TABLE)
+
+    def get_window(self, season: int = None, window_name: str = "season", player_ids: list = None):
+        """
+        Read the totals of a window, with ratio stats derived from their components.
+
+        Returns:
+            dict: Player id to a dictionary of Stat name to value, leaving out stats that were never recorded.
+        """
+        _, totals = self.load_totals(season, window_name)
+        stats = [stat for stat in Stat if stat.id >= 0]
+        return {
+            player_id: {
+                stat.name: vector[stat.id] for stat in stats if vector[stat.id] is not None
+            } for player_id, vector in totals.items() if player_ids is None or player_id in player_ids
+        }
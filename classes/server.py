@@ -0,0 +1,362 @@
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qsl
+from classes.database import DatabaseEngine
+from classes.events import EventHub
+
+HTTP_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+MAX_HEADER_COUNT = 100
+
+EVENT_HEARTBEAT_SECONDS = 15.0
+
+# Encoded responses kept at once, the oldest is dropped first
+MAX_CACHED_RESPONSES = 1024
+
+
+def parse_flag(value: str = None):
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+class ResponseCache(object):
+    def __init__(self, max_entries: int = MAX_CACHED_RESPONSES):
+        """
+        Initialize an in-process cache of encoded responses keyed by request path.
+
+        Each entry remembers the tables it was built from, so a write to any of those tables
+        drops the entry. A per-table generation counter prevents a response that was being built
+        while its table was written to from being stored.
+
+        Args:
+            max_entries (int): The number of responses kept, the oldest is dropped first. Defaults to 1024.
+        """
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, tables: frozenset = None):
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def get(self, key: str = None):
+        return self._entries.get(key)
+
+    def set(self, key: str = None, entry: tuple = None, tables: frozenset = None, generation: tuple = None):
+        with self._lock:
+            current = tuple(self._generations.get(table, 0)
+                            for table in sorted(tables))
+            if current != generation:
+                return
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (entry, tables)
+
+    def invalidate(self, table_name: str = None):
+        """
+        Drop every cached response that was built from the given table.
+
+        Args:
+            table_name (str): The name of the table that changed.
+        """
+        with self._lock:
+            self._generations[table_name] = self._generations.get(
+                table_name, 0) + 1
+            for key, (_, tables) in list(self._entries.items()):
+                if table_name in tables:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            for table_name in self._generations:
+                self._generations[table_name] += 1
+            self._entries.clear()
+
+
+def row_to_dict(row):
+    return {column.name: getattr(row, column.name) for column in row.__table__.columns}
+
+
+class LeagueReadServer(object):
+    def __init__(self, database: DatabaseEngine = None, host: str = "127.0.0.1", port: int = 8080,
+                 events: EventHub = None, workers: int = 4):
+        """
+        Initialize a small read-only HTTP service that serves league data from the database as JSON.
+
+        Responses are encoded once and cached in memory until a write through the engine touches one
+        of the tables they were built from. Every response carries an ETag, so clients that send it back
+        in ``If-None-Match`` get an empty 304 without the database being touched.
+
+        Args:
+            database (DatabaseEngine): The engine to read from.
+            host (str): The interface to listen on. Defaults to "127.0.0.1".
+            port (int): The port to listen on. Defaults to 8080.
+            events (EventHub): When provided, live deltas are streamed to clients of ``/events``.
+            workers (int): The number of threads reading from the database at once. Keep this within
+                the engine's pool size. Defaults to 4.
+        """
+        self.database = database
+        self.host = host
+        self.port = port
+        self.events = events
+        self.cache = ResponseCache()
+        # Every query runs in its own unit of work, so workers never share a session
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="league-read")
+        self._pending = {}
+        self._server = None
+        # Path to its handler, the tables it reads and the query parameters it takes with their parsers
+        self.routes = {
+            "/teams": (self.read_teams, frozenset({"teams"}), dict()),
+            "/standings": (self.read_standings, frozenset({"teams"}), dict()),
+            "/settings": (self.read_settings, frozenset(self.get_settings_tables()), dict()),
+            "/rosters": (self.read_rosters, frozenset({"rosters"}), {"team_id": int}),
+            "/matchups": (self.read_matchups, frozenset({"matchups", "matchup_player_scores"}),
+                          {"matchup_period_id": int, "scores": parse_flag}),
+        }
+        self.database.add_write_listener(self.cache.invalidate)
+
+    def get_settings_tables(self):
+        return [
+            table.__name__ for table in self.database.get_tables() if table.__name__.startswith("settings")
+        ]
+
+    def read_teams(self, query: dict = None):
+        return [row_to_dict(row) for row in self.database.get_all("teams")]
+
+    def read_standings(self, query: dict = None):
+        standings = [
+            {
+                "team_id": team.id,
+                "name": team.name,
+                "abbreviation": team.abbreviation,
+                "division_id": team.division_id,
+                "playoff_seed": team.playoff_seed,
+                "points": team.points,
+                "current_projected_rank": team.current_projected_rank,
+                "rank_final": team.rank_final,
+            } for team in self.database.get_all("teams")
+        ]
+        # Seeds are 0 until ESPN assigns them, so unseeded teams fall back to points
+        standings.sort(key=lambda team: (
+            team["playoff_seed"] or len(standings) + 1, -(team["points"] or 0.0)))
+        return standings
+
+    def read_settings(self, query: dict = None):
+        return {
+            table_name: [row_to_dict(row) for row in self.database.get_all(table_name)] for table_name in self.get_settings_tables()
+        }
+
+    def read_filtered(self, table_name: str = None, column_name: str = None, query: dict = None):
+        if query.get(column_name) is None:
+            rows = self.database.get_all(table_name)
+        else:
+            rows = self.database.get_by_column_value(
+                table_name, column_name, query.get(column_name))
+        return [row_to_dict(row) for row in rows]
+
+    def read_rosters(self, query: dict = None):
+        return self.read_filtered("rosters", "team_id", query)
+
+    def read_matchups(self, query: dict = None):
+        matchups = self.read_filtered("matchups", "matchup_period_id", query)
+        if query.get("scores"):
+            # Only the scores of the selected matchups are read, grouped by matchup in one pass
+            scores = {matchup["id"]: list() for matchup in matchups}
+            for row in self.database.get_by_column_values("matchup_player_scores", "matchup_id", list(scores)):
+                scores[row.matchup_id].append(row_to_dict(row))
+            for matchup in matchups:
+                matchup["player_scores"] = scores[matchup["id"]]
+        return matchups
+
+    def build_entry(self, handler, query: dict = None):
+        with self.database.unit_of_work():
+            data = handler(query)
+        body = json.dumps(data, separators=(
+            ",", ":"), default=str).encode("utf-8")
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return body, etag
+
+    async def get_entry(self, path: str = None, query: dict = None):
+        key = f"{path}?{sorted(query.items())}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+        # Concurrent misses for the same resource share a single database read
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        handler, tables, _ = self.routes[path]
+        generation = self.cache.generation(tables)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, self.build_entry, handler, query)
+        self._pending[key] = future
+        try:
+            entry = await future
+        finally:
+            del self._pending[key]
+        self.cache.set(key, entry, tables, generation)
+        return entry
+
+    def encode_response(self, status: int = 200, body: bytes = b"", etag: str = None, keep_alive: bool = True,
+                        include_body: bool = True):
+        headers = [
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+            f"Date: {formatdate(usegmt=True)}",
+            "Content-Type: application/json",
+            "Cache-Control: no-cache",
+            f"Content-Length: {len(body) if status != 304 else 0}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if etag:
+            headers.append(f"ETag: {etag}")
+        head = ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1")
+        if status == 304 or not include_body:
+            return head
+        return head + body
+
+    async def read_request(self, reader: asyncio.StreamReader = None):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode(
+                "latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            return ("", "", "", dict())
+        headers = {}
+        for _ in range(MAX_HEADER_COUNT):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    async def respond(self, method: str = None, target: str = None, headers: dict = None, keep_alive: bool = True):
+        if not method:
+            return self.encode_response(400, b"", keep_alive=False)
+        if method not in ("GET", "HEAD"):
+            return self.encode_response(405, b"", keep_alive=keep_alive)
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if path not in self.routes:
+            return self.encode_response(404, b"", keep_alive=keep_alive)
+        # Only the parameters the route takes are parsed and cached on, unknown ones are ignored
+        _, _, parameters = self.routes[path]
+        query = {}
+        for name, value in parse_qsl(url.query):
+            if name not in parameters:
+                continue
+            try:
+                query[name] = parameters[name](value)
+            except ValueError:
+                return self.encode_response(400, b"", keep_alive=keep_alive)
+        try:
+            body, etag = await self.get_entry(path, query)
+        except Exception as exc:
+            print(f"LeagueReadServer failed to read {target}\n{exc}\n\n")
+            return self.encode_response(500, b"", keep_alive=keep_alive)
+        if etag in headers.get("if-none-match", ""):
+            return self.encode_response(304, etag=etag, keep_alive=keep_alive)
+        return self.encode_response(200, body, etag, keep_alive, include_body=method == "GET")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                if self.events is not None and method == "GET" and urlsplit(target).path.rstrip("/") == "/events":
+                    await self.stream_events(writer, target, headers)
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (
+                    version == "HTTP/1.1" or connection == "keep-alive")
+                writer.write(await self.respond(method, target, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream_events(self, writer: asyncio.StreamWriter = None, target: str = None, headers: dict = None):
+        """
+        Stream deltas to a client as server-sent events until it disconnects.
+
+        A client resumes by sending the last sequence it saw in the ``Last-Event-ID`` header (or the
+        ``since`` query parameter). If those events are no longer in the hub's history, a ``reset``
+        event tells the client to reload before the stream continues from the current sequence.
+        """
+        query = dict(parse_qsl(urlsplit(target).query))
+        last_event_id = headers.get("last-event-id", query.get("since"))
+        try:
+            last_sequence = int(last_event_id)
+        except (TypeError, ValueError):
+            last_sequence = self.events.sequence
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n\r\n"
+            "retry: 2000\n\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        while not writer.is_closing():
+            is_reset, frames = self.events.read_since(last_sequence)
+            if is_reset:
+                last_sequence = self.events.sequence
+                writer.write(
+                    f"id: {last_sequence}\nevent: reset\ndata: {{}}\n\n".encode("utf-8"))
+            elif frames:
+                last_sequence = frames[-1][0]
+                writer.write(b"".join(frame for _, frame in frames))
+            else:
+                await self.events.wait(EVENT_HEARTBEAT_SECONDS)
+                if self.events.sequence == last_sequence:
+                    # Comment lines keep proxies from timing the stream out and surface dead clients
+                    writer.write(b": ping\n\n")
+                else:
+                    continue
+            await writer.drain()
+
+    async def start(self):
+        if self.events is not None:
+            self.events.attach(asyncio.get_running_loop())
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """
+        Serve requests until the process is interrupted.
+        """
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.database.remove_write_listener(self.cache.invalidate)
+        self._executor.shutdown(wait=False)
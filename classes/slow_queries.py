@@ -0,0 +1,198 @@
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from classes.instrumentation import STATEMENT_TABLE_PATTERN
+
+WHERE_PATTERN = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+WHERE_COLUMN_PATTERN = re.compile(
+    r'"?(\w+)"?\."?(\w+)"?\s*(?:=|!=|<>|<=|>=|<|>|\bIN\b|\bIS\b|\bLIKE\b)', re.IGNORECASE)
+
+IGNORED_CALL_SITE_FILES = (
+    f"{os.sep}sqlalchemy{os.sep}",
+    f"classes{os.sep}database.py",
+    f"classes{os.sep}slow_queries.py",
+)
+
+
+def statement_shape(statement: str = None):
+    """
+    Reduce a statement to the shape it is grouped under: its type, table and filtered columns.
+
+    Two statements that differ only in their bound values share a shape, so every
+    ``filter_by(**values)`` lookup against the same column combination lands in one group.
+
+    Returns:
+        tuple: The statement type, the table name and a sorted tuple of the filtered columns.
+    """
+    statement_type = statement.lstrip().split(None, 1)[0].upper()
+    table_match = STATEMENT_TABLE_PATTERN.search(statement)
+    table = table_match.group(1) if table_match else ""
+    where_match = WHERE_PATTERN.search(statement)
+    columns = ()
+    if where_match:
+        columns = tuple(sorted({
+            column for _, column in WHERE_COLUMN_PATTERN.findall(statement[where_match.end():])
+        }))
+    return statement_type, table, columns
+
+
+def find_call_site():
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if not any(ignored in frame.filename for ignored in IGNORED_CALL_SITE_FILES):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def plan_has_sequential_scan(plan=None):
+    if isinstance(plan, dict):
+        if plan.get("Node Type") == "Seq Scan":
+            return True
+        return any(plan_has_sequential_scan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(plan_has_sequential_scan(value) for value in plan)
+    return False
+
+
+class SlowQueryLog(object):
+    def __init__(self, threshold_ms: float = 50.0, analyze: bool = False, plans_per_shape: int = 1):
+        """
+        Initialize a log of statements that take longer than a threshold.
+
+        Every slow statement is grouped by its shape (see :func:`statement_shape`) along with the
+        call sites that issued it. The first slow statements of each shape are explained on a separate
+        connection. ``EXPLAIN ANALYZE`` is only ever used for SELECT statements, so profiling never
+        executes a write twice. Groups are updated under a lock, since pipeline writers and server
+        workers execute statements from many threads, while the statements are explained outside of it.
+
+        Args:
+            threshold_ms (float): Statements at or above this duration are recorded. Defaults to 50.
+            analyze (bool): Run ``EXPLAIN ANALYZE`` instead of ``EXPLAIN`` for SELECT statements. Defaults to False.
+            plans_per_shape (int): How many statements of each shape are explained. Defaults to 1.
+        """
+        self.threshold_ms = threshold_ms
+        self.analyze = analyze
+        self.plans_per_shape = plans_per_shape
+        self.groups = {}
+        self._engine = None
+        self._lock = threading.Lock()
+        # Shape to the number of plans being explained, so concurrent slow statements do not exceed plans_per_shape
+        self._explaining = Counter()
+
+    def attach(self, engine=None):
+        """
+        Start recording the statements executed by a SQLAlchemy engine.
+        """
+        from sqlalchemy import event
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute",
+                     self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute",
+                     self.after_cursor_execute)
+
+    def detach(self):
+        from sqlalchemy import event
+        event.remove(self._engine, "before_cursor_execute",
+                     self.before_cursor_execute)
+        event.remove(self._engine, "after_cursor_execute",
+                     self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(
+            time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() -
+                       conn.info["slow_query_started"].pop()) * 1000
+        if duration_ms < self.threshold_ms or statement.lstrip().upper().startswith("EXPLAIN"):
+            return
+        shape = statement_shape(statement)
+        call_site = find_call_site()
+        with self._lock:
+            group = self.groups.get(shape)
+            if group is None:
+                group = {
+                    "type": shape[0],
+                    "table": shape[1],
+                    "columns": list(shape[2]),
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "statement": statement,
+                    "call_sites": Counter(),
+                    "plans": [],
+                }
+                self.groups[shape] = group
+            group["count"] += 1
+            group["total_ms"] += duration_ms
+            group["max_ms"] = max(group["max_ms"], duration_ms)
+            group["call_sites"][call_site] += 1
+            explain = not executemany and len(group["plans"]) + self._explaining[shape] < self.plans_per_shape
+            if explain:
+                self._explaining[shape] += 1
+        if not explain:
+            return
+        # Explaining takes a round trip, other threads keep recording meanwhile
+        try:
+            plan = self.explain(statement, parameters, shape[0])
+        finally:
+            with self._lock:
+                self._explaining[shape] -= 1
+        with self._lock:
+            group["plans"].append({
+                "duration_ms": duration_ms,
+                "plan": plan,
+            })
+
+    def explain(self, statement: str = None, parameters=None, statement_type: str = None):
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if self.analyze and statement_type == "SELECT" else "FORMAT JSON"
+        # The statement's own cursor still holds its results, so explain on another pooled connection
+        connection = self._engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"EXPLAIN ({options}) {statement}", parameters)
+            plan = cursor.fetchone()[0]
+            connection.rollback()
+            return json.loads(plan) if isinstance(plan, str) else plan
+        except Exception as exc:
+            connection.rollback()
+            return {"error": str(exc)}
+        finally:
+            connection.close()
+
+    def suggest_index(self, group: dict = None):
+        if not group["columns"] or not group["table"]:
+            return None
+        if group["plans"] and not any(plan_has_sequential_scan(plan["plan"]) for plan in group["plans"]):
+            return None
+        return f"CREATE INDEX ON {group['table']} ({', '.join(group['columns'])});"
+
+    def report(self):
+        """
+        Summarize the recorded statements by table and filter shape, most total time first.
+
+        Returns:
+            list: One dictionary per shape including its call sites, plans and a suggested index when
+            the plan scans the whole table.
+        """
+        with self._lock:
+            groups = [
+                dict(group, call_sites=Counter(group["call_sites"]), plans=list(group["plans"]))
+                for group in self.groups.values()
+            ]
+        report = []
+        for group in sorted(groups, key=lambda group: -group["total_ms"]):
+            report.append({
+                **group,
+                "call_sites": dict(group["call_sites"].most_common()),
+                "suggested_index": self.suggest_index(group),
+            })
+        return report
+
+    def write_report(self, path: str = None):
+        with open(path, "w") as outfile:
+            outfile.write(json.dumps(self.report(), indent=2, default=str))
@@ -0,0 +1,253 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+ZSTD_EXTENSION = ".json.zst"
+GZIP_EXTENSION = ".json.gz"
+
+# False until load_zstandard first runs, None when the package is not installed
+zstandard = False
+
+
+def load_zstandard():
+    """
+    Import the optional ``zstandard`` package on first use.
+
+    :return: The zstandard module, or None when it is not installed.
+    """
+    global zstandard
+    if zstandard is False:
+        try:
+            import zstandard as zstandard_module
+            zstandard = zstandard_module
+        except ImportError:
+            zstandard = None
+    return zstandard
+
+
+def encode_canonical(data) -> bytes:
+    """
+    Encode a JSON payload deterministically so identical content always hashes identically.
+    """
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def request_view(endpoint: str = "", params: dict = None, headers: dict = None):
+    """
+    Describe an API request as the view name and request digest it is indexed under.
+
+    The view name combines the endpoint with the sorted ``view`` parameters, e.g.
+    ``league:mMatchup+mTeam``. Everything else that changes the response (other parameters
+    and the ``x-fantasy-filter`` header) is folded into the request digest, so every page of a
+    paged request is stored separately under the same view.
+
+    Returns:
+        tuple: The view name and the request digest.
+    """
+    params = dict(params or dict())
+    views = params.pop("view", list())
+    if isinstance(views, str):
+        views = [views]
+    view = f"{endpoint.strip('/') or 'league'}:{'+'.join(sorted(views))}"
+    request = {
+        "params": params,
+        "filter": (headers or dict()).get("x-fantasy-filter"),
+    }
+    request_digest = hashlib.sha1(encode_canonical(request)).hexdigest()
+    return view, request_digest
+
+
+class SnapshotStore(object):
+    def __init__(self, directory: str = "snapshots"):
+        """
+        Initialize a content-addressed archive of raw API responses.
+
+        Each response is canonically encoded, hashed with SHA-256 and compressed (zstd when the
+        ``zstandard`` package is installed, gzip otherwise) into ``objects/<prefix>/<digest>``. A
+        response that is already stored is never written again. A SQLite index maps
+        (league, season, view, request) to the digests fetched over time; repeated fetches of an
+        unchanged response only move the ``last_fetched_at`` of the existing index row.
+
+        Args:
+            directory (str): The directory the archive lives in. Created if missing. Defaults to "snapshots".
+        """
+        self.directory = directory
+        self.objects_directory = os.path.join(directory, "objects")
+        os.makedirs(self.objects_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+              id INTEGER PRIMARY KEY,
+              league_id TEXT NOT NULL,
+              season INTEGER,
+              view TEXT NOT NULL,
+              request_digest TEXT NOT NULL,
+              digest TEXT NOT NULL,
+              size INTEGER NOT NULL,
+              fetched_at REAL NOT NULL,
+              last_fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_lookup
+              ON snapshots (league_id, season, view, request_digest, fetched_at);
+        """)
+        self._connection.commit()
+
+    def object_path(self, digest: str = None, extension: str = None):
+        extension = extension or (
+            ZSTD_EXTENSION if load_zstandard() is not None else GZIP_EXTENSION)
+        return os.path.join(self.objects_directory, digest[:2], f"{digest}{extension}")
+
+    def find_object(self, digest: str = None):
+        for extension in (ZSTD_EXTENSION, GZIP_EXTENSION):
+            path = self.object_path(digest, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def compress(self, raw: bytes = None):
+        if load_zstandard() is not None:
+            return zstandard.ZstdCompressor(level=10).compress(raw)
+        return gzip.compress(raw, compresslevel=6)
+
+    def decompress(self, path: str = None, payload: bytes = None):
+        if path.endswith(ZSTD_EXTENSION):
+            if load_zstandard() is None:
+                raise ValueError(
+                    f"zstandard is required to read snapshot {path}")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        return gzip.decompress(payload)
+
+    def write_object(self, raw: bytes = None):
+        digest = hashlib.sha256(raw).hexdigest()
+        if self.find_object(digest) is not None:
+            return digest
+        path = self.object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partially written object
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(path))
+        with os.fdopen(file_descriptor, "wb") as outfile:
+            outfile.write(self.compress(raw))
+        os.replace(temporary_path, path)
+        return digest
+
+    def save(self, data=None, league_id: str = None, season: int = None, view: str = None,
+             request_digest: str = "", fetched_at: float = None):
+        """
+        Archive a raw API response.
+
+        Args:
+            data: The decoded JSON response.
+            league_id (str): The league the response belongs to.
+            season (int): The season the response belongs to.
+            view (str): The view name, see :func:`request_view`.
+            request_digest (str): The request digest, see :func:`request_view`.
+            fetched_at (float): The epoch time the response was fetched. Defaults to now.
+
+        Returns:
+            str: The content digest the response is stored under.
+        """
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        raw = encode_canonical(data)
+        digest = self.write_object(raw)
+        key = (str(league_id), season, view, request_digest)
+        with self._lock:
+            latest = self._connection.execute(
+                "SELECT id, digest FROM snapshots WHERE league_id = ? AND season IS ? AND view = ? "
+                "AND request_digest = ? ORDER BY fetched_at DESC LIMIT 1", key).fetchone()
+            if latest is not None and latest[1] == digest:
+                self._connection.execute(
+                    "UPDATE snapshots SET last_fetched_at = ? WHERE id = ?", (fetched_at, latest[0]))
+            else:
+                self._connection.execute(
+                    "INSERT INTO snapshots (league_id, season, view, request_digest, digest, size, fetched_at, "
+                    "last_fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", key + (digest, len(raw), fetched_at, fetched_at))
+            self._connection.commit()
+        return digest
+
+    def load(self, digest: str = None):
+        """
+        Load an archived response by its content digest.
+
+        Raises:
+            ValueError: If no object is stored under the digest.
+
+        Returns:
+            The decoded JSON response.
+        """
+        path = self.find_object(digest)
+        if path is None:
+            raise ValueError(f"Invalid Snapshot {digest}")
+        with open(path, "rb") as infile:
+            return json.loads(self.decompress(path, infile.read()))
+
+    def history(self, league_id: str = None, season: int = None, view: str = None, request_digest: str = None):
+        """
+        List the index rows for a view, oldest first.
+
+        Args:
+            league_id (str): The league to list.
+            season (int): The season to list.
+            view (str): The view to list. Defaults to every view.
+            request_digest (str): The request to list. Defaults to every request of the view.
+
+        Returns:
+            list: Dictionaries describing each stored snapshot.
+        """
+        query = "SELECT view, request_digest, digest, size, fetched_at, last_fetched_at FROM snapshots " \
+                "WHERE league_id = ? AND season IS ?"
+        args = [str(league_id), season]
+        if view is not None:
+            query += " AND view = ?"
+            args.append(view)
+        if request_digest is not None:
+            query += " AND request_digest = ?"
+            args.append(request_digest)
+        with self._lock:
+            rows = self._connection.execute(
+                query + " ORDER BY fetched_at", args).fetchall()
+        columns = ["view", "request_digest", "digest",
+                   "size", "fetched_at", "last_fetched_at"]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def find(self, league_id: str = None, season: int = None, view: str = None, request_digest: str = None,
+             as_of: float = None):
+        """
+        Find the digest of the snapshot that was current for a view at the given time.
+
+        Args:
+            as_of (float): The epoch time to look up. Defaults to the latest snapshot.
+
+        Returns:
+            str: The content digest, or None if nothing was archived for the view by then.
+        """
+        query = "SELECT digest FROM snapshots WHERE league_id = ? AND season IS ? AND view = ?"
+        args = [str(league_id), season, view]
+        if request_digest is not None:
+            query += " AND request_digest = ?"
+            args.append(request_digest)
+        if as_of is not None:
+            query += " AND fetched_at <= ?"
+            args.append(as_of)
+        with self._lock:
+            row = self._connection.execute(
+                query + " ORDER BY fetched_at DESC LIMIT 1", args).fetchone()
+        return row[0] if row else None
+
+    def latest(self, league_id: str = None, season: int = None, view: str = None, request_digest: str = None,
+               as_of: float = None):
+        """
+        Load the snapshot that was current for a view at the given time, see :meth:`find`.
+        """
+        digest = self.find(league_id, season, view, request_digest, as_of)
+        return self.load(digest) if digest else None
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,306 @@
+from itertools import combinations
+from classes.espn.base import Position
+from classes.espn.settings import RosterSettings, ScoringSettings
+from classes.instrumentation import metrics
+from classes.rankings import projected_points, scoring_weights
+
+# Slots that never score, a player placed there adds nothing to the lineup
+NON_SCORING_SLOTS = frozenset({Position.BENCH.id, Position.INJURED_LIST.id})
+
+# Solved lineups kept per evaluator, a batch between two teams stays well below this
+MAX_CACHED_LINEUPS = 200000
+
+INFINITY = float("inf")
+
+
+def lineup_slots(roster_settings: RosterSettings = None):
+    """
+    Expand the lineup slot counts to one entry per starting spot, e.g. three OF spots become three entries.
+    """
+    slots = []
+    for slot in sorted(roster_settings.lineup_slot_counts, key=lambda slot: slot.position_id):
+        if slot.position_id not in NON_SCORING_SLOTS:
+            slots += [slot.position_id] * (slot.slot_count or 0)
+    return slots
+
+
+def assign_lineup(values: list = None):
+    """
+    Solve a lineup as an assignment problem with the Hungarian method.
+
+    Args:
+        values (list): One row per starting spot and one column per player, holding the points the
+            player scores in that spot or None when the player is not eligible for it.
+
+    Returns:
+        tuple: The lineup value and the column assigned to every row, None for a spot left empty.
+    """
+    rows = len(values)
+    players = len(values[0]) if rows else 0
+    # Every spot may also stay empty for no points, so a lineup always exists
+    columns = players + rows
+    costs = [[INFINITY if value is None else -value for value in row] + [0.0] * rows for row in values]
+    row_potentials = [0.0] * (rows + 1)
+    column_potentials = [0.0] * (columns + 1)
+    column_rows = [0] * (columns + 1)
+    previous = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        column_rows[0] = row
+        column = 0
+        slack = [INFINITY] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[column] = True
+            current_row = column_rows[column]
+            row_costs = costs[current_row - 1]
+            row_potential = row_potentials[current_row]
+            delta = INFINITY
+            next_column = 0
+            for candidate in range(1, columns + 1):
+                if used[candidate]:
+                    continue
+                reduced = row_costs[candidate - 1] - row_potential - column_potentials[candidate]
+                if reduced < slack[candidate]:
+                    slack[candidate] = reduced
+                    previous[candidate] = column
+                if slack[candidate] < delta:
+                    delta = slack[candidate]
+                    next_column = candidate
+            for candidate in range(columns + 1):
+                if used[candidate]:
+                    row_potentials[column_rows[candidate]] += delta
+                    column_potentials[candidate] -= delta
+                else:
+                    slack[candidate] -= delta
+            column = next_column
+            if column_rows[column] == 0:
+                break
+        while column:
+            previous_column = previous[column]
+            column_rows[column] = column_rows[previous_column]
+            column = previous_column
+    assignment = [None] * rows
+    total = 0.0
+    for column in range(1, players + 1):
+        if column_rows[column]:
+            assignment[column_rows[column] - 1] = column - 1
+            total += values[column_rows[column] - 1][column - 1]
+    return total, assignment
+
+
+class TradeEvaluator(object):
+    def __init__(self, roster_settings: RosterSettings = None, scoring_settings: ScoringSettings = None,
+                 rosters: dict = None, remaining_share: float = 1.0):
+        """
+        Initialize a trade evaluation service over the league's rosters.
+
+        Every player is valued once per lineup slot from their projected stats and the league scoring
+        (point overrides make the value slot specific), scaled to the share of the season left. A
+        team's rest-of-season value is its best possible starting lineup under the ``RosterSettings``
+        slot counts, solved once and cached. A trade is scored as the change of the two affected
+        lineups only, and solved lineups are cached by their players, so a batch of trades between
+        two teams reuses every lineup it has already solved.
+
+        When a team's lineup fills every spot, giving away bench players cannot change who starts, so
+        those lineups are solved over the starters and the incoming players only.
+
+        Args:
+            roster_settings (RosterSettings): The league roster settings providing the lineup slot counts.
+            scoring_settings (ScoringSettings): The league scoring the projected stats are valued with.
+            rosters (dict): Team id to player dictionaries with ``id``, ``eligible_slots`` and
+                ``projected_stats``, e.g. ``free_agent_row`` of every rostered player.
+            remaining_share (float): The share of the season left, projections are scaled by it. Defaults to 1.
+        """
+        self.scoring_settings = scoring_settings
+        self.slots = lineup_slots(roster_settings)
+        self.remaining_share = remaining_share
+        self._weights = {}
+        self._players = {}
+        self._values = {}
+        self._lineups = {}
+        self._solutions = {}
+        self._rosters = {}
+        self._slot_parents = {}
+        self._player_slots = {}
+        for team_id, rows in (rosters or dict()).items():
+            self.set_roster(team_id, rows)
+
+    def weights(self, slot_id: int = None):
+        weights = self._weights.get(slot_id)
+        if weights is None:
+            weights = scoring_weights(self.scoring_settings, slot_id)
+            self._weights[slot_id] = weights
+        return weights
+
+    def slot_values(self, player_id: int = None):
+        values = self._values.get(player_id)
+        if values is None:
+            row = self._players[player_id]
+            eligible = set(row.get("eligible_slots") or list())
+            stats = row.get("projected_stats") or dict()
+            values = tuple(
+                projected_points(stats, self.weights(slot_id)) * self.remaining_share
+                if slot_id in eligible else None for slot_id in self.slots
+            )
+            self._values[player_id] = values
+        return values
+
+    def set_roster(self, team_id: int = None, rows: list = None):
+        """
+        Replace a team's roster, e.g. after a transaction. Lineups already solved for other teams stay cached.
+        """
+        for row in rows or list():
+            self.set_player(row)
+        self._rosters[team_id] = frozenset(row["id"] for row in rows or list())
+
+    def set_player(self, row: dict = None):
+        """
+        Add or re-project a player. Every cached lineup is dropped when a known player's projection changed.
+        """
+        previous_row = self._players.get(row["id"])
+        self._players[row["id"]] = row
+        if previous_row is not None and (
+                previous_row.get("projected_stats") != row.get("projected_stats")
+                or previous_row.get("eligible_slots") != row.get("eligible_slots")):
+            self._values.pop(row["id"], None)
+            self._lineups.clear()
+            self._solutions.clear()
+        # Slots a player is eligible for are linked, players in unlinked groups never compete for a spot
+        slot_ids = [slot_id for slot_id in dict.fromkeys(row.get("eligible_slots") or list()) if slot_id in self.slots]
+        for slot_id in slot_ids[1:]:
+            self._slot_parents[self.find_slot(slot_id)] = self.find_slot(slot_ids[0])
+        self._player_slots[row["id"]] = slot_ids[0] if slot_ids else None
+
+    def roster(self, team_id: int = None):
+        roster = self._rosters.get(team_id)
+        if roster is None:
+            raise ValueError(f"Invalid Team ID {team_id}")
+        return roster
+
+    def find_slot(self, slot_id: int = None):
+        parents = self._slot_parents
+        while parents.setdefault(slot_id, slot_id) != slot_id:
+            parents[slot_id] = parents[parents[slot_id]]
+            slot_id = parents[slot_id]
+        return slot_id
+
+    def slot_groups(self, player_ids: frozenset = None):
+        """
+        Split players into groups that compete for no common lineup spot, e.g. hitters and pitchers.
+        """
+        groups = {}
+        for player_id in player_ids:
+            slot_id = self._player_slots.get(player_id)
+            # Players eligible for no lineup spot never start
+            if slot_id is not None:
+                groups.setdefault(self.find_slot(slot_id), set()).add(player_id)
+        return [frozenset(group) for group in groups.values()]
+
+    def solve_group(self, player_ids: frozenset = None):
+        lineup = self._lineups.get(player_ids)
+        if lineup is not None:
+            return lineup
+        players = sorted(player_ids)
+        columns = [self.slot_values(player_id) for player_id in players]
+        spots = [spot for spot in range(len(self.slots))
+                 if any(column[spot] is not None for column in columns)]
+        total, assignment = assign_lineup([[column[spot] for column in columns] for spot in spots])
+        lineup = (total, frozenset(players[column] for column in assignment if column is not None))
+        if len(self._lineups) >= MAX_CACHED_LINEUPS:
+            self._lineups.clear()
+        self._lineups[player_ids] = lineup
+        return lineup
+
+    def solve(self, player_ids: frozenset = None):
+        """
+        Solve the best lineup of a set of players.
+
+        Groups of players that compete for no common spot are solved (and cached) on their own, so
+        swapping two pitchers reuses the solved hitters.
+
+        Returns:
+            tuple: The lineup value, the set of starting player ids and whether every spot is filled.
+        """
+        solution = self._solutions.get(player_ids)
+        if solution is not None:
+            return solution
+        total = 0.0
+        starters = frozenset()
+        for group in self.slot_groups(player_ids):
+            group_total, group_starters = self.solve_group(group)
+            total += group_total
+            starters |= group_starters
+        solution = (total, starters, len(starters) == len(self.slots))
+        if len(self._solutions) >= MAX_CACHED_LINEUPS:
+            self._solutions.clear()
+        self._solutions[player_ids] = solution
+        return solution
+
+    def team_value(self, team_id: int = None):
+        """
+        Get a team's rest-of-season lineup value, solved once per roster.
+        """
+        return self.solve(self.roster(team_id))[0]
+
+    def roster_value(self, team_id: int = None, removed: frozenset = None, added: frozenset = None):
+        roster = self.roster(team_id)
+        removed = frozenset(removed or frozenset()) & roster
+        added = frozenset(added or frozenset()) - roster
+        _, starters, _ = self.solve(roster)
+        # Without the starters given away the lineup is re-solved once, bench players may move up
+        base = roster - (removed & starters)
+        _, base_starters, full = self.solve(base)
+        if full and not (removed - starters) & base_starters:
+            return self.solve(base_starters | added)[0]
+        return self.solve((roster - removed) | added)[0]
+
+    def evaluate(self, team_id: int = None, gives: list = None, other_team_id: int = None, receives: list = None):
+        """
+        Score a trade as the change of both teams' rest-of-season lineup values.
+
+        Args:
+            team_id (int): The team proposing the trade.
+            gives (list): The player ids the team gives away.
+            other_team_id (int): The team receiving the proposal.
+            receives (list): The player ids the team receives.
+
+        Returns:
+            dict: The players traded and the change of each team's lineup value.
+        """
+        gives = frozenset(gives or list())
+        receives = frozenset(receives or list())
+        if not gives <= self.roster(team_id) or not receives <= self.roster(other_team_id):
+            raise ValueError("Traded players must be on the team giving them away")
+        return {
+            "gives": sorted(gives),
+            "receives": sorted(receives),
+            "delta": self.roster_value(team_id, gives, receives) - self.team_value(team_id),
+            "other_delta": self.roster_value(other_team_id, receives, gives) - self.team_value(other_team_id),
+        }
+
+    def evaluate_swaps(self, team_id: int = None, other_team_id: int = None, max_players: int = 2):
+        """
+        Score every 1-for-1 swap between two teams, and every 2-for-1 swap in both directions.
+
+        Args:
+            team_id (int): The team the swaps are proposed for.
+            other_team_id (int): The trade partner.
+            max_players (int): The most players either side gives, 1 limits the batch to 1-for-1 swaps. Defaults to 2.
+
+        Returns:
+            list: The result of :meth:`evaluate` for every swap, the ones both teams gain most from first.
+        """
+        roster = sorted(self.roster(team_id))
+        other_roster = sorted(self.roster(other_team_id))
+        shapes = [(1, 1)]
+        if max_players >= 2:
+            shapes += [(2, 1), (1, 2)]
+        results = []
+        with metrics.span("trade_batch", team_id=team_id, other_team_id=other_team_id):
+            for gives_count, receives_count in shapes:
+                for gives in combinations(roster, gives_count):
+                    for receives in combinations(other_roster, receives_count):
+                        results.append(self.evaluate(
+                            team_id, gives, other_team_id, receives))
+        return sorted(results, key=lambda result: (-min(result["delta"], result["other_delta"]),
+                                                   -(result["delta"] + result["other_delta"])))
@@ -1,25 +1,68 @@
 import os
+import argparse
 import datetime
 from classes.interface import FantasyBaseballInterface
+from classes.instrumentation import metrics
+from classes.memory_profile import MemoryProfiler
 from dotenv import load_dotenv
 import json
 
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--metrics", default=None,
+                        help="Time API calls, parse phases and DB statements and write Prometheus metrics to this file")
+    parser.add_argument("--slow-queries", type=float, default=None, metavar="MS",
+                        help="Record statements slower than MS milliseconds with their EXPLAIN plans")
+    parser.add_argument("--slow-queries-analyze", action="store_true",
+                        help="Use EXPLAIN ANALYZE for slow SELECT statements")
+    parser.add_argument("--slow-queries-report", default="slow_queries.json",
+                        help="Where the slow query report is written")
+    parser.add_argument("--read-cache", action="store_true",
+                        help="Serve repeated database reads from memory until their table is written to")
+    parser.add_argument("--profile-memory", nargs="?", const="memory_profile.json", default=None, metavar="PATH",
+                        help="Snapshot memory at every sync stage boundary and write the per-stage report to PATH")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     load_dotenv()
+    args = parse_arguments()
+    if args.metrics:
+        metrics.enable()
 
     db_connection_string = os.environ.get("db_connection_string")
     league_id = os.environ.get("league_id")
     espn_s2 = os.environ.get("espn_s2")
     swid = os.environ.get("swid")
     season = datetime.date.today().year
+    memory_profiler = MemoryProfiler() if args.profile_memory else None
 
     interface = FantasyBaseballInterface(
         league_id=league_id,
         espn_s2=espn_s2,
         swid=swid,
         season=season,
-        db_connection_string=db_connection_string
+        db_connection_string=db_connection_string,
+        memory_profiler=memory_profiler
     )
+    if args.read_cache:
+        interface.database.enable_read_cache()
+    if args.slow_queries is not None:
+        interface.database.enable_slow_query_log(
+            threshold_ms=args.slow_queries, analyze=args.slow_queries_analyze)
 
     # interface.create_league()
-    interface.database.end_session()
+    interface.close()
+
+    if args.slow_queries is not None:
+        interface.database.slow_query_log.write_report(
+            args.slow_queries_report)
+
+    if memory_profiler is not None:
+        print(memory_profiler.report())
+        memory_profiler.write_report(args.profile_memory)
+
+    if args.metrics:
+        print(metrics.summary())
+        metrics.write_prometheus(args.metrics)
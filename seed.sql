@@ -16,6 +16,11 @@ CREATE TABLE positions (
   label TEXT NOT NULL
 );
 
+CREATE TABLE reference_checksums (
+  id TEXT PRIMARY KEY,
+  checksum TEXT NOT NULL
+);
+
 CREATE TABLE members (
   id UUID PRIMARY KEY,
   name TEXT NOT NULL,
@@ -242,4 +247,143 @@ CREATE TABLE settings (
   roster_id INTEGER REFERENCES settings_roster(id) ON DELETE CASCADE,
   draft_id INTEGER REFERENCES settings_draft(id) ON DELETE CASCADE,
   acquisition_id INTEGER REFERENCES settings_acquisition(id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+/*
+##################
+# MATCHUP TABLES #
+##################
+*/
+
+CREATE TABLE matchups (
+  id INTEGER PRIMARY KEY,
+  matchup_period_id INTEGER NOT NULL,
+  home_team_id INTEGER REFERENCES teams(id) ON DELETE CASCADE,
+  away_team_id INTEGER REFERENCES teams(id) ON DELETE CASCADE,
+  home_score FLOAT DEFAULT 0.0,
+  away_score FLOAT DEFAULT 0.0,
+  winner TEXT DEFAULT 'UNDECIDED'
+);
+
+CREATE TABLE matchup_player_scores (
+  id SERIAL PRIMARY KEY,
+  matchup_id INTEGER REFERENCES matchups(id) ON DELETE CASCADE,
+  team_id INTEGER REFERENCES teams(id) ON DELETE CASCADE,
+  player_id INTEGER NOT NULL,
+  scoring_period_id INTEGER NOT NULL,
+  lineup_slot_id INTEGER REFERENCES positions(id) ON DELETE CASCADE,
+  points FLOAT DEFAULT 0.0,
+  UNIQUE (matchup_id, team_id, player_id, scoring_period_id)
+);
+
+CREATE TABLE rosters (
+  id SERIAL PRIMARY KEY,
+  team_id INTEGER REFERENCES teams(id) ON DELETE CASCADE,
+  player_id INTEGER NOT NULL,
+  lineup_slot_id INTEGER REFERENCES positions(id) ON DELETE CASCADE,
+  UNIQUE (team_id, player_id)
+);
+
+/*
+################
+# DRAFT TABLES #
+################
+*/
+
+-- One row per league and season, checksum covers the picks so an unchanged draft is not rewritten
+CREATE TABLE draft (
+  id SERIAL PRIMARY KEY,
+  league_id TEXT NOT NULL,
+  season INTEGER NOT NULL,
+  draft_date TIMESTAMP,
+  details TEXT,
+  checksum TEXT,
+  UNIQUE (league_id, season)
+);
+
+CREATE TABLE draft_picks (
+  id SERIAL PRIMARY KEY,
+  draft_id INTEGER REFERENCES draft(id) ON DELETE CASCADE,
+  pick_number INTEGER NOT NULL,
+  round INTEGER,
+  round_pick_number INTEGER,
+  team_id INTEGER,
+  player_id INTEGER,
+  bid_amount INTEGER,
+  keeper BOOLEAN DEFAULT false,
+  details TEXT,
+  UNIQUE (draft_id, pick_number)
+);
+
+/*
+#################
+# PLAYER TABLES #
+#################
+*/
+
+CREATE TABLE players (
+  id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  position TEXT,
+  team TEXT,
+  status TEXT
+);
+
+-- One row per player and scoring period, stat_values[stat id + 1] holds each Stat (Postgres arrays are 1-based)
+-- Partitioned by season, then by ranges of scoring periods. PlayerStatsStore creates the partitions as stats arrive
+CREATE TABLE player_stats (
+  player_id INTEGER NOT NULL,
+  season INTEGER NOT NULL,
+  scoring_period_id INTEGER NOT NULL,
+  stat_values DOUBLE PRECISION[] NOT NULL,
+  PRIMARY KEY (player_id, season, scoring_period_id)
+) PARTITION BY LIST (season);
+
+-- Rolling totals per player, kept current by RollingStats as new scoring periods are written
+CREATE TABLE player_stat_windows (
+  player_id INTEGER NOT NULL,
+  season INTEGER NOT NULL,
+  window_name TEXT NOT NULL,
+  through_period INTEGER NOT NULL,
+  stat_totals DOUBLE PRECISION[] NOT NULL,
+  PRIMARY KEY (player_id, season, window_name)
+);
+
+/*
+###################
+# ACTIVITY TABLES #
+###################
+*/
+
+-- One row per activity topic (a claim, a drop or a trade), written by ActivityIngester
+CREATE TABLE league_activity (
+  id TEXT PRIMARY KEY,
+  league_id TEXT NOT NULL,
+  season INTEGER NOT NULL,
+  activity_date TIMESTAMP,
+  type TEXT
+);
+
+CREATE TABLE league_transactions (
+  id SERIAL PRIMARY KEY,
+  activity_id TEXT REFERENCES league_activity(id) ON DELETE CASCADE,
+  message_index INTEGER NOT NULL,
+  message_type_id INTEGER NOT NULL,
+  action TEXT NOT NULL,
+  team_id INTEGER,
+  player_id INTEGER,
+  bid_amount INTEGER,
+  UNIQUE (activity_id, message_index)
+);
+
+-- The newest topic stored per league, paging stops when it comes up again
+CREATE TABLE league_activity_cursors (
+  league_id TEXT NOT NULL,
+  season INTEGER NOT NULL,
+  last_activity_id TEXT,
+  last_activity_epoch BIGINT,
+  pending_activity_id TEXT,
+  pending_activity_epoch BIGINT,
+  backfill_offset INTEGER,
+  PRIMARY KEY (league_id, season)
+);
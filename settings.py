@@ -168,3 +168,12 @@ ACTIVITY_MAP = {
     'WAIVER': 180,
     'TRADED': 244
 }
+
+# Raw API responses are archived here, see classes/snapshots.py
+SNAPSHOT_DIRECTORY = "snapshots"
+
+# The player name search index is serialized here after it is built, see classes/player_search.py
+PLAYER_SEARCH_INDEX = "player_search.pickle"
+
+# Projections ingested from local CSV/Parquet files are memory-mapped from here, see classes/projections.py
+PROJECTION_DIRECTORY = "projections"